@@ -1,314 +1,801 @@
+import os
 import sys
-import random
-import matplotlib.pyplot as plt
-import networkx as nx
+import time
+import threading
+from collections import deque
+import numpy as np
 from PyQt5 import QtWidgets, QtGui, QtCore
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
-from collections import deque
+from matplotlib.collections import LineCollection, PathCollection
+from matplotlib.figure import Figure
+from matplotlib.font_manager import FontProperties
+from matplotlib.path import Path
+from matplotlib.textpath import TextPath, text_to_path
+from matplotlib.transforms import IdentityTransform
+from treecore import (BINARY_EXTENSION, BLACK, BTREE_TYPE, GROUP_COMMIT_INTERVAL, Node, NodeIndex,
+                      OP_ATTACH_LEFT, OP_ATTACH_RIGHT, OP_CONVERT, OP_DELETE, OP_INSERT, OP_REBALANCE,
+                      OP_SPLAY, OP_SWAP, OperationCancelled, RED, TRAVERSALS, TREE_TYPES, TreeJournal,
+                      build_btree, build_random_tree, collect_traversal, color_red_black, convert_tree_type,
+                      delete_avl, delete_binary, delete_bst, delete_btree_keys, delete_keys, delete_rb,
+                      delete_scapegoat, delete_splay, find_node, find_scapegoat,
+                      generate_unique_random_numbers, inorder, insert_avl, insert_binary, insert_bst,
+                      insert_rb, insert_scapegoat, insert_splay, iter_levels, load_tree_binary, postorder,
+                      preorder, read_tree_text, rebalance_dsw, save_tree_binary, splay, write_tree_text)
+
+
+TREE_FILE_FILTER = f"Text Files (*.txt);;Binary Tree Files (*{BINARY_EXTENSION})"
+
+
+class JobSignals(QtCore.QObject):
+    """
+    Signal của TreeJob (QRunnable không tự phát signal được).
+    """
+    progress = QtCore.pyqtSignal(object, object, float)  # Đã xử lý, tổng, tốc độ mỗi giây
+    finished = QtCore.pyqtSignal(object)
+    failed = QtCore.pyqtSignal(str)
+    cancelled = QtCore.pyqtSignal()
 
 
-# Định nghĩa lớp Node cho các loại cây
-class Node:
-    def __init__(self, key):
-        self.left = None
-        self.right = None
-        self.val = key
-        self.height = 1  # Chiều cao chỉ dùng cho AVL
+class TreeJob(QtCore.QRunnable):
+    """
+    Chạy một tác vụ dài (nhận tham số progress và cancelled) trên QThreadPool để giao diện
+    không bị treo; tiến độ và kết quả được gửi về luồng giao diện qua signal.
+    """
 
-# Các hàm chèn nút theo quy tắc của từng loại cây
-def insert_binary(root, key):
-    if root is None:
-        return Node(key)
-    else:
-        if random.choice([True, False]):
-            root.left = insert_binary(root.left, key)
+    def __init__(self, task, *args, **kwargs):
+        super().__init__()
+        self.task = task
+        self.args = args
+        self.kwargs = kwargs
+        self.signals = JobSignals()
+        self.setAutoDelete(False)  # TreeApp giữ tham chiếu tới khi nhận kết quả
+        self.cancel_event = threading.Event()  # Được đặt trực tiếp từ luồng giao diện
+        self.start_time = 0.0
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def report(self, done, total):
+        elapsed = time.perf_counter() - self.start_time
+        self.signals.progress.emit(done, total, done / elapsed if elapsed > 0 else 0.0)
+
+    def run(self):
+        self.start_time = time.perf_counter()
+        try:
+            result = self.task(*self.args, progress=self.report, cancelled=self.cancel_event.is_set,
+                               **self.kwargs)
+        except OperationCancelled:
+            self.signals.cancelled.emit()
+        except Exception as e:
+            self.signals.failed.emit(str(e))
         else:
-            root.right = insert_binary(root.right, key)
-    return root
+            self.signals.finished.emit(result)
 
-def insert_bst(root, key):
-    if root is None:
-        return Node(key)
-    else:
-        if key < root.val:
-            root.left = insert_bst(root.left, key)
-        else:
-            root.right = insert_bst(root.right, key)
-    return root
-
-def get_height(node):
-    if not node:
-        return 0
-    return node.height
-
-def update_height(node):
-    if node:
-        node.height = 1 + max(get_height(node.left), get_height(node.right))
-
-def get_balance(node):
-    if not node:
-        return 0
-    return get_height(node.left) - get_height(node.right)
-
-def rotate_right(y):
-    x = y.left
-    T2 = x.right
-    x.right = y
-    y.left = T2
-    update_height(y)
-    update_height(x)
-    return x
-
-def rotate_left(x):
-    y = x.right
-    T2 = y.left
-    y.left = x
-    x.right = T2
-    update_height(x)
-    update_height(y)
-    return y
-
-def insert_avl(node, key):
-    if not node:
-        return Node(key)
-    if key < node.val:
-        node.left = insert_avl(node.left, key)
+
+def build_tree_task(tree_type, count, min_val, max_val, progress=None, cancelled=None):
+    """
+    Dựng cây ngẫu nhiên và chỉ mục của nó ngoài luồng giao diện.
+    """
+    root = build_random_tree(tree_type, count, min_val, max_val, progress, cancelled)
+    return root, NodeIndex(root)
+
+
+def build_btree_task(count, min_val, max_val, order, progress=None, cancelled=None):
+    """
+    Dựng cây B+ từ các khóa ngẫu nhiên ngoài luồng giao diện.
+    """
+    return build_btree(generate_unique_random_numbers(count, min_val, max_val), order, progress, cancelled)
+
+
+def load_tree_task(file_path, progress=None, cancelled=None):
+    """
+    Đọc file cây (văn bản hoặc nhị phân) và dựng chỉ mục ngoài luồng giao diện.
+    Trả về (loại cây, gốc, các dòng lỗi, chỉ mục).
+    """
+    if file_path.endswith(BINARY_EXTENSION):
+        tree_type, arena = load_tree_binary(file_path)
+        root, errors = arena.to_nodes(tree_type == "Đỏ-đen"), []
     else:
-        node.right = insert_avl(node.right, key)
-    update_height(node)
+        tree_type, root, errors = read_tree_text(file_path, progress, cancelled)
+    return tree_type, root, errors, NodeIndex(root)
+
+
+LABEL_FONT = FontProperties(size=12, weight="bold")
+glyph_cache = {}
 
-    balance = get_balance(node)
-    if balance > 1:
-        if key < node.left.val:
-            return rotate_right(node)
+
+def label_path(text):
+    """
+    Ghép đường viền chữ của nhãn từ các ký tự đã lưu sẵn, căn giữa tại gốc tọa độ
+    (đơn vị point) để vẽ tất cả nhãn trong một PathCollection.
+    """
+    vertices, codes = [], []
+    x = 0.0
+    for char in text:
+        if char not in glyph_cache:
+            path = TextPath((0, 0), char, prop=LABEL_FONT)
+            width, _, _ = text_to_path.get_text_width_height_descent(char, LABEL_FONT, ismath=False)
+            glyph_cache[char] = (path.vertices, path.codes, width)
+        glyph_vertices, glyph_codes, width = glyph_cache[char]
+        if len(glyph_vertices):
+            vertices.append(glyph_vertices + (x, 0.0))
+            codes.append(glyph_codes)
+        x += width
+    if not vertices:
+        return Path(np.zeros((1, 2)))
+    vertices = np.concatenate(vertices)
+    vertices -= (x / 2, LABEL_FONT.get_size_in_points() * 0.36)
+    return Path(vertices, np.concatenate(codes))
+
+
+# Bố cục cây gọn (tidy tree) kiểu Reingold–Tilford, lưu đệm theo từng cây con
+MIN_SEPARATION = 1.0  # Khoảng cách ngang tối thiểu giữa hai nút cùng độ sâu
+SINGLE_CHILD_OFFSET = 0.5  # Độ lệch của nút con duy nhất so với nút cha
+
+
+class SubtreeLayout:
+    """
+    Bố cục đã tính của một cây con, gắn vào nút qua thuộc tính node.layout.
+    Đường viền trái/phải là danh sách liên kết các ô (dx, ô kế tiếp), trong đó dx là
+    độ lệch x tới nút viền ở độ sâu tiếp theo; các đoạn viền được dùng chung với cây
+    con nên mỗi lần ghép chỉ tốn O(min(chiều cao trái, chiều cao phải)).
+    """
+    __slots__ = ("left", "right", "left_layout", "right_layout", "height",
+                 "left_contour", "right_contour", "left_dx", "right_dx")
+
+    def __init__(self, node, left_layout, right_layout):
+        self.left = node.left
+        self.right = node.right
+        self.left_layout = left_layout
+        self.right_layout = right_layout
+        if left_layout and right_layout:
+            self.merge(left_layout, right_layout)
+        elif left_layout:
+            self.left_dx = -SINGLE_CHILD_OFFSET
+            self.height = left_layout.height + 1
+            self.left_contour = (self.left_dx, left_layout.left_contour)
+            self.right_contour = (self.left_dx, left_layout.right_contour)
+        elif right_layout:
+            self.right_dx = SINGLE_CHILD_OFFSET
+            self.height = right_layout.height + 1
+            self.left_contour = (self.right_dx, right_layout.left_contour)
+            self.right_contour = (self.right_dx, right_layout.right_contour)
         else:
-            node.left = rotate_left(node.left)
-            return rotate_right(node)
-    if balance < -1:
-        if key > node.right.val:
-            return rotate_left(node)
+            self.height = 1
+            self.left_contour = self.right_contour = (0.0, None)
+
+    def is_valid(self, node, left_layout, right_layout):
+        return (self.left is node.left and self.right is node.right and
+                self.left_layout is left_layout and self.right_layout is right_layout)
+
+    def merge(self, left, right):
+        # Dò song song viền phải của cây trái và viền trái của cây phải
+        gap = 0.0
+        x_left = x_right = 0.0
+        cell_left, cell_right = left.right_contour, right.left_contour
+        for _ in range(min(left.height, right.height)):
+            gap = max(gap, x_left - x_right)
+            x_left += cell_left[0]
+            x_right += cell_right[0]
+            cell_left, cell_right = cell_left[1], cell_right[1]
+        half = (gap + MIN_SEPARATION) / 2
+        self.left_dx, self.right_dx = -half, half
+        self.height = max(left.height, right.height) + 1
+
+        # Cây con sâu hơn cho mượn phần viền dưới độ sâu của cây con nông hơn
+        if left.height >= right.height:
+            self.left_contour = (-half, left.left_contour)
         else:
-            node.right = rotate_right(node.right)
-            return rotate_left(node)
-    return node
-
-def delete_bst(node, key):
-    if not node:
-        return node
-    if key < node.val:
-        node.left = delete_bst(node.left, key)
-    elif key > node.val:
-        node.right = delete_bst(node.right, key)
-    else:
-        if not node.left:
-            return node.right
-        elif not node.right:
-            return node.left
-        temp = get_min_value_node(node.right)
-        node.val = temp.val
-        node.right = delete_bst(node.right, temp.val)
-    return node
-
-def delete_avl(root, key):
-    if not root:
-        return root
-    if key < root.val:
-        root.left = delete_avl(root.left, key)
-    elif key > root.val:
-        root.right = delete_avl(root.right, key)
-    else:
-        if not root.left:
-            return root.right
-        elif not root.right:
-            return root.left
-        temp = get_min_value_node(root.right)
-        root.val = temp.val
-        root.right = delete_avl(root.right, temp.val)
-
-    update_height(root)
-    balance = get_balance(root)
-
-    if balance > 1 and get_balance(root.left) >= 0:
-        return rotate_right(root)
-    if balance > 1 and get_balance(root.left) < 0:
-        root.left = rotate_left(root.left)
-        return rotate_right(root)
-    if balance < -1 and get_balance(root.right) <= 0:
-        return rotate_left(root)
-    if balance < -1 and get_balance(root.right) > 0:
-        root.right = rotate_right(root.right)
-        return rotate_left(root)
-    return root
-
-
-def delete_binary(node, key):
-    if node is None:
-        return None  # Nút rỗng, không cần xử lý
-
-    # Kiểm tra nếu đây là nút cần xóa
-    if node.val == key:
-        # Trường hợp 1: Nút lá (không có con)
-        if not node.left and not node.right:
-            return None
-        # Trường hợp 2: Nút có 1 con
-        if not node.left:
-            return node.right
-        if not node.right:
-            return node.left
-        # Trường hợp 3: Nút có 2 con
-        temp = get_min_value_node(node.right)
-        node.val = temp.val
-        node.right = delete_binary(node.right, temp.val)
-        return node
-
-    # Duyệt cả hai nhánh để tìm nút cần xóa
-    node.left = delete_binary(node.left, key)
-    node.right = delete_binary(node.right, key)
-    return node
-
-
-def get_min_value_node(node):
+            self.left_contour = (-half, splice_contour(left.left_contour, left.height, -half,
+                                                       right.left_contour, half))
+        if right.height >= left.height:
+            self.right_contour = (half, right.right_contour)
+        else:
+            self.right_contour = (half, splice_contour(right.right_contour, right.height, half,
+                                                       left.right_contour, -half))
+
+
+def splice_contour(short, short_height, short_x, deep, deep_x):
+    """
+    Chép viền của cây con nông (short_height ô) rồi nối tiếp vào viền cây con sâu
+    tại độ sâu short_height. short_x, deep_x là vị trí gốc hai cây con so với nút cha.
+    """
+    xs = []
+    x = short_x
+    cell = short
+    for _ in range(short_height):
+        xs.append(x)
+        x += cell[0]
+        cell = cell[1]
+    x = deep_x
+    cell = deep
+    for _ in range(short_height):
+        x += cell[0]
+        cell = cell[1]
+    spliced = (x - xs[-1], cell)
+    for depth in range(short_height - 2, -1, -1):
+        spliced = (xs[depth + 1] - xs[depth], spliced)
+    return spliced
+
+
+def invalidate_layout(node, index):
+    """
+    Đánh dấu bố cục của node và các tổ tiên (tra qua NodeIndex) cần tính lại.
+    """
+    while node is not None:
+        node.layout = None
+        node = index.parent(node.val)
+
+
+def structural_spine(node, index):
     """
-    Hàm tìm giá trị nhỏ nhất trong cây con phải.
+    Các nút có thể đổi cấu trúc khi xóa node: tổ tiên của node, chính node và
+    đường xuống nút kế nhiệm (nút thực sự bị gỡ khi node có hai con).
     """
+    spine = []
     current = node
-    while current.left is not None:
-        current = current.left
-    return current
+    while current is not None:
+        spine.append(current)
+        current = index.parent(current.val)
+    if node is not None and node.left and node.right:
+        current = node.right
+        while current:
+            spine.append(current)
+            current = current.left
+    return spine
+
+
+class TreeLayout:
+    """
+    Bố cục gọn tính trong thời gian tuyến tính. Bố cục của từng cây con được lưu
+    trên nút; sau một thao tác chèn/xóa/quay chỉ các nút trên đường đi bị đánh dấu
+    (node.layout = None) và các nút có con thay đổi được tính lại.
+    Kết quả là các mảng NumPy xs, ys, parents (chỉ số nút cha, -1 với gốc) cùng
+    danh sách values theo thứ tự tiền tự. Vì là thứ tự tiền tự, cây con của nút i
+    chiếm đoạn liên tiếp [i, i + sizes[i]); xmin, xmax, ymin là hộp bao của cây con.
+    """
 
+    def __init__(self):
+        self.values = []
+        self.xs = np.empty(0)
+        self.ys = np.empty(0)
+        self.parents = np.empty(0, dtype=np.intp)
+        self.sizes = np.empty(0, dtype=np.intp)
+        self.xmin = self.xmax = self.ymin = np.empty(0)
+
+    def __len__(self):
+        return len(self.values)
+
+    def subtree_layout(self, root):
+        # Duyệt hậu tự bằng ngăn xếp, chỉ đi xuống những cây con chưa có bố cục hợp lệ
+        stack = [(root, False)]
+        while stack:
+            node, children_done = stack.pop()
+            if not children_done:
+                layout = getattr(node, "layout", None)
+                if (layout is not None and layout.left is node.left and layout.right is node.right and
+                        (node.left is None or getattr(node.left, "layout", None) is layout.left_layout) and
+                        (node.right is None or getattr(node.right, "layout", None) is layout.right_layout)):
+                    continue
+                stack.append((node, True))
+                for child in (node.left, node.right):
+                    if child:
+                        stack.append((child, False))
+                continue
+            left_layout = node.left.layout if node.left else None
+            right_layout = node.right.layout if node.right else None
+            layout = getattr(node, "layout", None)
+            if layout is None or not layout.is_valid(node, left_layout, right_layout):
+                node.layout = SubtreeLayout(node, left_layout, right_layout)
+        return root.layout
+
+    def update(self, root):
+        """
+        Tính lại (phần thay đổi của) bố cục và điền các mảng tọa độ tuyệt đối.
+        """
+        values, xs, ys, parents = [], [], [], []
+        if root is not None:
+            self.subtree_layout(root)
+            stack = [(root, 0.0, 0, -1)]
+            while stack:
+                node, x, depth, parent = stack.pop()
+                index = len(values)
+                values.append(node.val)
+                xs.append(x)
+                ys.append(-depth)
+                parents.append(parent)
+                layout = node.layout
+                if node.right:
+                    stack.append((node.right, x + layout.right_dx, depth + 1, index))
+                if node.left:
+                    stack.append((node.left, x + layout.left_dx, depth + 1, index))
+        self.values = values
+        self.xs = np.array(xs, dtype=float)
+        self.ys = np.array(ys, dtype=float)
+        self.parents = np.array(parents, dtype=np.intp)
+        self.update_subtree_bounds()
+        return self
+
+    def update_subtree_bounds(self):
+        """
+        Tính kích thước và hộp bao của mọi cây con, gộp từng tầng từ dưới lên bằng NumPy.
+        """
+        n = len(self.values)
+        self.sizes = np.ones(n, dtype=np.intp)
+        self.xmin = self.xs.copy()
+        self.xmax = self.xs.copy()
+        self.ymin = self.ys.copy()
+        if n == 0:
+            return
+        depths = (-self.ys).astype(np.intp)
+        order = np.argsort(depths, kind="stable")
+        bounds = np.searchsorted(depths[order], np.arange(depths.max() + 2))
+        for depth in range(int(depths.max()), 0, -1):
+            children = order[bounds[depth]:bounds[depth + 1]]
+            parents = self.parents[children]
+            np.add.at(self.sizes, parents, self.sizes[children])
+            np.minimum.at(self.xmin, parents, self.xmin[children])
+            np.maximum.at(self.xmax, parents, self.xmax[children])
+            np.minimum.at(self.ymin, parents, self.ymin[children])
+
+    def positions(self):
+        return dict(zip(self.values, zip(self.xs.tolist(), self.ys.tolist())))
+
+    def segments(self):
+        """
+        Các cạnh cha-con dưới dạng mảng (số cạnh, 2, 2) cho LineCollection.
+        """
+        child = np.nonzero(self.parents >= 0)[0]
+        parent = self.parents[child]
+        return np.stack([np.column_stack([self.xs[parent], self.ys[parent]]),
+                         np.column_stack([self.xs[child], self.ys[child]])], axis=1)
 
-def generate_unique_random_numbers(count, min_val, max_val):
-    if max_val - min_val + 1 < count:
-        raise ValueError("Khoảng giá trị không đủ để tạo các giá trị ngẫu nhiên không trùng lặp!")
-    return random.sample(range(min_val, max_val + 1), count)
 
-def export_tree(root):
+HIT_RADIUS = 0.5  # Bán kính (đơn vị dữ liệu) để xác định chuột trúng một nút
+
+
+class NodeGrid:
     """
-    Xuất cây dưới dạng danh sách các cấp độ.
+    Lưới đều chia mặt phẳng thành các ô cạnh cell_size; chỉ số các nút được sắp
+    theo mã ô để tra các ô lân cận bằng np.searchsorted. Chỉ dựng lại khi bố cục đổi.
     """
-    if not root:
-        return []
-    levels = []
-    queue = deque([root])
-    while queue:
-        level = []
-        for _ in range(len(queue)):
-            node = queue.popleft()
-            level.append(node.val if node else None)
-            if node:
-                queue.append(node.left)
-                queue.append(node.right)
-        levels.append(level)
-    return levels
 
+    def __init__(self, xs, ys, values, cell_size=HIT_RADIUS):
+        self.xs = xs
+        self.ys = ys
+        self.values = values
+        self.cell_size = cell_size
+        self.rows = 0
+        if len(xs) == 0:
+            return
+        self.x0 = xs.min()
+        self.y0 = ys.min()
+        cells_x = ((xs - self.x0) // cell_size).astype(np.int64)
+        cells_y = ((ys - self.y0) // cell_size).astype(np.int64)
+        self.rows = int(cells_y.max()) + 1
+        keys = cells_x * self.rows + cells_y
+        self.order = np.argsort(keys, kind="stable")
+        self.keys = keys[self.order]
+
+    def candidates(self, x, y):
+        """
+        Chỉ số các nút nằm trong 3x3 ô quanh điểm (x, y).
+        """
+        cell_x = int((x - self.x0) // self.cell_size)
+        cell_y = int((y - self.y0) // self.cell_size)
+        rows = [r for r in (cell_y - 1, cell_y, cell_y + 1) if 0 <= r < self.rows]
+        if cell_x < -1 or not rows:
+            return np.empty(0, dtype=np.intp)
+        wanted = np.array([c * self.rows + r for c in (cell_x - 1, cell_x, cell_x + 1) if c >= 0 for r in rows])
+        starts = np.searchsorted(self.keys, wanted, side="left")
+        ends = np.searchsorted(self.keys, wanted, side="right")
+        return np.concatenate([self.order[s:e] for s, e in zip(starts, ends)])
+
+    def nearest(self, x, y, radius=HIT_RADIUS, accept=None):
+        """
+        Giá trị của nút gần (x, y) nhất trong bán kính radius thỏa accept(value), hoặc None.
+        """
+        if self.rows == 0:
+            return None
+        found = self.candidates(x, y)
+        if len(found) == 0:
+            return None
+        distances = (self.xs[found] - x) ** 2 + (self.ys[found] - y) ** 2
+        for i in np.argsort(distances):
+            if distances[i] >= radius * radius:
+                break
+            value = self.values[found[i]]
+            if accept is None or accept(value):
+                return value
+        return None
+
+
+# Mức chi tiết (level of detail) khi vẽ cây lớn
+NODE_DIAMETER_POINTS = 1500 ** 0.5  # Đường kính nút lớn nhất (point), tương ứng s=1500
+LOD_COLLAPSE_PIXELS = 24  # Cây con có hộp bao hẹp hơn ngưỡng này (pixel) được gộp thành một ký hiệu
+VIEW_MARGIN = 1.0  # Lề quanh cây khi hiển thị toàn bộ
+ZOOM_STEP = 1.25  # Hệ số phóng mỗi nấc lăn chuột
+TRAVERSAL_ANIMATION_LIMIT = 2000  # Cây lớn hơn được duyệt trong nền và hiện kết quả một lần, không hoạt ảnh
+RB_NODE_COLORS = {RED: "lightcoral", BLACK: "darkgray"}  # Màu vẽ nút của cây đỏ-đen
+BTREE_DRAW_LIMIT = 128  # Số nút B+ tối đa được vẽ; các tầng sâu hơn chỉ được ghi chú
+BTREE_LABEL_KEYS = 6  # Nút B+ nhiều khóa hơn chỉ hiện các khóa đầu và cuối
+BTREE_LEVEL_GAP = 60  # Khoảng cách giữa hai tầng nút B+ (point)
+BTREE_BOX_GAP = 16  # Khoảng trống giữa hai nút B+ kề nhau (point)
 
-def import_tree(levels):
+
+def default_node_color(value):
+    return "lightblue"
+
+
+def fit_view(layout):
     """
-    Tạo lại cây từ danh sách các cấp độ.
+    Khung nhìn (xlim, ylim) chứa toàn bộ cây.
     """
-    if not levels or not levels[0]:
-        return None
-    root = Node(levels[0][0])
-    queue = deque([root])
-    index = 1
-    while queue and index < len(levels):
-        node = queue.popleft()
-        if node:
-            left_val = levels[index].pop(0) if levels[index] else None
-            right_val = levels[index].pop(0) if levels[index] else None
-
-            node.left = Node(left_val) if left_val is not None else None
-            node.right = Node(right_val) if right_val is not None else None
-
-            queue.append(node.left)
-            queue.append(node.right)
-
-        if not levels[index]:
-            index += 1
-    return root
+    if len(layout) == 0:
+        return (-VIEW_MARGIN, VIEW_MARGIN), (-VIEW_MARGIN, VIEW_MARGIN)
+    return ((layout.xmin[0] - VIEW_MARGIN, layout.xmax[0] + VIEW_MARGIN),
+            (layout.ymin[0] - VIEW_MARGIN, VIEW_MARGIN))
+
+
+def select_visible(layout, xlim, ylim, px_per_x, px_per_y, margin_x, margin_y):
+    """
+    Quét mảng tiền tự và nhảy qua cả cây con khi hộp bao của nó nằm ngoài khung nhìn
+    hoặc hẹp hơn LOD_COLLAPSE_PIXELS (các nút bên trong không còn phân biệt được). Chỉ tốn thời gian cho phần cây thực sự được vẽ.
+    Trả về (chỉ số các nút được vẽ, chỉ số gốc các cây con bị gộp).
+    """
+    drawn, collapsed = [], []
+    x0, x1 = xlim[0] - margin_x, xlim[1] + margin_x
+    y0, y1 = ylim[0] - margin_y, ylim[1] + margin_y
+    xs, ys, sizes = layout.xs, layout.ys, layout.sizes
+    xmin, xmax, ymin = layout.xmin, layout.xmax, layout.ymin
+    i, n = 0, len(layout)
+    while i < n:
+        if xmax[i] < x0 or xmin[i] > x1 or ymin[i] > y1 or ys[i] < y0:
+            i += sizes[i]  # Cả cây con nằm ngoài khung nhìn
+        elif sizes[i] > 1 and (xmax[i] - xmin[i]) * px_per_x < LOD_COLLAPSE_PIXELS:
+            collapsed.append(i)
+            i += sizes[i]
+        else:
+            drawn.append(i)
+            i += 1
+    return np.array(drawn, dtype=np.intp), np.array(collapsed, dtype=np.intp)
+
+
+def label_width(text):
+    """
+    Chiều rộng nhãn tính theo point.
+    """
+    label_path(text)  # Đảm bảo các ký tự đã có trong glyph_cache
+    return sum(glyph_cache[char][2] for char in text)
+
+
+def visible_labels(xs, ys, widths, px_per_x, px_per_y):
+    """
+    Mặt nạ các nhãn không chồng lên nhãn kề bên trong cùng một hàng (đơn vị pixel).
+    """
+    show = np.full(len(xs), px_per_y >= LABEL_FONT.get_size_in_points() * 1.5)
+    if len(xs) < 2 or not show.any():
+        return show
+    order = np.lexsort((xs, ys))
+    x, y, w = xs[order] * px_per_x, ys[order], widths[order]
+    same_row = y[1:] == y[:-1]
+    fits = (x[1:] - x[:-1]) >= (w[1:] + w[:-1]) / 2 + 2
+    clash = same_row & ~fits
+    hidden = np.zeros(len(xs), dtype=bool)
+    hidden[1:] |= clash
+    hidden[:-1] |= clash
+    show[order[hidden]] = False
+    return show
+
+
+def render_tree(ax, layout, node_color, xlim=None, ylim=None):
+    """
+    Vẽ phần cây nằm trong khung nhìn bằng các collection của matplotlib: các nút là
+    một PathCollection, các cạnh là một LineCollection, các nhãn là một PathCollection.
+    Cây con quá nhỏ trên màn hình được thay bằng một ký hiệu vuông ghi số nút/chiều cao;
+    nhãn chồng nhau bị ẩn.
+    Trả về (collection của nút, chỉ số các nút được vẽ, kích thước marker).
+    """
+    if xlim is None or ylim is None:
+        xlim, ylim = fit_view(layout)
+    ax.set_xlim(*xlim)
+    ax.set_ylim(*ylim)
+    ax.set_axis_off()
+    dpi = ax.figure.dpi
+    px_per_x = ax.bbox.width / (xlim[1] - xlim[0])
+    px_per_y = ax.bbox.height / (ylim[1] - ylim[0])
+
+    # Nút thu nhỏ theo mức phóng để các nút cạnh nhau không chồng lên nhau
+    diameter_px = min(NODE_DIAMETER_POINTS * dpi / 72, 0.9 * MIN_SEPARATION * px_per_x, 0.9 * px_per_y)
+    marker_size = (max(diameter_px, 2) * 72 / dpi) ** 2
+    margin_x = diameter_px / px_per_x
+    margin_y = diameter_px / px_per_y
+
+    drawn, collapsed = select_visible(layout, xlim, ylim, px_per_x, px_per_y, margin_x, margin_y)
+    markers = np.concatenate([drawn, collapsed])
+    children = markers[layout.parents[markers] >= 0]
+    parents = layout.parents[children]
+    segments = np.stack([np.column_stack([layout.xs[parents], layout.ys[parents]]),
+                         np.column_stack([layout.xs[children], layout.ys[children]])], axis=1)
+    ax.add_collection(LineCollection(segments.reshape(-1, 2, 2), colors="black", linewidths=1, zorder=1),
+                      autolim=False)
+
+    values = [layout.values[i] for i in drawn]
+    collection = ax.scatter(layout.xs[drawn], layout.ys[drawn], s=marker_size,
+                            c=[node_color(v) for v in values], zorder=2)
+    if len(collapsed):
+        ax.scatter(layout.xs[collapsed], layout.ys[collapsed], s=marker_size, marker="s",
+                   c="lightgray", edgecolors="gray", zorder=2)
+
+    # Nhãn: giá trị cho nút, "số nút/h chiều cao" cho cây con bị gộp
+    texts = [str(v) for v in values]
+    heights = np.rint(layout.ys[collapsed] - layout.ymin[collapsed]).astype(int) + 1
+    texts += [f"{size}/h{height}" for size, height in zip(layout.sizes[collapsed], heights)]
+    widths = np.array([label_width(t) * dpi / 72 for t in texts])
+    show = visible_labels(layout.xs[markers], layout.ys[markers], widths, px_per_x, px_per_y)
+    shown = markers[show]
+    labels = PathCollection([label_path(t) for t, s in zip(texts, show) if s], sizes=[1],
+                            offsets=np.column_stack([layout.xs[shown], layout.ys[shown]]),
+                            offset_transform=ax.transData, transform=IdentityTransform(),
+                            facecolors="black", edgecolors="none", zorder=3)
+    ax.add_collection(labels, autolim=False)
+    return collection, drawn, marker_size
+
+
+def btree_label(keys):
+    labels = [str(key) for key in keys]
+    if len(labels) > BTREE_LABEL_KEYS:
+        half = BTREE_LABEL_KEYS // 2
+        labels = labels[:half] + ["…"] + labels[-half:]
+    return " | ".join(labels) or "∅"
+
+
+def render_btree(ax, tree, selected=(), xlim=None, ylim=None):
+    """
+    Vẽ cây B+ dạng gộp khóa: mỗi nút là một hộp ghi các khóa của nó, tọa độ tính theo point.
+    Tầng sâu nhất được vẽ dàn đều, nút phía trên nằm giữa các con; lá nối nhau bằng nét đứt.
+    Chỉ vẽ các tầng trên cùng trong giới hạn BTREE_DRAW_LIMIT nút.
+    """
+    levels = tree.levels(BTREE_DRAW_LIMIT)
+    labels = {node: btree_label(node.keys) for level in levels for node in level}
+    char_width = 0.6 * LABEL_FONT.get_size_in_points()  # Ước lượng; nhãn có dấu cách nên không dùng label_width
+    widths = {node: len(label) * char_width + BTREE_BOX_GAP for node, label in labels.items()}
+    positions = {}
+    x = 0
+    for node in levels[-1]:
+        positions[node] = (x + widths[node] / 2, -(len(levels) - 1) * BTREE_LEVEL_GAP)
+        x += widths[node]
+    for depth in range(len(levels) - 2, -1, -1):
+        for node in levels[depth]:
+            first, last = positions[node.children[0]][0], positions[node.children[-1]][0]
+            positions[node] = ((first + last) / 2, -depth * BTREE_LEVEL_GAP)
+
+    if xlim is None or ylim is None:
+        xlim = (-BTREE_BOX_GAP, x + BTREE_BOX_GAP)
+        ylim = (-(len(levels) - 0.5) * BTREE_LEVEL_GAP, BTREE_LEVEL_GAP / 2)
+    ax.set_xlim(*xlim)
+    ax.set_ylim(*ylim)
+    ax.set_axis_off()
+
+    box = BTREE_LEVEL_GAP / 5  # Nửa chiều cao hộp (xấp xỉ), để cạnh nối vào mép hộp
+    edges = []
+    for level in levels[:-1]:
+        for node in level:
+            px, py = positions[node]
+            edges.extend(((px, py - box), (positions[child][0], positions[child][1] + box))
+                         for child in node.children)
+    ax.add_collection(LineCollection(edges, colors="black", linewidths=1, zorder=1), autolim=False)
+    if levels[-1][0].children is None:
+        chain = [((positions[a][0] + widths[a] / 2 - BTREE_BOX_GAP / 2, positions[a][1]),
+                  (positions[b][0] - widths[b] / 2 + BTREE_BOX_GAP / 2, positions[b][1]))
+                 for a, b in zip(levels[-1], levels[-1][1:])]
+        ax.add_collection(LineCollection(chain, colors="gray", linestyles="dashed", zorder=1), autolim=False)
+    else:
+        ax.text(x / 2, -len(levels) * BTREE_LEVEL_GAP + box, f"… {tree.height - len(levels)} tầng dưới không được vẽ",
+                ha="center", va="center", color="gray")
+
+    # Tọa độ tính theo cỡ chữ gốc: thu nhỏ chữ khi khung nhìn rộng hơn vùng vẽ để các hộp không chồng nhau
+    scale = min(1.0, ax.bbox.width * 72 / ax.figure.dpi / (xlim[1] - xlim[0]))
+    font = LABEL_FONT.copy()
+    font.set_size(max(1.0, LABEL_FONT.get_size_in_points() * scale))
+    for node, (px, py) in positions.items():
+        color = "red" if node in selected else "lightblue" if node.children is not None else "lightgreen"
+        ax.text(px, py, labels[node], ha="center", va="center", fontproperties=font, zorder=2,
+                bbox=dict(boxstyle="round,pad=0.3", facecolor=color, edgecolor="black"))
+
+
 class TreeCanvas(FigureCanvas):
     def __init__(self, parent=None):
-        fig, self.ax = plt.subplots(figsize=(10, 8))
+        fig = Figure(figsize=(10, 8))  # Nhúng vào Qt nên không cần pyplot
+        self.ax = fig.add_subplot()
         super().__init__(fig)
         self.setParent(parent)
         self.selected_nodes = set()  # Các nút được chọn bằng chuột trái
         self.node_positions = {}  # Tọa độ logic của các nút
+        self.node_collection = None  # PathCollection chứa tất cả các nút đã vẽ
+        self.node_values = []  # Giá trị các nút theo thứ tự trong node_collection
+        self.layout = TreeLayout()  # Bố cục gọn, chỉ tính lại phần cây bị thay đổi
+        self.node_color = default_node_color  # Màu nút theo giá trị (TreeApp đổi khi là cây đỏ-đen)
+        self.btree = None  # Cây B+ đang hiển thị (thay cho cây Node)
+        self.btree_selected = set()  # Các nút B+ được tô (khi tìm kiếm)
+        self.node_grid = NodeGrid(self.layout.xs, self.layout.ys, [])  # Lưới tra nút khi click/kéo
         self.context_menu = QtWidgets.QMenu(self)  # Menu chuột phải
         self.dragging_node = None  # Nút đang được kéo
         self.target_node = None  # Nút mục tiêu để đổi chỗ
 
+        # Khung nhìn (xlim, ylim) khi phóng to/kéo; None là hiển thị toàn bộ cây
+        self.view = None
+        self.view_root = None  # Gốc cây ứng với khung nhìn hiện tại
+        self.marker_size = 1500
+        self.pan_start = None  # (vị trí chuột theo pixel, khung nhìn) khi bắt đầu kéo bằng chuột giữa
+        self.render_timer = QtCore.QTimer(self)
+        self.render_timer.setSingleShot(True)
+        self.render_timer.timeout.connect(self.render_view)
+
+        # Lớp tô màu: chỉ vẽ các nút được chọn/kéo/mục tiêu đè lên nền đã lưu (blitting)
+        self.background = None
+        self.highlight_nodes = None
+        self.highlight_labels = None
+        self.highlight_timer = QtCore.QTimer(self)
+        self.highlight_timer.setSingleShot(True)
+        self.highlight_timer.timeout.connect(self.update_highlights)
+        screen = QtGui.QGuiApplication.primaryScreen()
+        refresh_rate = screen.refreshRate() if screen else 60
+        self.frame_interval = max(1, int(1000 / (refresh_rate or 60)))
+
         # Kết nối sự kiện chuột
         self.mpl_connect("button_press_event", self.on_mouse_click)
         self.mpl_connect("motion_notify_event", self.on_mouse_drag)
         self.mpl_connect("button_release_event", self.on_mouse_release)
+        self.mpl_connect("draw_event", self.on_draw)
+        self.mpl_connect("scroll_event", self.on_scroll)
 
     def display_tree(self, root):
         """
         Vẽ cây theo dạng từ trên xuống với các node không nằm chồng chéo nhau.
+        Khung nhìn được giữ nguyên khi vẫn là cây cũ (thêm/xóa/đổi chỗ nút).
+        """
+        if root is not self.view_root:
+            self.view = None
+            self.view_root = root
+        self.btree = None
+        self.layout.update(root)
+        self.render_view()
+
+    def display_btree(self, tree):
+        """
+        Vẽ cây B+ thay cho cây Node; các nút B+ không click/kéo được, chỉ phóng to/kéo khung nhìn.
         """
+        if tree is not self.view_root:
+            self.view = None
+            self.view_root = tree
+        self.btree = tree
+        self.layout.update(None)
+        self.render_view()
+
+    def render_view(self):
+        """
+        Vẽ lại phần cây trong khung nhìn hiện tại; chỉ các nút được vẽ mới có thể click/kéo.
+        """
+        self.render_timer.stop()
         self.ax.clear()
-        G = nx.DiGraph()
-        self.node_positions.clear()
+        xlim, ylim = self.view or (None, None)
+        if self.btree is not None:
+            render_btree(self.ax, self.btree, self.btree_selected, xlim, ylim)
+            self.node_collection, self.node_values, self.node_positions = None, [], {}
+            self.node_grid = NodeGrid(self.layout.xs, self.layout.ys, [])
+            self.highlight_nodes = self.highlight_labels = None
+            self.draw()
+            return
+        self.node_collection, drawn, self.marker_size = render_tree(self.ax, self.layout, self.node_color,
+                                                                    xlim, ylim)
+        self.node_values = [self.layout.values[i] for i in drawn]
+        self.node_positions = dict(zip(self.node_values,
+                                       zip(self.layout.xs[drawn].tolist(), self.layout.ys[drawn].tolist())))
+        self.node_grid = NodeGrid(self.layout.xs[drawn], self.layout.ys[drawn], self.node_values)
+        self.highlight_nodes = self.ax.scatter([], [], s=self.marker_size, zorder=4, animated=True)
+        self.highlight_labels = PathCollection([], sizes=[1], offsets=np.empty((0, 2)),
+                                               offset_transform=self.ax.transData, transform=IdentityTransform(),
+                                               facecolors="black", edgecolors="none", zorder=5, animated=True)
+        self.ax.add_collection(self.highlight_labels, autolim=False)
+        self.draw()
 
-        # Tính toán vị trí x, y của các nút
-        def calculate_positions(node, depth=0, x_pos=0, x_gap=1.5):
-            if node is not None:
-                self.node_positions[node.val] = (x_pos, -depth)  # Y ngược xuống dưới
-                G.add_node(node.val)
+    def highlight_colors(self):
+        """
+        Màu của các nút đang được tô, theo thứ tự ưu tiên: chọn > kéo > mục tiêu.
+        """
+        colors = {}
+        if self.target_node is not None:
+            colors[self.target_node] = "yellow"
+        if self.dragging_node is not None:
+            colors[self.dragging_node] = "green"
+        for node in self.selected_nodes:
+            colors[node] = "red"
+        return {node: color for node, color in colors.items() if node in self.node_positions}
+
+    def on_draw(self, event):
+        """
+        Sau mỗi lần vẽ toàn bộ, lưu lại nền rồi vẽ lớp tô màu lên trên.
+        """
+        self.background = self.copy_from_bbox(self.ax.bbox)
+        self.draw_highlights()
 
-                if node.left:
-                    G.add_edge(node.val, node.left.val)
-                    calculate_positions(node.left, depth + 1, x_pos - x_gap, x_gap / 2)
+    def draw_highlights(self):
+        if self.highlight_nodes is None:
+            return
+        colors = self.highlight_colors()
+        offsets = [self.node_positions[node] for node in colors] or np.empty((0, 2))
+        self.highlight_nodes.set_offsets(offsets)
+        self.highlight_nodes.set_facecolors(list(colors.values()))
+        self.highlight_labels.set_paths([label_path(str(node)) for node in colors])
+        self.highlight_labels.set_offsets(offsets)
+        self.ax.draw_artist(self.highlight_nodes)
+        self.ax.draw_artist(self.highlight_labels)
+
+    def update_highlights(self):
+        """
+        Chỉ vẽ lại các nút đổi màu: khôi phục nền đã lưu, vẽ lớp tô màu và blit.
+        Chi phí tỉ lệ với số nút được tô, không phụ thuộc kích thước cây.
+        """
+        self.highlight_timer.stop()
+        if self.background is None:
+            self.draw_idle()
+            return
+        self.restore_region(self.background)
+        self.draw_highlights()
+        self.blit(self.ax.bbox)
 
-                if node.right:
-                    G.add_edge(node.val, node.right.val)
-                    calculate_positions(node.right, depth + 1, x_pos + x_gap, x_gap / 2)
-
-        calculate_positions(root)
-
-        # Tô màu các nút
-        node_colors = [
-            "red" if n in self.selected_nodes else
-            "green" if n == self.dragging_node else
-            "yellow" if n == self.target_node else
-            "lightblue"
-            for n in G.nodes()
-        ]
-
-        nx.draw(
-            G,
-            self.node_positions,
-            with_labels=True,
-            labels={n: n for n in G.nodes()},
-            node_size=1500,
-            node_color=node_colors,
-            font_size=12,
-            font_weight="bold",
-            ax=self.ax,
-            arrows=False,
-        )
-        self.draw()
+    def schedule_highlights(self):
+        """
+        Gộp các lần cập nhật liên tiếp (ví dụ khi rê chuột) theo tần số làm tươi màn hình.
+        """
+        if not self.highlight_timer.isActive():
+            self.highlight_timer.start(self.frame_interval)
+
+    def current_view(self):
+        return self.ax.get_xlim(), self.ax.get_ylim()
+
+    def on_scroll(self, event):
+        """
+        Lăn chuột để phóng to/thu nhỏ quanh vị trí con trỏ.
+        """
+        if event.xdata is None or event.ydata is None:
+            return
+        factor = 1 / ZOOM_STEP if event.button == "up" else ZOOM_STEP
+        (x0, x1), (y0, y1) = self.current_view()
+        x, y = event.xdata, event.ydata
+        self.view = ((x - (x - x0) * factor, x + (x1 - x) * factor),
+                     (y - (y - y0) * factor, y + (y1 - y) * factor))
+        self.schedule_render()
+
+    def schedule_render(self):
+        """
+        Gộp các lần phóng/kéo liên tiếp thành một lần vẽ mỗi khung hình.
+        """
+        if not self.render_timer.isActive():
+            self.render_timer.start(self.frame_interval)
 
     def on_mouse_click(self, event):
         """
         Xử lý sự kiện click chuột.
         Chuột trái: Chọn hoặc bỏ chọn nút.
         Chuột phải: Hiện context menu cho nút đã được chọn.
+        Chuột giữa: Kéo để di chuyển khung nhìn, nhấp đúp để hiển thị toàn bộ cây.
         """
+        if event.button == 2:
+            if event.dblclick:
+                self.view = None
+                self.schedule_render()
+            else:
+                self.pan_start = (event.x, event.y, self.current_view())
+            return
         if event.xdata is None or event.ydata is None:
             return  # Không click vào vùng hợp lệ
 
-        clicked_node = None
-        min_distance = float("inf")
-
         # Xác định nút gần nhất với vị trí chuột
-        for node, (x, y) in self.node_positions.items():
-            distance = ((event.xdata - x) ** 2 + (event.ydata - y) ** 2) ** 0.5
-            if distance < 0.5 and distance < min_distance:  # Ngưỡng 0.5 để xác định nút
-                clicked_node = node
-                min_distance = distance
+        clicked_node = self.node_grid.nearest(event.xdata, event.ydata)
 
-        if clicked_node:
+        if clicked_node is not None:
             if event.button == 1:  # Chuột trái
                 self.toggle_node_selection(clicked_node)
             elif event.button == 3:  # Chuột phải
@@ -323,7 +810,7 @@ class TreeCanvas(FigureCanvas):
             self.selected_nodes.remove(node)
         else:
             self.selected_nodes.add(node)
-        self.display_tree(self.parent().tree_root)  # Cập nhật lại cây
+        self.update_highlights()  # Chỉ vẽ lại các nút đổi màu
 
     def show_context_menu(self, event, node):
         """
@@ -353,31 +840,38 @@ class TreeCanvas(FigureCanvas):
         """
         Xử lý kéo nút bằng chuột.
         """
+        if self.pan_start is not None:
+            # Dịch khung nhìn theo số pixel chuột đã di chuyển
+            start_x, start_y, ((x0, x1), (y0, y1)) = self.pan_start
+            dx = (event.x - start_x) * (x1 - x0) / self.ax.bbox.width
+            dy = (event.y - start_y) * (y1 - y0) / self.ax.bbox.height
+            self.view = ((x0 - dx, x1 - dx), (y0 - dy, y1 - dy))
+            self.schedule_render()
+            return
         if event.xdata is None or event.ydata is None:
             return  # Không drag vào vùng hợp lệ
 
+        previous = (self.dragging_node, self.target_node)
         if self.dragging_node is None:
-            # Xác định nút được kéo
-            for node, (x, y) in self.node_positions.items():
-                distance = ((event.xdata - x) ** 2 + (event.ydata - y) ** 2) ** 0.5
-                if distance < 0.5 and node in self.selected_nodes:  # Chỉ kéo nút đã được chọn
-                    self.dragging_node = node
-                    break
+            # Xác định nút được kéo (chỉ kéo nút đã được chọn)
+            self.dragging_node = self.node_grid.nearest(event.xdata, event.ydata,
+                                                        accept=lambda node: node in self.selected_nodes)
         else:
-            # Xác định nút mục tiêu
-            self.target_node = None
-            for node, (x, y) in self.node_positions.items():
-                distance = ((event.xdata - x) ** 2 + (event.ydata - y) ** 2) ** 0.5
-                if distance < 0.5 and node != self.dragging_node:  # Không được trùng nút kéo
-                    self.target_node = node
-                    break
+            # Xác định nút mục tiêu (không được trùng nút kéo)
+            self.target_node = self.node_grid.nearest(event.xdata, event.ydata,
+                                                      accept=lambda node: node != self.dragging_node)
 
-        self.display_tree(self.parent().tree_root)
+        if (self.dragging_node, self.target_node) != previous:
+            self.schedule_highlights()
 
     def on_mouse_release(self, event):
         """
         Xử lý khi thả nút chuột để đổi chỗ các nút.
         """
+        if event.button == 2:
+            self.pan_start = None
+            return
+        swapped = False
         if self.dragging_node and self.target_node:
             # Đổi giá trị giữa dragging_node và target_node
             dragging_node_obj = self.parent().find_node(self.parent().tree_root, self.dragging_node)
@@ -385,12 +879,18 @@ class TreeCanvas(FigureCanvas):
 
             if dragging_node_obj and target_node_obj:
                 dragging_node_obj.val, target_node_obj.val = target_node_obj.val, dragging_node_obj.val
+                self.parent().node_index.swap(dragging_node_obj, target_node_obj)
+                self.parent().journal_record(OP_SWAP, self.dragging_node, self.target_node)
+                swapped = True
 
         # Reset trạng thái kéo
         self.dragging_node = None
         self.target_node = None
 
-        self.display_tree(self.parent().tree_root)
+        if swapped:
+            self.display_tree(self.parent().tree_root)  # Nhãn thay đổi nên vẽ lại toàn bộ
+        else:
+            self.update_highlights()
 
 
 class ManualTreeDialog(QtWidgets.QDialog):
@@ -399,6 +899,7 @@ class ManualTreeDialog(QtWidgets.QDialog):
         self.tree_type = tree_type
         self.tree_root = None
         self.node_dict = {}  # Lưu {node_value: [left_child, right_child]}
+        self.node_index = NodeIndex()  # Tra cứu nút theo giá trị trong O(1)
         self.initUI()
 
     def initUI(self):
@@ -482,6 +983,7 @@ class ManualTreeDialog(QtWidgets.QDialog):
                 return
 
             self.tree_root = Node(value)
+            self.node_index.add(self.tree_root, None)
             self.node_dict[value] = [None, None]
             self.update_table()
             self.update_parent_combo()
@@ -509,15 +1011,18 @@ class ManualTreeDialog(QtWidgets.QDialog):
                     QtWidgets.QMessageBox.warning(self, "Lỗi", "Nút con trái đã tồn tại!")
                     return
                 parent_node.left = Node(value)
+                self.node_index.add(parent_node.left, parent_node)
                 self.node_dict[parent_value][0] = value
             elif side == "right":
                 if parent_node.right is not None:
                     QtWidgets.QMessageBox.warning(self, "Lỗi", "Nút con phải đã tồn tại!")
                     return
                 parent_node.right = Node(value)
+                self.node_index.add(parent_node.right, parent_node)
                 self.node_dict[parent_value][1] = value
 
             self.node_dict[value] = [None, None]
+            invalidate_layout(parent_node, self.node_index)
             self.update_table()
             current_index = self.parent_combo.currentIndex()
             self.update_parent_combo()
@@ -541,6 +1046,7 @@ class ManualTreeDialog(QtWidgets.QDialog):
             node = self.find_node(self.tree_root, value)
             if node:
                 node.left, node.right = node.right, node.left
+                invalidate_layout(node, self.node_index)
                 self.update_table()
                 self.parent().canvas.display_tree(self.tree_root)
                 QtWidgets.QMessageBox.information(self, "Thành công", "Đã đổi vị trí trái và phải!")
@@ -573,7 +1079,7 @@ class ManualTreeDialog(QtWidgets.QDialog):
             new_value = int(self.node_input.text())
             parent_node = self.find_node(self.tree_root, parent_value)
 
-            if self.tree_type in ["BST", "AVL"]:
+            if self.tree_type in ["BST", "AVL", "Đỏ-đen", "Splay", "Scapegoat"]:
                 min_value, max_value = self.get_valid_range(self.tree_root, parent_value)
                 if new_value < min_value or new_value > max_value:
                     self.add_left_button.setDisabled(True)
@@ -601,10 +1107,9 @@ class ManualTreeDialog(QtWidgets.QDialog):
             return self.get_valid_range(root.right, target_value, root.val, max_val)
 
     def find_node(self, root, value):
-        if not root or root.val == value:
-            return root
-        left = self.find_node(root.left, value)
-        return left if left else self.find_node(root.right, value)
+        if root is self.tree_root:
+            return self.node_index.get(value)
+        return find_node(root, value)
 
     def done_button_pressed(self):
         if not self.tree_root:
@@ -617,12 +1122,20 @@ class TreeApp(QtWidgets.QWidget):
     def __init__(self):
         super().__init__()
         self.tree_root = None
+        self.node_index = NodeIndex()  # Chỉ mục giá trị -> nút của cây hiện tại
+        self.btree = None  # Cây B+ hiện tại (khi chọn loại cây B+, tree_root là None)
         self.manual_tree_type = None  # Loại cây thủ công đang được chọn
         self.paused = False  # Trạng thái tạm dừng
+        self.splay_after_search = False  # Splay khóa vừa tìm khi hoạt ảnh tìm kiếm kết thúc
         self.traversal_timer = QtCore.QTimer(self)
         self.traversal_index = 0  # Chỉ số cho quá trình duyệt cây
-        self.traversal_nodes = []  # Danh sách các nút để duyệt
+        self.traversal_nodes = None  # Bộ sinh các nút để duyệt (sinh dần từng bước)
         self.traversal_result = []
+        self.current_job = None  # TreeJob đang chạy nền (dựng/xóa/nhập/xuất/duyệt)
+        self.journal = None  # TreeJournal ghi lại các thao tác sửa cây (nếu đang bật)
+        self.journal_timer = QtCore.QTimer(self)
+        self.journal_timer.setSingleShot(True)
+        self.journal_timer.timeout.connect(self.sync_journal)
         self.initUI()
         self.showMaximized()
 
@@ -677,7 +1190,8 @@ class TreeApp(QtWidgets.QWidget):
         # Lựa chọn loại cây và nhập số lượng nút
         input_layout = QtWidgets.QHBoxLayout()
         self.tree_type_combo = QtWidgets.QComboBox()
-        self.tree_type_combo.addItems(["Cây nhị phân thông thường", "BST", "AVL"])
+        self.tree_type_combo.addItems(TREE_TYPES + [BTREE_TYPE])
+        self.tree_type_combo.currentTextChanged.connect(self.tree_type_changed)
         input_layout.addWidget(QtWidgets.QLabel("Chọn loại cây:"))
         input_layout.addWidget(self.tree_type_combo)
 
@@ -697,6 +1211,11 @@ class TreeApp(QtWidgets.QWidget):
         input_layout.addWidget(QtWidgets.QLabel("Max:"))
         input_layout.addWidget(self.max_input)
 
+        # Bậc (số con tối đa mỗi nút) khi tạo cây B+
+        self.btree_order_input = QtWidgets.QLineEdit()
+        self.btree_order_input.setText("4")
+        input_layout.addWidget(QtWidgets.QLabel("Bậc B+:"))
+        input_layout.addWidget(self.btree_order_input)
 
         # Nút tạo cây ngẫu nhiên
         self.create_random_tree_button = QtWidgets.QPushButton("Tạo cây ngẫu nhiên")
@@ -712,9 +1231,23 @@ class TreeApp(QtWidgets.QWidget):
         self.create_manual_tree_button.clicked.connect(self.create_manual_tree)
         input_layout.addWidget(self.create_manual_tree_button)
 
+        # Nút xóa nhiều nút trong nền
+        self.delete_many_button = QtWidgets.QPushButton("Xóa nhiều nút")
+        self.delete_many_button.setStyleSheet(
+            "background-color: #4682B4; color: white; font-weight: bold; font-size: 14px;")
+        self.delete_many_button.clicked.connect(self.delete_many_nodes)
+        input_layout.addWidget(self.delete_many_button)
+
+        # Nút cân bằng lại cây (DSW) cho các cây không lưu thông tin cân bằng ở nút
+        self.rebalance_button = QtWidgets.QPushButton("Cân bằng lại")
+        self.rebalance_button.setStyleSheet(
+            "background-color: #4682B4; color: white; font-weight: bold; font-size: 14px;")
+        self.rebalance_button.clicked.connect(self.rebalance_tree)
+        input_layout.addWidget(self.rebalance_button)
+
         # Lựa chọn kiểu duyệt cây
         self.traversal_type_combo = QtWidgets.QComboBox()
-        self.traversal_type_combo.addItems(["Preorder", "Inorder", "Postorder"])
+        self.traversal_type_combo.addItems(list(TRAVERSALS))
         input_layout.addWidget(QtWidgets.QLabel("Chọn kiểu duyệt cây:"))
         input_layout.addWidget(self.traversal_type_combo)
 
@@ -782,6 +1315,13 @@ class TreeApp(QtWidgets.QWidget):
         self.import_tree_button.clicked.connect(self.import_tree_from_file)
         input_layout.addWidget(self.import_tree_button)
 
+        # Nút bật nhật ký thao tác (tự lưu và khôi phục phiên làm việc)
+        self.journal_button = QtWidgets.QPushButton("Nhật ký")
+        self.journal_button.setStyleSheet(
+            "background-color: #4682B4; color: white; font-weight: bold; font-size: 14px;")
+        self.journal_button.clicked.connect(self.open_journal)
+        input_layout.addWidget(self.journal_button)
+
         main_layout.addLayout(slider_layout)
     def create_random_tree(self):
         try:
@@ -801,23 +1341,145 @@ class TreeApp(QtWidgets.QWidget):
             QtWidgets.QMessageBox.warning(self, "Lỗi đầu vào", "Vui lòng nhập giá trị min và max hợp lệ!")
             return
 
-        tree_type = self.tree_type_combo.currentText()
-        self.tree_root = None
+        if node_count > max_val - min_val + 1:
+            QtWidgets.QMessageBox.warning(self, "Lỗi đầu vào",
+                                          "Khoảng giá trị không đủ để tạo các giá trị ngẫu nhiên không trùng lặp!")
+            return
+
+        # Dựng cây mới ngoài luồng giao diện; cây hiện tại giữ nguyên tới khi dựng xong
+        if self.tree_type_combo.currentText() == BTREE_TYPE:
+            order = self.btree_order()
+            if order:
+                self.run_job("Đang tạo cây...", "khóa", self.btree_built, "Không thể tạo cây",
+                             build_btree_task, node_count, min_val, max_val, order)
+            return
+        self.run_job("Đang tạo cây...", "nút", self.tree_built, "Không thể tạo cây",
+                     build_tree_task, self.tree_type_combo.currentText(), node_count, min_val, max_val)
 
+    def tree_built(self, result):
+        """
+        Thay cây và chỉ mục bằng cây vừa dựng xong rồi vẽ lại một lần.
+        """
+        self.tree_root, self.node_index = result
+        self.btree = None
+        self.traversal_nodes = None
+        self.journal_snapshot()
+        self.display_tree()
+
+    def btree_order(self):
         try:
-            keys = generate_unique_random_numbers(node_count, min_val, max_val)
-        except ValueError as e:
-            QtWidgets.QMessageBox.warning(self, "Lỗi đầu vào", str(e))
+            order = int(self.btree_order_input.text())
+            if order < 3:
+                raise ValueError
+            return order
+        except ValueError:
+            QtWidgets.QMessageBox.warning(self, "Lỗi đầu vào", "Bậc cây B+ phải là số nguyên từ 3 trở lên!")
+            return None
+
+    def btree_built(self, tree):
+        """
+        Thay cây hiện tại bằng cây B+ (không ghi nhật ký: nhật ký chỉ lưu cây Node).
+        """
+        self.btree = tree
+        self.tree_root, self.node_index = None, NodeIndex()
+        self.traversal_nodes = None
+        self.display_tree()
+
+    def ask_keys(self, title):
+        """
+        Hỏi một lô giá trị (danh sách cách nhau bởi dấu phẩy hoặc khoảng a-b); None nếu hủy hoặc sai.
+        """
+        text, ok = QtWidgets.QInputDialog.getText(self, title,
+                                                  "Nhập các giá trị (cách nhau bởi dấu phẩy) hoặc khoảng a-b:")
+        if not ok or not text.strip():
+            return None
+        try:
+            keys = []
+            for part in text.split(","):
+                low, dash, high = part.strip().partition("-")
+                if dash and low:
+                    keys.extend(range(int(low), int(high) + 1))
+                else:
+                    keys.append(int(part))
+        except ValueError:
+            QtWidgets.QMessageBox.warning(self, "Lỗi", "Vui lòng nhập các số nguyên hợp lệ!")
+            return None
+        return keys
+
+    def delete_many_nodes(self):
+        """
+        Xóa một lô giá trị (danh sách cách nhau bởi dấu phẩy hoặc khoảng a-b) trong nền.
+        """
+        btree_mode = self.tree_type_combo.currentText() == BTREE_TYPE
+        if not (self.btree if btree_mode else self.tree_root):
+            QtWidgets.QMessageBox.warning(self, "Lỗi", "Vui lòng tạo cây trước!")
+            return
+        keys = self.ask_keys("Xóa nhiều nút")
+        if keys is None:
             return
+        if btree_mode:
+            self.run_job("Đang xóa khóa...", "khóa", self.btree_keys_deleted, "Không thể xóa khóa",
+                         delete_btree_keys, self.btree, keys)
+            return
+        self.run_job("Đang xóa nút...", "nút", self.nodes_deleted, "Không thể xóa nút",
+                     delete_keys, self.tree_root, self.tree_type_combo.currentText(), keys)
+
+    def nodes_deleted(self, result):
+        self.tree_root, self.node_index, deleted = result
+        for key in deleted:
+            self.journal_record(OP_DELETE, key)
+        self.traversal_nodes = None
+        self.display_tree()
+        QtWidgets.QMessageBox.information(self, "Thành công", f"Đã xóa {len(deleted)} nút.")
 
-        for key in keys:
-            if tree_type == "Cây nhị phân thông thường":
-                self.tree_root = insert_binary(self.tree_root, key)
-            elif tree_type == "BST":
-                self.tree_root = insert_bst(self.tree_root, key)
-            elif tree_type == "AVL":
-                self.tree_root = insert_avl(self.tree_root, key)
+    def btree_keys_deleted(self, result):
+        self.btree, deleted = result
         self.display_tree()
+        QtWidgets.QMessageBox.information(self, "Thành công", f"Đã xóa {len(deleted)} khóa.")
+
+    def rebalance_tree(self):
+        """
+        Cân bằng lại toàn cây bằng DSW (O(n), không cấp phát thêm) và ghi vào nhật ký.
+        """
+        if self.tree_type_combo.currentText() not in ("BST", "Scapegoat", "Splay"):
+            QtWidgets.QMessageBox.warning(self, "Lỗi", "Chỉ cân bằng lại được cây BST, Scapegoat và Splay!")
+            return
+        if not self.tree_root:
+            QtWidgets.QMessageBox.warning(self, "Lỗi", "Vui lòng tạo cây trước!")
+            return
+        self.tree_root = rebalance_dsw(self.tree_root, self.node_index)
+        self.journal_record(OP_REBALANCE, 0)
+        self.invalidate_subtree(self.tree_root)  # Mọi nút đều có thể đổi con
+        self.display_tree()
+
+    def tree_type_changed(self, tree_type):
+        """
+        Người dùng đổi loại cây khi đã có cây: tính lại chiều cao (AVL) hoặc màu (đỏ-đen) để các
+        phép toán của loại mới chạy đúng, dựng lại cây nếu cần, và ghi vào nhật ký.
+        """
+        if tree_type not in TREE_TYPES or not self.tree_root:
+            return
+        root = convert_tree_type(self.tree_root, tree_type, self.node_index)
+        self.journal_record(OP_CONVERT, 0)
+        if root is not self.tree_root:
+            self.tree_root = root
+            self.traversal_nodes = None
+        self.display_tree()  # Màu nút đổi theo loại cây
+
+    def show_tree_type(self, tree_type):
+        """
+        Hiển thị loại của cây vừa nạp (đã đúng loại) mà không chuyển đổi cây.
+        """
+        self.tree_type_combo.blockSignals(True)
+        self.tree_type_combo.setCurrentText(tree_type)
+        self.tree_type_combo.blockSignals(False)
+
+    def invalidate_subtree(self, node):
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            node.layout = None
+            stack.extend(child for child in (node.left, node.right) if child)
 
     def create_manual_tree(self):
         """
@@ -825,13 +1487,26 @@ class TreeApp(QtWidgets.QWidget):
         Cập nhật cây và hiển thị trên canvas sau khi hoàn thành.
         """
         tree_type = self.tree_type_combo.currentText()
+        if tree_type == BTREE_TYPE:
+            # Cây B+ không có vị trí trái/phải để chọn: nhập các khóa rồi chèn lần lượt
+            order = self.btree_order()
+            keys = self.ask_keys("Tạo cây B+") if order else None
+            if keys is not None:
+                self.btree_built(build_btree(keys, order))
+            return
         dialog = ManualTreeDialog(self, tree_type)
 
         # Nếu người dùng nhấn "Hoàn tất" và tạo cây thành công
         if dialog.exec_() == QtWidgets.QDialog.Accepted:
+            if tree_type == "Đỏ-đen" and not color_red_black(dialog.tree_root):
+                QtWidgets.QMessageBox.warning(self, "Lỗi", "Hình dạng cây không tô được màu đỏ-đen!")
+                return
             self.tree_root = dialog.tree_root  # Lấy cây thủ công đã tạo
+            self.node_index = dialog.node_index
+            self.btree = None
+            self.journal_snapshot()
             self.display_tree()  # Hiển thị cây trên canvas
-            self.traversal_nodes.clear()  # Reset danh sách nút duyệt cũ
+            self.traversal_nodes = None  # Reset bộ sinh nút duyệt cũ
             QtWidgets.QMessageBox.information(self, "Thành công",
                                               "Cây thủ công đã được tạo thành công và sẵn sàng để duyệt!")
 
@@ -839,10 +1514,21 @@ class TreeApp(QtWidgets.QWidget):
         """
         Cập nhật và hiển thị cây hiện tại trên canvas.
         """
+        if self.tree_type_combo.currentText() == BTREE_TYPE:
+            if self.btree:
+                self.canvas.display_btree(self.btree)
+                levels = self.btree.levels()
+                self.node_list_textbox.setPlainText(
+                    "\n".join(" ".join(f"[{', '.join(map(str, node.keys))}]" for node in level) for level in levels))
+            return
         if self.tree_root:
+            if self.tree_type_combo.currentText() == "Đỏ-đen":
+                self.canvas.node_color = lambda value: RB_NODE_COLORS[self.node_index.get(value).color]
+            else:
+                self.canvas.node_color = default_node_color
             self.canvas.display_tree(self.tree_root)  # Hiển thị cây trên canvas
-            levels = self.get_levels(self.tree_root)  # Lấy các cấp độ trong cây
-            levels_text = "\n".join([", ".join(map(str, level)) for level in levels])
+            levels = iter_levels(self.tree_root)  # Sinh từng cấp độ trong cây
+            levels_text = "\n".join(", ".join(str(key) for key, _ in level) for level in levels)
             self.node_list_textbox.setPlainText(levels_text)  # Hiển thị danh sách các nút
 
     # Trong lớp ManualTreeDialog, đảm bảo cập nhật canvas khi cây thay đổi
@@ -879,58 +1565,42 @@ class TreeApp(QtWidgets.QWidget):
             return
         self.accept()  # Đóng hộp thoại và trả về cây cho TreeApp
 
-    def get_levels(self, root):
-        if not root:
-            return []
-        levels = []
-        current_level = [root]
-        while current_level:
-            levels.append([node.val for node in current_level])
-            next_level = []
-            for node in current_level:
-                if node.left:
-                    next_level.append(node.left)
-                if node.right:
-                    next_level.append(node.right)
-            current_level = next_level
-        return levels
-
     def export_tree_to_file(self):
         """
         Xuất cây hiện tại vào file theo định dạng:
         Loại cây
         parent_value,left_child_value,right_child_value
         """
+        if self.tree_type_combo.currentText() == BTREE_TYPE:
+            QtWidgets.QMessageBox.warning(self, "Lỗi", "Cây B+ không xuất ra file được!")
+            return
         if not self.tree_root:
             QtWidgets.QMessageBox.warning(self, "Lỗi", "Cây hiện tại trống, không thể xuất!")
             return
 
         # Chọn đường dẫn file để lưu
         options = QtWidgets.QFileDialog.Options()
-        file_path, _ = QtWidgets.QFileDialog.getSaveFileName(self, "Lưu cây vào file", "", "Text Files (*.txt)",
+        file_path, _ = QtWidgets.QFileDialog.getSaveFileName(self, "Lưu cây vào file", "", TREE_FILE_FILTER,
                                                              options=options)
         if not file_path:
             return
 
-        tree_type = self.tree_type_combo.currentText()  # Lấy loại cây hiện tại (Binary, BST, AVL)
-
-        def dfs_export_left_to_right(node, file):
-            if not node:
-                return
-            left_val = node.left.val if node.left else "null"
-            right_val = node.right.val if node.right else "null"
-            file.write(f"{node.val},{left_val},{right_val}\n")  # Ghi giá trị cha và con
-            dfs_export_left_to_right(node.left, file)
-            dfs_export_left_to_right(node.right, file)
+        tree_type = self.tree_type_combo.currentText()  # Lấy loại cây hiện tại (Binary, BST, AVL, đỏ-đen)
 
         try:
-            with open(file_path, 'w', encoding='utf-8') as file:
-                file.write(f"{tree_type}\n")  # Ghi loại cây trên dòng đầu tiên
-                dfs_export_left_to_right(self.tree_root, file)
-
-            QtWidgets.QMessageBox.information(self, "Thành công", "Cây đã được xuất thành công!")
+            if file_path.endswith(BINARY_EXTENSION):
+                save_tree_binary(file_path, self.tree_root, tree_type)
+                QtWidgets.QMessageBox.information(self, "Thành công", "Cây đã được xuất thành công!")
+                return
         except Exception as e:
             QtWidgets.QMessageBox.critical(self, "Lỗi", f"Không thể lưu cây: {str(e)}")
+            return
+
+        def exported(count):
+            QtWidgets.QMessageBox.information(self, "Thành công", "Cây đã được xuất thành công!")
+
+        self.run_job("Đang xuất cây...", "nút", exported, "Không thể lưu cây",
+                     write_tree_text, file_path, self.tree_root, tree_type, total=len(self.node_index))
 
     def import_tree_from_file(self):
         """
@@ -939,57 +1609,129 @@ class TreeApp(QtWidgets.QWidget):
         parent_value,left_child_value,right_child_value
         """
         options = QtWidgets.QFileDialog.Options()
-        file_path, _ = QtWidgets.QFileDialog.getOpenFileName(self, "Nhập cây từ file", "", "Text Files (*.txt)",
+        file_path, _ = QtWidgets.QFileDialog.getOpenFileName(self, "Nhập cây từ file", "", TREE_FILE_FILTER,
                                                              options=options)
         if not file_path:
             return
 
-        nodes = {}  # Dictionary để lưu các nút đã tạo
-        root = None
+        self.run_job("Đang nhập cây...", "MB", self.tree_imported, "Không thể nhập cây", load_tree_task, file_path)
 
-        try:
-            with open(file_path, 'r', encoding='utf-8') as file:
-                lines = file.readlines()
-
-                if not lines:
-                    raise ValueError("Tệp rỗng, không có dữ liệu để nhập.")
-
-                tree_type = lines[0].strip()  # Lấy loại cây từ dòng đầu tiên
-                self.tree_type_combo.setCurrentText(tree_type)  # Đặt loại cây trong giao diện
-
-                # Đọc từng dòng tiếp theo để tạo các nút
-                for line in lines[1:]:
-                    parent, left, right = line.strip().split(',')
-                    parent_val = int(parent)
-                    left_val = int(left) if left != "null" else None
-                    right_val = int(right) if right != "null" else None
-
-                    # Tạo nút cha nếu chưa tồn tại
-                    if parent_val not in nodes:
-                        nodes[parent_val] = Node(parent_val)
-                    current_node = nodes[parent_val]
-
-                    # Gán nút gốc nếu chưa có
-                    if root is None:
-                        root = current_node
-
-                    # Tạo và gán con trái
-                    if left_val is not None:
-                        if left_val not in nodes:
-                            nodes[left_val] = Node(left_val)
-                        current_node.left = nodes[left_val]
-
-                    # Tạo và gán con phải
-                    if right_val is not None:
-                        if right_val not in nodes:
-                            nodes[right_val] = Node(right_val)
-                        current_node.right = nodes[right_val]
-
-            self.tree_root = root  # Gán lại cây gốc
-            self.display_tree()  # Hiển thị cây trên giao diện
+    def tree_imported(self, result):
+        """
+        Thay cây hiện tại bằng cây vừa nhập và báo các dòng lỗi (nếu có).
+        """
+        tree_type, root, errors, index = result
+        self.show_tree_type(tree_type)  # Đặt loại cây trong giao diện
+        self.tree_root, self.node_index = root, index  # Thay cây và chỉ mục cùng lúc
+        self.btree = None
+        self.traversal_nodes = None
+        self.journal_snapshot()
+        self.display_tree()  # Hiển thị cây trên giao diện
+        if errors:
+            details = "\n".join(f"Dòng {line_number}: {message}" for line_number, message in errors[:20])
+            more = f"\n... và {len(errors) - 20} dòng khác" if len(errors) > 20 else ""
+            QtWidgets.QMessageBox.warning(self, "Nhập cây",
+                                          f"Đã nhập cây, bỏ qua {len(errors)} dòng lỗi:\n{details}{more}")
+        else:
             QtWidgets.QMessageBox.information(self, "Thành công", "Cây đã được nhập thành công!")
+
+    def run_job(self, label, unit, on_finished, error_title, task, *args, **kwargs):
+        """
+        Chạy task trên QThreadPool với hộp thoại tiến độ (tốc độ xử lý, nút Hủy).
+        unit là "MB" khi tiến độ tính theo byte, ngược lại là tên đơn vị đếm.
+        Kết quả chỉ được áp dụng (on_finished) trên luồng giao diện khi task xong.
+        """
+        scale = 2 ** 20 if unit == "MB" else 1
+        dialog = QtWidgets.QProgressDialog(label, "Hủy", 0, 1000, self)
+        dialog.setWindowModality(QtCore.Qt.WindowModal)  # Không cho sửa cây khi tác vụ đang chạy
+        dialog.setMinimumDuration(0)
+        dialog.setAutoClose(False)
+        dialog.setAutoReset(False)
+
+        job = TreeJob(task, *args, **kwargs)
+
+        def show_progress(done, total, rate):
+            dialog.setValue(int(1000 * done / total) if total else 0)
+            digits = 1 if scale > 1 else 0
+            dialog.setLabelText(f"{label}\n{done / scale:,.{digits}f}/{total / scale:,.{digits}f} {unit} "
+                                f"({rate / scale:,.{digits}f} {unit}/s)")
+
+        def finish(handler):
+            def done(*result):
+                dialog.close()
+                self.current_job = None
+                handler(*result)
+            return done
+
+        job.signals.progress.connect(show_progress)
+        job.signals.finished.connect(finish(on_finished))
+        job.signals.failed.connect(finish(lambda message: QtWidgets.QMessageBox.critical(
+            self, "Lỗi", f"{error_title}: {message}")))
+        job.signals.cancelled.connect(finish(lambda: None))
+        dialog.canceled.connect(lambda: job.cancel())  # Gọi trực tiếp, task tự kiểm tra cờ hủy
+        self.current_job = job  # Giữ tham chiếu tới khi xong
+        QtCore.QThreadPool.globalInstance().start(job)
+
+    def open_journal(self):
+        """
+        Chọn file nhật ký: nếu đã tồn tại thì khôi phục cây từ đó (snapshot + phát lại),
+        ngược lại bắt đầu nhật ký mới từ cây hiện tại. Mọi thao tác sửa cây sau đó đều được ghi lại.
+        """
+        options = QtWidgets.QFileDialog.Options() | QtWidgets.QFileDialog.DontConfirmOverwrite
+        file_path, _ = QtWidgets.QFileDialog.getSaveFileName(self, "Chọn file nhật ký", "",
+                                                             "Journal Files (*.wal)", options=options)
+        if not file_path:
+            return
+        if self.tree_type_combo.currentText() == BTREE_TYPE:
+            QtWidgets.QMessageBox.warning(self, "Lỗi", "Nhật ký chỉ hỗ trợ các loại cây nhị phân!")
+            return
+
+        if self.journal:
+            self.journal.close()
+        self.journal = TreeJournal(file_path)
+        try:
+            if os.path.exists(file_path):
+                tree_type, self.tree_root, self.node_index = self.journal.recover()
+                self.show_tree_type(tree_type)
+                self.btree = None
+                self.traversal_nodes = None
+                self.display_tree()
+            else:
+                self.journal_snapshot()
         except Exception as e:
-            QtWidgets.QMessageBox.critical(self, "Lỗi", f"Không thể nhập cây: {str(e)}")
+            self.journal = None
+            QtWidgets.QMessageBox.critical(self, "Lỗi", f"Không thể mở nhật ký: {e}")
+
+    def journal_record(self, op, a, b=0):
+        """
+        Ghi một thao tác vào nhật ký; các bản ghi lẻ được fsync sau GROUP_COMMIT_INTERVAL.
+        """
+        tree_type = self.tree_type_combo.currentText()
+        if not self.journal or tree_type not in TREE_TYPES:
+            return
+        self.journal.record(op, tree_type, a, b)
+        if self.journal.needs_snapshot():
+            self.journal.snapshot(self.tree_root, tree_type)
+            self.node_index.max_size = len(self.node_index)  # Khôi phục từ snapshot cũng bắt đầu như vậy
+        elif self.journal.pending_count and not self.journal_timer.isActive():
+            self.journal_timer.start(int(GROUP_COMMIT_INTERVAL * 1000))
+
+    def journal_snapshot(self):
+        """
+        Cây bị thay thế toàn bộ (tạo mới, nhập file) nên nén nhật ký thành snapshot mới.
+        """
+        if self.journal and self.tree_type_combo.currentText() in TREE_TYPES:
+            self.journal.snapshot(self.tree_root, self.tree_type_combo.currentText())
+            self.node_index.max_size = len(self.node_index)  # Khôi phục từ snapshot cũng bắt đầu như vậy
+
+    def sync_journal(self):
+        if self.journal:
+            self.journal.sync()
+
+    def closeEvent(self, event):
+        if self.journal:
+            self.journal.close()
+        super().closeEvent(event)
 
     def add_node(self, parent_node_val):
         """
@@ -1005,6 +1747,10 @@ class TreeApp(QtWidgets.QWidget):
             new_val, ok = QtWidgets.QInputDialog.getInt(self, "Thêm nút", "Nhập giá trị nút mới:")
             if not ok:
                 return
+            if new_val in self.node_index:
+                # Chỉ mục (và nhật ký) định danh nút theo giá trị nên không cho phép trùng
+                QtWidgets.QMessageBox.warning(self, "Lỗi", f"Giá trị {new_val} đã có trong cây!")
+                return
 
             if tree_type == "Cây nhị phân thông thường":
                 # Kiểm tra trạng thái nút con trái và phải
@@ -1025,17 +1771,40 @@ class TreeApp(QtWidgets.QWidget):
 
                 if side == "Trái":
                     parent_node.left = Node(new_val)
+                    self.node_index.add(parent_node.left, parent_node)
+                    self.journal_record(OP_ATTACH_LEFT, parent_node.val, new_val)
                 elif side == "Phải":
                     parent_node.right = Node(new_val)
+                    self.node_index.add(parent_node.right, parent_node)
+                    self.journal_record(OP_ATTACH_RIGHT, parent_node.val, new_val)
 
             elif tree_type == "BST":
-                self.tree_root = insert_bst(self.tree_root, new_val)
+                self.tree_root = insert_bst(self.tree_root, new_val, self.node_index)
+                self.journal_record(OP_INSERT, new_val)
             elif tree_type == "AVL":
-                self.tree_root = insert_avl(self.tree_root, new_val)
+                self.tree_root = insert_avl(self.tree_root, new_val, self.node_index)
+                self.journal_record(OP_INSERT, new_val)
+            elif tree_type == "Đỏ-đen":
+                self.tree_root = insert_rb(self.tree_root, new_val, self.node_index)
+                self.journal_record(OP_INSERT, new_val)
+            elif tree_type == "Splay":
+                self.invalidate_splay_path(new_val)
+                self.tree_root = insert_splay(self.tree_root, new_val, self.node_index)
+                self.journal_record(OP_INSERT, new_val)
+            elif tree_type == "Scapegoat":
+                # Cây con của con dê tế thần (nếu có) sẽ được dựng lại nên cần tính lại bố cục cả cây con
+                path = [self.node_index.get(key) for key in self.bst_search_steps(self.tree_root, new_val)]
+                goat = find_scapegoat(path, new_val, len(self.node_index) + 1)
+                if goat is not None:
+                    self.invalidate_subtree(path[goat])
+                self.tree_root = insert_scapegoat(self.tree_root, new_val, self.node_index)
+                self.journal_record(OP_INSERT, new_val)
             else:
                 QtWidgets.QMessageBox.warning(self, "Lỗi", "Loại cây không hỗ trợ thêm nút!")
                 return
 
+            # Chỉ đường từ nút mới lên gốc cần tính lại bố cục
+            invalidate_layout(self.node_index.get(new_val), self.node_index)
             self.display_tree()
         except Exception as e:
             QtWidgets.QMessageBox.critical(self, "Lỗi", f"Không thể thêm nút: {e}")
@@ -1046,16 +1815,34 @@ class TreeApp(QtWidgets.QWidget):
         """
         try:
             tree_type = self.tree_type_combo.currentText()
+            spine = structural_spine(self.node_index.get(node_val), self.node_index)
             if tree_type == "Cây nhị phân thông thường":
-                self.tree_root = delete_binary(self.tree_root, node_val)
+                self.tree_root = delete_binary(self.tree_root, node_val, self.node_index)
             elif tree_type == "BST":
-                self.tree_root = delete_bst(self.tree_root, node_val)
+                self.tree_root = delete_bst(self.tree_root, node_val, self.node_index)
+            elif tree_type == "Scapegoat":
+                max_size = self.node_index.max_size
+                self.tree_root = delete_scapegoat(self.tree_root, node_val, self.node_index)
+                if self.node_index.max_size != max_size:
+                    self.invalidate_subtree(self.tree_root)  # Cả cây vừa được dựng lại
             elif tree_type == "AVL":
-                self.tree_root = delete_avl(self.tree_root, node_val)
+                self.tree_root = delete_avl(self.tree_root, node_val, self.node_index)
+            elif tree_type == "Đỏ-đen":
+                self.tree_root = delete_rb(self.tree_root, node_val, self.node_index)
+            elif tree_type == "Splay":
+                self.invalidate_splay_path(node_val)
+                self.tree_root = delete_splay(self.tree_root, node_val, self.node_index)
             else:
                 QtWidgets.QMessageBox.warning(self, "Lỗi", "Loại cây không hỗ trợ xóa nút!")
                 return
-
+            self.journal_record(OP_DELETE, node_val)
+
+            for node in spine:
+                node.layout = None  # Bố cục các nút có thể đã đổi cấu trúc cần tính lại
+            for node in spine:
+                # Phép quay khi cân bằng lại (đỏ-đen) có thể đưa nút ngoài spine lên làm tổ tiên
+                if self.node_index.get(node.val) is node:
+                    invalidate_layout(node, self.node_index)
             self.display_tree()
         except Exception as e:
             QtWidgets.QMessageBox.critical(self, "Lỗi", f"Không thể xóa nút: {e}")
@@ -1064,18 +1851,14 @@ class TreeApp(QtWidgets.QWidget):
         """
         Tìm nút có giá trị val trong cây, hoạt động với cả cây nhị phân thông thường.
         """
-        if root is None:
-            return None
-        if root.val == val:
-            return root
-        # Tìm ở cây con trái
-        left_result = self.find_node(root.left, val)
-        if left_result:
-            return left_result
-        # Tìm ở cây con phải
-        return self.find_node(root.right, val)
+        if root is self.tree_root:
+            return self.node_index.get(val)
+        return find_node(root, val)
 
     def start_search(self, search_type, value):
+        if self.tree_type_combo.currentText() == BTREE_TYPE:
+            self.start_btree_search(value)
+            return
         if not self.tree_root:
             QtWidgets.QMessageBox.warning(self, "Lỗi", "Vui lòng tạo cây trước khi tìm kiếm!")
             return
@@ -1087,6 +1870,9 @@ class TreeApp(QtWidgets.QWidget):
             self.search_nodes = self.bfs_search_steps(self.tree_root, value)
         elif search_type == "BST (Tìm nhị phân)":
             self.search_nodes = self.bst_search_steps(self.tree_root, value)
+        # Cây splay đưa khóa vừa tìm lên gốc sau khi hoạt ảnh tìm kiếm kết thúc
+        self.splay_after_search = (search_type == "BST (Tìm nhị phân)" and
+                                   self.tree_type_combo.currentText() == "Splay")
 
         self.search_index = 0
         self.search_value = value
@@ -1099,20 +1885,76 @@ class TreeApp(QtWidgets.QWidget):
             if self.search_index >= len(self.search_nodes):
                 QtWidgets.QMessageBox.information(self, "Kết quả",
                                                   f"Giá trị {self.search_value} {'được tìm thấy!' if self.search_value in self.search_nodes else 'không tồn tại trong cây!'}")
+                self.splay_searched()
             return
 
         current_node = self.search_nodes[self.search_index]
         self.canvas.selected_nodes.clear()
         self.canvas.selected_nodes.add(current_node)
-        self.canvas.display_tree(self.tree_root)
+        self.canvas.update_highlights()
 
         if current_node == self.search_value:
             QtWidgets.QMessageBox.information(self, "Tìm kiếm thành công", f"Đã tìm thấy giá trị {self.search_value}!")
+            self.splay_searched()
             return
 
         self.search_index += 1
         QtCore.QTimer.singleShot(500, self.search_step)
 
+    def start_btree_search(self, value):
+        """
+        Tìm trên cây B+: mọi kiểu tìm đều đi từ gốc xuống lá, tô lần lượt các nút trên đường đi.
+        """
+        if not self.btree:
+            QtWidgets.QMessageBox.warning(self, "Lỗi", "Vui lòng tạo cây trước khi tìm kiếm!")
+            return
+        self.search_nodes = self.btree.search_path(value)
+        self.search_index = 0
+        self.search_value = value
+        self.paused = False
+        self.pause_button.setText("Tạm dừng")
+        self.btree_search_step()
+
+    def btree_search_step(self):
+        if self.paused:
+            return
+        if self.search_index >= len(self.search_nodes):
+            found = self.search_value in self.search_nodes[-1].keys
+            QtWidgets.QMessageBox.information(self, "Kết quả",
+                                              f"Giá trị {self.search_value} {'được tìm thấy!' if found else 'không tồn tại trong cây!'}")
+            self.canvas.btree_selected.clear()
+            self.canvas.render_view()
+            return
+        self.canvas.btree_selected = {self.search_nodes[self.search_index]}
+        self.canvas.render_view()
+        self.search_index += 1
+        QtCore.QTimer.singleShot(500, self.btree_search_step)
+
+    def splay_searched(self):
+        if not self.splay_after_search:
+            return
+        self.splay_after_search = False
+        self.invalidate_splay_path(self.search_value)
+        self.tree_root = splay(self.tree_root, self.search_value, self.node_index)
+        self.journal_record(OP_SPLAY, self.search_value)
+        self.canvas.selected_nodes.clear()
+        self.display_tree()
+
+    def invalidate_splay_path(self, value):
+        """
+        Splay theo value (và xóa value) chỉ đổi liên kết các nút trên đường tìm value cùng
+        cạnh phải của cây con trái nút value; sau thao tác mọi tổ tiên của chúng cũng thuộc
+        tập này nên chỉ cần tính lại bố cục của các nút đó.
+        """
+        steps = self.bst_search_steps(self.tree_root, value)
+        nodes = [self.node_index.get(key) for key in steps]
+        node = nodes[-1].left if steps and steps[-1] == value else None
+        while node:
+            nodes.append(node)
+            node = node.right
+        for node in nodes:
+            node.layout = None
+
     def dfs_search_steps(self, node, value):
         steps = []
 
@@ -1157,10 +1999,10 @@ class TreeApp(QtWidgets.QWidget):
     def highlight_tree_not_found(self):
         for _ in range(3):
             self.canvas.selected_nodes = set(self.get_all_nodes(self.tree_root))
-            self.canvas.display_tree(self.tree_root)
+            self.canvas.update_highlights()
             QtCore.QThread.msleep(300)
             self.canvas.selected_nodes.clear()
-            self.canvas.display_tree(self.tree_root)
+            self.canvas.update_highlights()
 
     def update_speed_label(self):
         # Cập nhật giá trị của nhãn khi giá trị của thanh trượt thay đổi
@@ -1170,7 +2012,7 @@ class TreeApp(QtWidgets.QWidget):
         """
         Thay đổi trạng thái tạm dừng hoặc tiếp tục.
         """
-        if not self.traversal_nodes:  # Nếu không có gì để duyệt, vô hiệu hóa
+        if self.traversal_nodes is None:  # Nếu không có gì để duyệt, vô hiệu hóa
             return
 
         self.paused = not self.paused
@@ -1184,25 +2026,35 @@ class TreeApp(QtWidgets.QWidget):
         """
         Khởi động duyệt cây từ đầu và kích hoạt nút tạm dừng.
         """
+        if self.tree_type_combo.currentText() == BTREE_TYPE:
+            # Mọi kiểu duyệt trên cây B+ đều là đi theo chuỗi lá (các khóa tăng dần)
+            if not self.btree:
+                QtWidgets.QMessageBox.warning(self, "Lỗi", "Vui lòng tạo một cây trước khi duyệt!")
+            elif len(self.btree) > TRAVERSAL_ANIMATION_LIMIT:
+                self.run_job("Đang duyệt cây...", "khóa", self.traversal_collected, "Không thể duyệt cây",
+                             collect_traversal, iter, self.btree, len(self.btree))
+            else:
+                self.traversal_collected(list(self.btree))
+            return
         if not self.tree_root:
             QtWidgets.QMessageBox.warning(self, "Lỗi", "Vui lòng tạo một cây trước khi duyệt!")
             return
 
+        # Lấy kiểu duyệt cây
+        traversal_type = self.traversal_type_combo.currentText()
+        if len(self.node_index) > TRAVERSAL_ANIMATION_LIMIT:
+            # Hoạt ảnh từng nút vô nghĩa với cây lớn: duyệt trong nền rồi hiện kết quả một lần
+            self.run_job("Đang duyệt cây...", "nút", self.traversal_collected, "Không thể duyệt cây",
+                         collect_traversal, TRAVERSALS[traversal_type], self.tree_root, len(self.node_index))
+            return
+
         # Reset các trạng thái
         self.traversal_index = 0
         self.traversal_result = []
-        self.traversal_nodes = []
         self.canvas.selected_nodes.clear()
         self.canvas.display_tree(self.tree_root)
-
-        # Lấy kiểu duyệt cây
-        traversal_type = self.traversal_type_combo.currentText()
-        if traversal_type == "Preorder":
-            self.traversal_nodes = self.preorder(self.tree_root)
-        elif traversal_type == "Inorder":
-            self.traversal_nodes = self.inorder(self.tree_root)
-        elif traversal_type == "Postorder":
-            self.traversal_nodes = self.postorder(self.tree_root)
+        # Bộ sinh được tiêu thụ dần trong traversal_step nên hoạt ảnh bắt đầu ngay
+        self.traversal_nodes = TRAVERSALS[traversal_type](self.tree_root)
 
         # Kích hoạt nút tạm dừng và cập nhật trạng thái
         self.paused = False
@@ -1223,8 +2075,8 @@ class TreeApp(QtWidgets.QWidget):
         if self.paused:  # Nếu đang tạm dừng, không thực hiện bước tiếp theo
             return
 
-        if self.traversal_index < len(self.traversal_nodes):
-            current_node = self.traversal_nodes[self.traversal_index]
+        current_node = next(self.traversal_nodes, None)
+        if current_node is not None:
             self.traversal_result.append(current_node)
 
             # Cập nhật danh sách các nút đã duyệt ngay lập tức
@@ -1233,7 +2085,7 @@ class TreeApp(QtWidgets.QWidget):
             # Hiển thị trạng thái trên cây
             self.canvas.selected_nodes.clear()
             self.canvas.selected_nodes.add(current_node)
-            self.canvas.display_tree(self.tree_root)
+            self.canvas.update_highlights()
 
             self.traversal_index += 1
 
@@ -1253,18 +2105,22 @@ class TreeApp(QtWidgets.QWidget):
             self.create_manual_tree_button.setEnabled(True)
             self.traverse_button.setEnabled(True)
 
+    def traversal_collected(self, result):
+        self.traversal_result = result
+        self.node_list_textbox.setPlainText(" → ".join(map(str, result)))
+
     def reset_tree_colors(self):
         self.canvas.selected_nodes.clear()
-        self.canvas.display_tree(self.tree_root)
+        self.canvas.update_highlights()
 
     def preorder(self, node):
-        return [node.val] + self.preorder(node.left) + self.preorder(node.right) if node else []
+        return preorder(node)
 
     def inorder(self, node):
-        return self.inorder(node.left) + [node.val] + self.inorder(node.right) if node else []
+        return inorder(node)
 
     def postorder(self, node):
-        return self.postorder(node.left) + self.postorder(node.right) + [node.val] if node else []
+        return postorder(node)
 
 
 if __name__ == '__main__':
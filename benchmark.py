@@ -0,0 +1,806 @@
+"""
+Các phép đo hiệu năng cho Binarytree.py.
+
+Chạy: python benchmark.py <tên phép đo> [tham số...]
+Các phép đo vẽ (render, lod, hittest) cần giao diện nên mới import Binarytree khi chạy.
+Ví dụ: python benchmark.py memory 100000 1000000
+"""
+import sys
+import functools
+import random
+import time
+import tracemalloc
+
+import treecore as bt
+
+
+def measure_memory(build):
+    """
+    Trả về (số byte đã cấp phát, thời gian xây dựng) cho hàm build.
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    tree = build()
+    elapsed = time.perf_counter() - start
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del tree
+    return current, elapsed
+
+
+def bench_memory(*sizes):
+    """
+    So sánh bộ nhớ của cây Node với TreeArena ở các kích thước khác nhau.
+    """
+    sizes = [int(s) for s in sizes] or [10 ** 5, 10 ** 6, 10 ** 7]
+    print(f"{'n':>10} {'Node (MB)':>12} {'B/nút':>8} {'Arena (MB)':>12} {'B/nút':>8}")
+    for n in sizes:
+        keys = random.sample(range(n * 4), n)
+
+        def build_nodes():
+            root = None
+            for key in keys:
+                root = bt.insert_avl(root, key)
+            return root
+
+        def build_arena():
+            arena = bt.TreeArena()
+            for key in keys:
+                arena.insert(key, balanced=True)
+            return arena
+
+        node_bytes, _ = measure_memory(build_nodes)
+        arena_bytes, _ = measure_memory(build_arena)
+        print(f"{n:>10} {node_bytes / 2 ** 20:>12.1f} {node_bytes / n:>8.1f} "
+              f"{arena_bytes / 2 ** 20:>12.1f} {arena_bytes / n:>8.1f}")
+
+
+def time_call(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def bench_engines(n=900):
+    """
+    So sánh engine đệ quy và không đệ quy trên dữ liệu ngẫu nhiên và đã sắp xếp.
+    Mặc định n < 1000 để bản đệ quy không vượt giới hạn đệ quy với BST suy biến.
+    """
+    n = int(n)
+    workloads = {"ngẫu nhiên": random.sample(range(n * 4), n), "đã sắp xếp": list(range(n))}
+    print(f"{'thao tác':<22} {'dữ liệu':<12} {'đệ quy (ms)':>12} {'lặp (ms)':>10} {'tăng tốc':>9}")
+    for workload, keys in workloads.items():
+        results = {}
+        for engine in ("recursive", "iterative"):
+            bt.set_engine(engine)
+            times = {}
+            for kind in ("bst", "avl"):
+                insert = getattr(bt, "insert_" + kind)
+                delete = getattr(bt, "delete_" + kind)
+                root = None
+
+                def build():
+                    nonlocal root
+                    for key in keys:
+                        root = insert(root, key)
+
+                def remove():
+                    nonlocal root
+                    for key in keys:
+                        root = delete(root, key)
+
+                try:
+                    times["insert_" + kind] = time_call(build)
+                    times["find_node (" + kind + ")"] = time_call(
+                        lambda: [bt.find_node(root, key) for key in keys[:100]])
+                    times["inorder (" + kind + ")"] = time_call(bt.inorder, root)
+                    times["delete_" + kind] = time_call(remove)
+                except RecursionError:
+                    times.setdefault("insert_" + kind, None)
+            results[engine] = times
+        bt.set_engine("iterative")
+        for op, iterative_time in results["iterative"].items():
+            recursive_time = results["recursive"].get(op)
+            if recursive_time is None:
+                print(f"{op:<22} {workload:<12} {'RecursionError':>12} {iterative_time * 1000:>10.2f}")
+                continue
+            print(f"{op:<22} {workload:<12} {recursive_time * 1000:>12.2f} {iterative_time * 1000:>10.2f} "
+                  f"{recursive_time / iterative_time:>8.1f}x")
+
+
+def bench_bulk(*sizes):
+    """
+    So sánh dựng cây hàng loạt với chèn từng khóa bằng insert_avl/insert_bst.
+    """
+    sizes = [int(s) for s in sizes] or [10 ** 4, 10 ** 5, 10 ** 6]
+    print(f"{'n':>10} {'insert_avl (s)':>15} {'insert_bst (s)':>15} {'hàng loạt (s)':>14} {'trộn n/2 (s)':>13}")
+    for n in sizes:
+        keys = bt.generate_unique_random_numbers(n, 1, n * 10)
+        avl_time = time_call(lambda: functools.reduce(bt.insert_avl, keys, None))
+        bst_time = time_call(lambda: functools.reduce(bt.insert_bst, keys, None))
+        bulk_time = time_call(bt.build_balanced, keys)
+        root = bt.build_balanced(keys)
+        batch = random.sample(range(n * 10 + 1, n * 20), n // 2)
+        merge_time = time_call(bt.merge_batch, root, batch, "AVL")
+        print(f"{n:>10} {avl_time:>15.3f} {bst_time:>15.3f} {bulk_time:>14.3f} {merge_time:>13.3f}")
+
+
+def count_rotations(func, names=("rotate_left", "rotate_right", "rotate_left_rb", "rotate_right_rb")):
+    """
+    Chạy func với các hàm quay của treecore được bọc để đếm số lần gọi.
+    """
+    originals = {name: getattr(bt, name) for name in names}
+    count = [0]
+
+    def counting(rotate):
+        def wrapper(node):
+            count[0] += 1
+            return rotate(node)
+        return wrapper
+
+    for name, rotate in originals.items():
+        setattr(bt, name, counting(rotate))
+    try:
+        func()
+    finally:
+        for name, rotate in originals.items():
+            setattr(bt, name, rotate)
+    return count[0]
+
+
+def bench_redblack(n=10 ** 5):
+    """
+    Thông lượng và số phép quay của cây đỏ-đen so với AVL trên các tải ngẫu nhiên,
+    tăng dần và hỗn hợp (n lần chèn rồi n thao tác chèn/xóa xen kẽ ngẫu nhiên).
+    """
+    n = int(n)
+    keys = bt.generate_unique_random_numbers(n, 1, n * 10)
+    fresh = random.sample(range(n * 10 + 1, n * 20), n)
+    workloads = {"ngẫu nhiên": [(True, key) for key in keys],
+                 "tăng dần": [(True, key) for key in sorted(keys)]}
+    mixed = [(True, key) for key in keys]
+    victims = random.sample(keys, n // 2)
+    mixed += [(False, victims[i // 2]) if i % 2 else (True, fresh[i // 2]) for i in range(n)]
+    workloads["hỗn hợp"] = mixed
+    engines = {"AVL": (bt.insert_avl, bt.delete_avl), "đỏ-đen": (bt.insert_rb, bt.delete_rb)}
+
+    print(f"{'tải':<12} {'cây':<8} {'thao tác/s':>12} {'phép quay':>10} {'quay/thao tác':>14}")
+    for workload, ops in workloads.items():
+        for name, (insert, delete) in engines.items():
+            def run():
+                root = None
+                for is_insert, key in ops:
+                    root = insert(root, key) if is_insert else delete(root, key)
+                return root
+
+            elapsed = time_call(run)
+            rotations = count_rotations(run)
+            print(f"{workload:<12} {name:<8} {len(ops) / elapsed:>12,.0f} {rotations:>10} {rotations / len(ops):>14.3f}")
+
+
+def zipf_stream(keys, count, exponent):
+    """
+    Dãy count lần truy cập: khóa hạng r (theo một hoán vị ngẫu nhiên của keys) có xác suất tỉ lệ 1/r^exponent.
+    """
+    import numpy as np
+
+    rng = np.random.default_rng()
+    weights = 1.0 / np.arange(1, len(keys) + 1) ** exponent
+    ranks = rng.choice(len(keys), size=count, p=weights / weights.sum())
+    return np.asarray(keys)[rng.permutation(len(keys))[ranks]].tolist()
+
+
+def descend(root, key):
+    """
+    Số nút đi qua khi tìm key theo quy tắc BST (như TreeApp.bst_search_steps).
+    """
+    steps = 0
+    node = root
+    while node:
+        steps += 1
+        if key == node.val:
+            break
+        node = node.left if key < node.val else node.right
+    return steps
+
+
+def bench_splay(n=10 ** 5, accesses=2 * 10 ** 5, *exponents):
+    """
+    Tìm kiếm theo dãy truy cập Zipf: cây splay (đưa khóa vừa tìm lên gốc) so với AVL và BST tĩnh.
+    Số mũ 0 là truy cập đều; số mũ càng lớn thì tập khóa "nóng" càng nhỏ.
+    """
+    n, accesses = int(n), int(accesses)
+    exponents = [float(s) for s in exponents] or [0.0, 0.8, 1.0, 1.2]
+    keys = bt.generate_unique_random_numbers(n, 1, n * 10)
+    trees = {"AVL": bt.build_balanced(keys), "BST": functools.reduce(bt.insert_bst, keys, None),
+             "Splay": functools.reduce(bt.insert_splay, keys, None)}
+
+    def search_static(root, stream):
+        for key in stream:
+            node = root
+            while node and node.val != key:
+                node = node.left if key < node.val else node.right
+
+    def search_splay(root, stream):
+        for key in stream:
+            root = bt.splay(root, key)
+
+    def count_splay(root, stream):
+        total = 0
+        for key in stream:
+            total += descend(root, key)
+            root = bt.splay(root, key)
+        return total
+
+    print(f"{'số mũ':>6} {'cây':<6} {'µs/lần tìm':>11} {'nút/lần tìm':>12}")
+    for exponent in exponents:
+        stream = zipf_stream(keys, accesses, exponent)
+        for name, root in trees.items():
+            if name == "Splay":
+                # Mỗi số mũ chạy trên bản sao cây splay ban đầu vì phép tìm làm đổi cây
+                elapsed = time_call(search_splay, bt.copy_tree(root), stream)
+                steps = count_splay(bt.copy_tree(root), stream)
+            else:
+                elapsed = time_call(search_static, root, stream)
+                steps = sum(descend(root, key) for key in stream)
+            print(f"{exponent:>6.1f} {name:<6} {elapsed / accesses * 1e6:>11.2f} {steps / accesses:>12.1f}")
+
+
+def bench_btree(n=10 ** 6, *orders):
+    """
+    Thông lượng chèn, tìm và quét khoảng: cây B+ ở các bậc khác nhau so với insert_avl
+    (mỗi khóa một Node) và range_scan của TreeArena.
+    """
+    n = int(n)
+    orders = [int(s) for s in orders] or [16, 64, 256]
+    keys = bt.generate_unique_random_numbers(n, 1, n * 10)
+    lookups = random.sample(keys, min(n, 10 ** 5))
+    windows = [(key, key + 10000) for key in lookups[:1000]]  # Mỗi khoảng chứa khoảng 1000 khóa
+
+    def insert_avl():
+        root = None
+        for key in keys:
+            root = bt.insert_avl(root, key)
+        return root
+
+    def insert_btree(order):
+        tree = bt.BPlusTree(order)
+        for key in keys:
+            tree.insert(key)
+        return tree
+
+    def search(contains):
+        for key in lookups:
+            contains(key)
+
+    def scan(range_scan):
+        return sum(len(range_scan(low, high)) for low, high in windows)
+
+    def report(name, insert_time, search_time, scan_time, scanned):
+        print(f"{name:<10} {n / insert_time:>14,.0f} {len(lookups) / search_time:>14,.0f} "
+              f"{scanned / scan_time:>16,.0f}")
+
+    print(f"{'cây':<10} {'chèn/s':>14} {'tìm/s':>14} {'khóa quét/s':>16}")
+    start = time.perf_counter()
+    root = insert_avl()
+    insert_time = time.perf_counter() - start
+    arena = bt.TreeArena.from_nodes(root)
+    scanned = scan(arena.range_scan)
+    report("AVL", insert_time, time_call(search, lambda key: descend(root, key)),
+           time_call(scan, arena.range_scan), scanned)
+    del root, arena
+    for order in orders:
+        start = time.perf_counter()
+        tree = insert_btree(order)
+        insert_time = time.perf_counter() - start
+        report(f"B+ {order}", insert_time, time_call(search, tree.search), time_call(scan, tree.range_scan), scanned)
+
+
+def tree_height(root):
+    return sum(1 for _ in bt.iter_levels(root))
+
+
+def bench_rebalance(n=5000, swaps=0.01):
+    """
+    Dữ liệu gần như đã sắp xếp: BST suy biến trước/sau khi cân bằng lại bằng DSW,
+    so với chèn vào cây scapegoat và AVL (chiều cao, thời gian chèn, thời gian tìm mọi khóa).
+    n mặc định nhỏ vì dựng BST suy biến tốn O(n^2).
+    """
+    n, swaps = int(n), float(swaps)
+    keys = list(range(n))
+    for _ in range(int(n * swaps)):
+        i = random.randrange(n - 1)
+        keys[i], keys[i + 1] = keys[i + 1], keys[i]
+
+    def build(insert):
+        root = None
+        for key in keys:
+            root = insert(root, key)
+        return root
+
+    def search(root):
+        for key in keys:
+            descend(root, key)
+
+    def build_scapegoat():
+        root = None
+        for size, key in enumerate(keys):
+            root = bt.insert_scapegoat(root, key, size=size)
+        return root
+
+    print(f"{'cây':<14} {'chiều cao':>10} {'chèn (s)':>10} {'tìm (s)':>10}")
+    start = time.perf_counter()
+    root = build(bt.insert_bst)
+    build_time = time.perf_counter() - start
+    print(f"{'BST':<14} {tree_height(root):>10} {build_time:>10.3f} {time_call(search, root):>10.3f}")
+    start = time.perf_counter()
+    root = bt.rebalance_dsw(root)
+    dsw_time = time.perf_counter() - start
+    print(f"{'BST + DSW':<14} {tree_height(root):>10} {dsw_time:>10.3f} {time_call(search, root):>10.3f}")
+    for name, builder in (("Scapegoat", build_scapegoat), ("AVL", lambda: build(bt.insert_avl))):
+        start = time.perf_counter()
+        root = builder()
+        build_time = time.perf_counter() - start
+        print(f"{name:<14} {tree_height(root):>10} {build_time:>10.3f} {time_call(search, root):>10.3f}")
+    print("(cột chèn của BST + DSW là thời gian chạy DSW)")
+
+
+def bench_setops(n=10 ** 6, workers=4, *sizes):
+    """
+    Hợp/giao/hiệu cây AVL n khóa với cây m khóa: từng khóa (insert_avl/find/delete_avl trên cây lớn)
+    so với các phép toán dựa trên join, tuần tự và chia cho workers tiến trình.
+    """
+    n, workers = int(n), int(workers)
+    sizes = [int(s) for s in sizes] or [n // 1000, n // 10, n]
+    big_keys = bt.generate_unique_random_numbers(n, 1, n * 4)
+
+    def keywise(name, big, small):
+        if name == "union":
+            for key in bt.iter_inorder(small):
+                big = bt.insert_avl(big, key)
+            return big
+        if name == "intersection":
+            root = None
+            for key in bt.iter_inorder(small):
+                node = big
+                while node and node.val != key:
+                    node = node.left if key < node.val else node.right
+                if node:
+                    root = bt.insert_avl(root, key)
+            return root
+        for key in bt.iter_inorder(small):
+            big = bt.delete_avl(big, key)
+        return big
+
+    print(f"{'m':>9} {'phép toán':<13} {'từng khóa (s)':>14} {'join (s)':>10} {f'{workers} tiến trình (s)':>18}")
+    for m in sizes:
+        small_keys = bt.generate_unique_random_numbers(m, 1, n * 4)
+        for name, (operation, _) in bt.SET_OPERATIONS.items():
+            times = []
+            for run in (lambda a, b: keywise(name, a, b), operation,
+                        lambda a, b: bt.set_operation_parallel(name, a, b, workers)):
+                big, small = bt.build_balanced(big_keys), bt.build_balanced(small_keys)
+                times.append(time_call(run, big, small))
+            print(f"{m:>9} {name:<13} {times[0]:>14.3f} {times[1]:>10.3f} {times[2]:>18.3f}")
+
+
+def bench_index(n=10 ** 5, lookups=1000):
+    """
+    Tra cứu ngẫu nhiên: duyệt toàn cây bằng find_node so với NodeIndex.
+    """
+    n, lookups = int(n), int(lookups)
+    keys = bt.generate_unique_random_numbers(n, 1, n * 10)
+    root = None
+    for key in keys:
+        root = bt.insert_binary(root, key)
+    index = bt.NodeIndex(root)
+    queries = random.choices(keys, k=lookups)
+    scan_time = time_call(lambda: [bt.find_node(root, key) for key in queries])
+    index_time = time_call(lambda: [bt.find_node(root, key, index) for key in queries])
+    print(f"n={n}, {lookups} lần tra cứu")
+    print(f"duyệt cây : {scan_time / lookups * 1e6:10.2f} µs/lần")
+    print(f"chỉ mục   : {index_time / lookups * 1e6:10.2f} µs/lần")
+    print(f"tăng tốc  : {scan_time / index_time:10.0f}x")
+    print(f"kiểm tra nhất quán: {'OK' if not index.check(root) else 'LỖI'}")
+
+
+def draw_networkx(ax, root):
+    """
+    Cách vẽ cũ bằng networkx, giữ lại để so sánh.
+    """
+    import networkx as nx
+    G = nx.DiGraph()
+    positions = {}
+
+    def calculate_positions(node, depth=0, x_pos=0, x_gap=1.5):
+        if node is not None:
+            positions[node.val] = (x_pos, -depth)
+            G.add_node(node.val)
+            if node.left:
+                G.add_edge(node.val, node.left.val)
+                calculate_positions(node.left, depth + 1, x_pos - x_gap, x_gap / 2)
+            if node.right:
+                G.add_edge(node.val, node.right.val)
+                calculate_positions(node.right, depth + 1, x_pos + x_gap, x_gap / 2)
+
+    calculate_positions(root)
+    nx.draw(G, positions, with_labels=True, labels={n: n for n in G.nodes()}, node_size=1500,
+            node_color=["lightblue"] * len(G), font_size=12, font_weight="bold", ax=ax, arrows=False)
+
+
+def bench_render(*sizes, repeat=3):
+    """
+    Thời gian một khung hình: networkx (cũ) so với render_tree (collections).
+    """
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    import Binarytree as gui
+
+    sizes = [int(s) for s in sizes] or [100, 1000, 10000]
+    fig = Figure(figsize=(10, 8))
+    canvas = FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    renderers = {
+        "networkx": lambda root: draw_networkx(ax, root),
+        "collections": lambda root: gui.render_tree(ax, gui.TreeLayout().update(root), lambda v: "lightblue"),
+    }
+    print(f"{'n':>8} {'networkx (ms)':>14} {'collections (ms)':>17} {'tăng tốc':>9}")
+    for n in sizes:
+        root = bt.build_balanced(range(n))
+        times = {}
+        for name, render in renderers.items():
+            best = float("inf")
+            for _ in range(repeat):
+                start = time.perf_counter()
+                ax.clear()
+                render(root)
+                canvas.draw()
+                best = min(best, time.perf_counter() - start)
+            times[name] = best
+        print(f"{n:>8} {times['networkx'] * 1000:>14.1f} {times['collections'] * 1000:>17.1f} "
+              f"{times['networkx'] / times['collections']:>8.1f}x")
+
+
+def bench_hittest(n=10 ** 5, queries=10000):
+    """
+    Tra nút gần nhất: quét toàn bộ node_positions (cách cũ) so với NodeGrid.
+    """
+    import Binarytree as gui
+
+    n, queries = int(n), int(queries)
+    layout = gui.TreeLayout().update(bt.build_balanced(range(n)))
+    positions = layout.positions()
+    build_time = time_call(gui.NodeGrid, layout.xs, layout.ys, layout.values)
+    grid = gui.NodeGrid(layout.xs, layout.ys, layout.values)
+    points = [(random.uniform(layout.xs.min(), layout.xs.max()), random.uniform(layout.ys.min(), 0))
+              for _ in range(queries)]
+
+    def scan(x, y):
+        found, best = None, float("inf")
+        for node, (nx, ny) in positions.items():
+            distance = ((x - nx) ** 2 + (y - ny) ** 2) ** 0.5
+            if distance < gui.HIT_RADIUS and distance < best:
+                found, best = node, distance
+        return found
+
+    scan_count = max(1, queries // 1000)
+    scan_time = time_call(lambda: [scan(x, y) for x, y in points[:scan_count]]) / scan_count
+    grid_time = time_call(lambda: [grid.nearest(x, y) for x, y in points]) / queries
+    assert all(scan(x, y) == grid.nearest(x, y) for x, y in points[:scan_count])
+    print(f"n={n}")
+    print(f"dựng lưới     : {build_time * 1000:10.2f} ms")
+    print(f"quét toàn bộ  : {scan_time * 1000:10.3f} ms/lần")
+    print(f"NodeGrid      : {grid_time * 1000:10.3f} ms/lần")
+
+
+def bench_lod(*sizes, repeat=3):
+    """
+    Thời gian một khung hình khi hiển thị toàn bộ cây và khi phóng to một vùng,
+    cùng số nút thực sự được vẽ nhờ loại bỏ phần ngoài khung nhìn và gộp cây con.
+    """
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    import Binarytree as gui
+
+    sizes = [int(s) for s in sizes] or [10 ** 5, 10 ** 6]
+    fig = Figure(figsize=(10, 8))
+    canvas = FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    print(f"{'n':>8} {'bố cục (s)':>11} {'toàn bộ (ms)':>13} {'số nút vẽ':>10} {'phóng to (ms)':>14} {'số nút vẽ':>10}")
+    for n in sizes:
+        root = bt.build_balanced(range(n))
+        layout_time = time_call(lambda: gui.TreeLayout().update(root))
+        layout = gui.TreeLayout().update(root)
+        x = layout.xs[0]
+        views = {"full": (None, None), "zoom": ((x - 20, x + 20), (-15, 1))}
+        results = {}
+        for name, (xlim, ylim) in views.items():
+            best = float("inf")
+            for _ in range(repeat):
+                start = time.perf_counter()
+                ax.clear()
+                _, drawn, _ = gui.render_tree(ax, layout, lambda v: "lightblue", xlim, ylim)
+                canvas.draw()
+                best = min(best, time.perf_counter() - start)
+            results[name] = (best, len(drawn))
+        print(f"{n:>8} {layout_time:>11.2f} {results['full'][0] * 1000:>13.1f} {results['full'][1]:>10} "
+              f"{results['zoom'][0] * 1000:>14.1f} {results['zoom'][1]:>10}")
+
+
+def bench_fileformat(*sizes):
+    """
+    Ghi/đọc file: định dạng văn bản parent,left,right so với định dạng nhị phân (mmap).
+    """
+    import os
+    import tempfile
+
+    sizes = [int(s) for s in sizes] or [10 ** 5, 10 ** 6]
+    print(f"{'n':>9} {'ghi txt (s)':>12} {'đọc txt (s)':>12} {'ghi nhị phân (s)':>17} {'đọc nhị phân (s)':>17} "
+          f"{'txt (MB)':>9} {'nhị phân (MB)':>14}")
+    with tempfile.TemporaryDirectory() as directory:
+        text_path = os.path.join(directory, "tree.txt")
+        binary_path = os.path.join(directory, "tree" + bt.BINARY_EXTENSION)
+        for n in sizes:
+            root = bt.build_balanced(bt.generate_unique_random_numbers(n, 1, n * 10))
+            arena = bt.TreeArena.from_nodes(root)
+            write_text = time_call(bt.write_tree_text, text_path, root, "AVL")
+            read_text = time_call(bt.read_tree_text, text_path)
+            write_binary = time_call(bt.save_tree_binary, binary_path, arena, "AVL")
+            read_binary = time_call(bt.load_tree_binary, binary_path)
+            _, loaded = bt.load_tree_binary(binary_path)
+            assert list(loaded.inorder()) == list(arena.inorder())
+            print(f"{n:>9} {write_text:>12.3f} {read_text:>12.3f} {write_binary:>17.3f} {read_binary:>17.3f} "
+                  f"{os.path.getsize(text_path) / 2 ** 20:>9.1f} {os.path.getsize(binary_path) / 2 ** 20:>14.1f}")
+
+
+def import_tree_pop(levels):
+    """
+    Cách nhập cũ dùng levels[index].pop(0), giữ lại để so sánh.
+    """
+    if not levels or not levels[0]:
+        return None
+    root = bt.Node(levels[0][0])
+    queue = bt.deque([root])
+    index = 1
+    while queue and index < len(levels):
+        node = queue.popleft()
+        if node:
+            left_val = levels[index].pop(0) if levels[index] else None
+            right_val = levels[index].pop(0) if levels[index] else None
+            node.left = bt.Node(left_val) if left_val is not None else None
+            node.right = bt.Node(right_val) if right_val is not None else None
+            queue.append(node.left)
+            queue.append(node.right)
+        if not levels[index]:
+            index += 1
+    return root
+
+
+def bench_levelorder(*sizes):
+    """
+    Nhập theo cấp: pop(0) (cũ) so với import_tree tuyến tính và bộ mã khóa + bitmap.
+    """
+    sizes = [int(s) for s in sizes] or [10 ** 4, 10 ** 5, 10 ** 6]
+    print(f"{'n':>9} {'pop(0) (s)':>11} {'import_tree (s)':>16} {'mã hóa (s)':>11} {'giải mã (s)':>12} "
+          f"{'bitmap (KB)':>12}")
+    for n in sizes:
+        root = bt.build_balanced(range(n))
+        levels = bt.export_tree(root)
+        old_time = time_call(import_tree_pop, [list(level) for level in levels]) if n <= 10 ** 5 else None
+        import_time = time_call(bt.import_tree, levels)
+        encode_time = time_call(bt.encode_level_order, root)
+        keys, presence = bt.encode_level_order(root)
+        decode_time = time_call(bt.decode_level_order, keys, presence)
+        old = f"{old_time:>11.3f}" if old_time is not None else f"{'-':>11}"
+        print(f"{n:>9} {old} {import_time:>16.3f} {encode_time:>11.3f} {decode_time:>12.3f} "
+              f"{len(presence) / 1024:>12.1f}")
+
+
+def bench_succinct(*sizes):
+    """
+    Kích thước và tốc độ: mã hóa gọn (ngoặc 2n bit + varint) so với định dạng văn bản.
+    """
+    import os
+    import tempfile
+
+    sizes = [int(s) for s in sizes] or [10 ** 5, 10 ** 6]
+    print(f"{'n':>9} {'txt B/nút':>10} {'gọn B/nút':>10} {'ghi txt (s)':>12} {'mã hóa (s)':>11} "
+          f"{'đọc txt (s)':>12} {'giải mã (s)':>12}")
+    with tempfile.TemporaryDirectory() as directory:
+        text_path = os.path.join(directory, "tree.txt")
+        for n in sizes:
+            root = bt.build_balanced(bt.generate_unique_random_numbers(n, 1, n * 10))
+            write_time = time_call(bt.write_tree_text, text_path, root, "AVL")
+            read_time = time_call(bt.read_tree_text, text_path)
+            encode_time = time_call(bt.encode_succinct, root)
+            data = bt.encode_succinct(root)
+            decode_time = time_call(bt.decode_succinct, data)
+            assert bt.inorder(bt.decode_succinct(data)) == bt.inorder(root)
+            print(f"{n:>9} {os.path.getsize(text_path) / n:>10.2f} {len(data) / n:>10.2f} {write_time:>12.3f} "
+                  f"{encode_time:>11.3f} {read_time:>12.3f} {decode_time:>12.3f}")
+
+
+def bench_journal(n=10 ** 6, edits=10 ** 5):
+    """
+    Nhật ký thao tác: tốc độ ghi (fsync theo nhóm so với fsync từng bản ghi) và thời gian
+    khôi phục snapshot n nút + phát lại edits thao tác.
+    """
+    import os
+    import tempfile
+
+    n, edits = int(n), int(edits)
+    with tempfile.TemporaryDirectory() as directory:
+        journal = bt.TreeJournal(os.path.join(directory, "tree.wal"))
+        root = bt.build_balanced(range(0, 2 * n, 2))
+        index = bt.NodeIndex(root)
+        snapshot_time = time_call(journal.snapshot, root, "AVL")
+        operations = []
+        for _ in range(edits):
+            key = random.randrange(2 * n)
+            op = bt.OP_DELETE if key in index else bt.OP_INSERT
+            root = bt.apply_operation(root, index, op, "AVL", key)
+            operations.append((op, key))
+
+        def write_log(group_size):
+            previous = bt.GROUP_COMMIT_SIZE
+            bt.GROUP_COMMIT_SIZE = group_size
+            try:
+                for op, key in operations:
+                    journal.record(op, "AVL", key)
+                journal.sync()
+            finally:
+                bt.GROUP_COMMIT_SIZE = previous
+
+        single = min(edits, 1000)
+        single_time = time_call(lambda: [journal.record(op, "AVL", key) or journal.sync()
+                                         for op, key in operations[:single]])
+        journal.snapshot(bt.build_balanced(range(0, 2 * n, 2)), "AVL")
+        group_time = time_call(write_log, bt.GROUP_COMMIT_SIZE)
+        journal.close()
+        recover_time = time_call(lambda: bt.TreeJournal(journal.path).recover())
+        _, recovered, _ = bt.TreeJournal(journal.path).recover()
+        assert bt.inorder(recovered) == bt.inorder(root)
+    print(f"n={n}, {edits} thao tác")
+    print(f"snapshot          : {snapshot_time:8.2f} s")
+    print(f"fsync từng bản ghi: {single / single_time:10.0f} thao tác/s")
+    print(f"fsync theo nhóm   : {edits / group_time:10.0f} thao tác/s")
+    print(f"khôi phục         : {recover_time:8.2f} s")
+
+
+def bench_disktree(n=2 * 10 ** 5, cache_pages=64, queries=1000):
+    """
+    Cây trên đĩa (DiskTree): thời gian chèn/xóa/tìm và số lần nạp trang (page fault)
+    với bộ đệm LRU cache_pages trang.
+    """
+    import math
+    import os
+    import tempfile
+
+    n, cache_pages, queries = int(n), int(cache_pages), int(queries)
+    keys = bt.generate_unique_random_numbers(n, 1, n * 10)
+    with tempfile.TemporaryDirectory() as directory:
+        tree = bt.DiskTree(os.path.join(directory, "tree.nodes"), cache_pages)
+        print(f"n={n}, bộ đệm {cache_pages} trang x {bt.NODE_FILE_RECORDS} nút, log2(n)={math.log2(n):.1f}")
+        print(f"{'thao tác':<10} {'thời gian (s)':>14} {'µs/thao tác':>12} {'fault/thao tác':>15} {'hit/thao tác':>13} "
+              f"{'fault HĐH':>10}")
+
+        def os_faults():
+            # Page fault của hệ điều hành (minor + major), chỉ có trên Unix
+            try:
+                import resource
+            except ImportError:
+                return 0
+            usage = resource.getrusage(resource.RUSAGE_SELF)
+            return usage.ru_minflt + usage.ru_majflt
+
+        def report(name, count, func):
+            tree.reset_stats()
+            before = os_faults()
+            elapsed = time_call(func)
+            stats = tree.stats()
+            print(f"{name:<10} {elapsed:>14.2f} {elapsed / count * 1e6:>12.1f} {stats['faults'] / count:>15.2f} "
+                  f"{stats['hits'] / count:>13.1f} {os_faults() - before:>10}")
+
+        report("chèn", n, lambda: [tree.insert(key, True) for key in keys])
+        queries = random.sample(keys, min(queries, n))
+        report("tìm", len(queries), lambda: [tree.search_steps(key) for key in queries])
+        report("duyệt", n, tree.inorder)
+        report("xóa", len(queries), lambda: [tree.delete(key, True) for key in queries])
+        tree.close()
+
+
+def bench_parallel(n=10 ** 6, max_workers=None):
+    """
+    Đường tăng tốc của build_balanced_parallel theo số tiến trình (gồm cả khởi động tiến trình),
+    so với dựng tuần tự TreeArena.from_sorted; kiểm tra kết quả giống hệt.
+    """
+    import os
+
+    n = int(n)
+    max_workers = int(max_workers or os.cpu_count() or 1)
+    keys = bt.generate_unique_random_numbers(n, 1, n * 10)
+    sorted_keys = bt.sort_keys(keys)
+    sequential_time = time_call(bt.TreeArena.from_sorted, sorted_keys)
+    expected = bt.TreeArena.from_sorted(sorted_keys)
+    print(f"n = {n}, {os.cpu_count()} lõi; tuần tự: {sequential_time:.3f} s, "
+          f"build_balanced (Node): {time_call(bt.build_balanced, keys):.3f} s")
+    print(f"{'tiến trình':>10} {'thời gian (s)':>14} {'tăng tốc':>9} {'giống hệt':>10}")
+    for workers in range(1, max_workers + 1):
+        elapsed = time_call(bt.build_balanced_parallel, sorted_keys, workers, True)
+        arena = bt.build_balanced_parallel(sorted_keys, workers, True)
+        same = all(getattr(arena, name) == getattr(expected, name) for name in ("keys", "left", "right", "height"))
+        print(f"{workers:>10} {elapsed:>14.3f} {sequential_time / elapsed:>8.2f}x {str(same):>10}")
+
+
+def search_pickled(arena, queries):
+    return sum(arena.search(key) != bt.NIL for key in queries), len(arena.range_scan(0, 10 ** 6))
+
+
+def search_shared(name, queries):
+    view = bt.SharedTreeView(name)
+    try:
+        return sum(view.search(key) != bt.NIL for key in queries), len(view.range_scan(0, 10 ** 6))
+    finally:
+        view.close()
+
+
+def bench_shared(n=10 ** 6, workers=4, queries=10000):
+    """
+    Các tiến trình tìm kiếm trên cùng một cây: gửi arena (pickle) cho từng tác vụ so với
+    gắn vào ảnh chụp SharedTreeView; đo cả publish và refresh.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    n, workers, queries = int(n), int(workers), int(queries)
+    keys = bt.generate_unique_random_numbers(n, 1, n * 10)
+    arena = bt.TreeArena.from_sorted(bt.sort_keys(keys))
+    lookups = random.sample(keys, min(queries, n))
+    publisher = bt.SharedTreePublisher(f"bench-{random.getrandbits(32):08x}")
+    try:
+        print(f"publish {n} nút: {time_call(publisher.publish, arena, 'AVL') * 1000:.1f} ms")
+        with ProcessPoolExecutor(workers) as pool:
+            list(pool.map(abs, range(workers)))  # Khởi động các tiến trình trước khi đo
+
+            def run(func, tree):
+                results = list(pool.map(func, [tree] * workers, [lookups] * workers))
+                assert all(found == len(lookups) for found, _ in results)
+
+            print(f"{workers} tác vụ x {len(lookups)} lần tìm + quét khoảng:")
+            print(f"  pickle arena : {time_call(run, search_pickled, arena):.3f} s")
+            print(f"  shared_memory: {time_call(run, search_shared, publisher.name):.3f} s")
+        view = bt.SharedTreeView(publisher.name)
+        publisher.publish(bt.TreeArena.from_sorted(bt.sort_keys(keys[:n // 2])), "AVL")
+        print(f"refresh sang ảnh chụp mới: {time_call(view.refresh) * 1e6:.0f} µs, còn {len(view)} nút")
+        view.close()
+    finally:
+        publisher.close()
+
+
+BENCHMARKS = {
+    "memory": bench_memory,
+    "engines": bench_engines,
+    "bulk": bench_bulk,
+    "index": bench_index,
+    "render": bench_render,
+    "hittest": bench_hittest,
+    "lod": bench_lod,
+    "fileformat": bench_fileformat,
+    "levelorder": bench_levelorder,
+    "succinct": bench_succinct,
+    "journal": bench_journal,
+    "disktree": bench_disktree,
+    "parallel": bench_parallel,
+    "shared": bench_shared,
+    "redblack": bench_redblack,
+    "splay": bench_splay,
+    "btree": bench_btree,
+    "rebalance": bench_rebalance,
+    "setops": bench_setops,
+}
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2 or sys.argv[1] not in BENCHMARKS:
+        print("Các phép đo: " + ", ".join(BENCHMARKS))
+        sys.exit(1)
+    BENCHMARKS[sys.argv[1]](*sys.argv[2:])
@@ -0,0 +1,147 @@
+import random
+
+import pytest
+
+from treecore import (BINARY_HEADER, BINARY_MAGIC, BINARY_VERSION, TREE_TYPES, TreeArena, build_tree_from_keys,
+                      compute_heights, copy_tree, delete_avl, export_tree, insert_avl, load_tree_binary,
+                      read_tree_text, save_tree_binary, write_tree_text)
+
+
+def make_tree(tree_type, count=200, seed=1):
+    rng = random.Random(seed)
+    random.seed(seed)  # insert_binary chọn nhánh bằng random
+    return build_tree_from_keys(tree_type, rng.sample(range(1, count * 10), count))
+
+
+def node_heights(root, tree_type="AVL"):
+    """
+    (khóa, chiều cao) theo tiền thứ tự của cây Node; với cây đỏ-đen là (khóa, màu) vì file
+    nhị phân lưu màu trong cột chiều cao.
+    """
+    field = "color" if tree_type == "Đỏ-đen" else "height"
+    result = []
+    stack = [root] if root else []
+    while stack:
+        node = stack.pop()
+        result.append((node.val, getattr(node, field)))
+        stack.extend(child for child in (node.right, node.left) if child)
+    return result
+
+
+def arena_heights(arena):
+    result = []
+    stack = [arena.root] if arena.root != -1 else []
+    while stack:
+        i = stack.pop()
+        result.append((arena.keys[i], arena.height[i]))
+        stack.extend(child for child in (arena.right[i], arena.left[i]) if child != -1)
+    return result
+
+
+@pytest.mark.parametrize("tree_type", TREE_TYPES)
+def test_binary_round_trip(tmp_path, tree_type):
+    root = make_tree(tree_type)
+    path = tmp_path / "tree.btree"
+    save_tree_binary(path, root, tree_type)
+    loaded_type, arena = load_tree_binary(path)
+    assert loaded_type == tree_type
+    assert len(arena) == len(node_heights(root))
+    assert export_tree(arena) == export_tree(root)
+    assert arena_heights(arena) == node_heights(root, tree_type)
+
+
+@pytest.mark.parametrize("tree_type", TREE_TYPES)
+def test_text_round_trip(tmp_path, tree_type):
+    root = make_tree(tree_type)
+    path = tmp_path / "tree.txt"
+    write_tree_text(path, root, tree_type)
+    loaded_type, loaded, errors = read_tree_text(path)
+    assert (loaded_type, errors) == (tree_type, [])
+    assert export_tree(loaded) == export_tree(root)
+
+
+def test_text_import_keeps_avl_heights(tmp_path):
+    # File văn bản chỉ lưu hình dạng: chiều cao phải được tính lại khi nhập, không để mặc định 1
+    keys = random.Random(3).sample(range(1, 10 ** 5), 1000)
+    root = None
+    for key in keys:
+        root = insert_avl(root, key)
+    path = tmp_path / "tree.txt"
+    write_tree_text(path, root, "AVL")
+    _, loaded, _ = read_tree_text(path)
+    assert loaded.height == root.height > 1
+    assert node_heights(loaded) == node_heights(root)
+    # Phép chèn/xóa AVL sau khi nhập vẫn giữ cân bằng
+    for key in keys[:500]:
+        loaded = delete_avl(loaded, key)
+    for key in range(10 ** 5, 10 ** 5 + 500):
+        loaded = insert_avl(loaded, key)
+    recomputed = copy_tree(loaded)
+    assert compute_heights(recomputed)
+    assert node_heights(loaded) == node_heights(recomputed)
+
+
+@pytest.mark.parametrize("tree_type", TREE_TYPES)
+def test_text_binary_text(tmp_path, tree_type):
+    text_path, binary_path, again_path = tmp_path / "a.txt", tmp_path / "b.btree", tmp_path / "c.txt"
+    write_tree_text(text_path, make_tree(tree_type), tree_type)
+    _, root, _ = read_tree_text(text_path)
+    save_tree_binary(binary_path, root, tree_type)
+    loaded_type, arena = load_tree_binary(binary_path)
+    assert export_tree(arena) == export_tree(root)
+    assert arena_heights(arena) == node_heights(root, tree_type)
+    assert node_heights(arena.to_nodes(tree_type == "Đỏ-đen"), tree_type) == node_heights(root, tree_type)
+    write_tree_text(again_path, arena.to_nodes(), loaded_type)
+    assert again_path.read_bytes() == text_path.read_bytes()
+
+
+@pytest.mark.parametrize("balanced", [False, True])
+def test_arena_with_free_slots(tmp_path, balanced):
+    keys = random.Random(2).sample(range(1, 5000), 300)
+    arena = TreeArena()
+    for key in keys:
+        arena.insert(key, balanced=balanced)
+    for key in keys[::3]:
+        arena.delete(key, balanced=balanced)
+    assert arena.free_head != -1
+    path = tmp_path / "tree.btree"
+    save_tree_binary(path, arena, "AVL" if balanced else "BST")
+    _, loaded = load_tree_binary(path)
+    assert (loaded.root, loaded.free_head, len(loaded)) == (arena.root, arena.free_head, len(arena))
+    for name in ("keys", "left", "right", "height"):
+        assert getattr(loaded, name) == getattr(arena, name)
+    assert export_tree(loaded) == export_tree(arena)
+    # Ô trống được tái sử dụng sau khi nạp như trên arena gốc
+    free_head = loaded.free_head
+    loaded.insert(10 ** 6, balanced=balanced)
+    assert loaded.keys[free_head] == 10 ** 6
+    assert len(loaded.keys) == len(arena.keys)
+
+
+def write_binary(tmp_path):
+    path = tmp_path / "tree.btree"
+    save_tree_binary(path, make_tree("AVL"), "AVL")
+    return path, path.read_bytes()
+
+
+@pytest.mark.parametrize("cut", [0, 1, BINARY_HEADER.size - 1, BINARY_HEADER.size, -1])
+def test_truncated_file(tmp_path, cut):
+    path, data = write_binary(tmp_path)
+    path.write_bytes(data[:cut])
+    with pytest.raises(ValueError):
+        load_tree_binary(path)
+
+
+def test_bad_magic(tmp_path):
+    path, data = write_binary(tmp_path)
+    path.write_bytes(b"XXXX" + data[len(BINARY_MAGIC):])
+    with pytest.raises(ValueError, match="Không phải file cây nhị phân"):
+        load_tree_binary(path)
+
+
+def test_unsupported_version(tmp_path):
+    path, data = write_binary(tmp_path)
+    magic, _, *rest = BINARY_HEADER.unpack_from(data)
+    path.write_bytes(BINARY_HEADER.pack(magic, BINARY_VERSION + 1, *rest) + data[BINARY_HEADER.size:])
+    with pytest.raises(ValueError, match="Phiên bản"):
+        load_tree_binary(path)
@@ -0,0 +1,29 @@
+import os
+import subprocess
+import sys
+
+IMPORT_TIME_BUDGET = 0.5  # Giây, cho "import treecore" trong một tiến trình mới
+GUI_MODULES = {"PyQt5", "matplotlib", "networkx"}
+
+
+def import_treecore():
+    """
+    Import treecore trong một trình thông dịch mới; trả về (thời gian, các module giao diện đã nạp).
+    """
+    code = ("import sys, time; start = time.perf_counter(); import treecore; "
+            "print(time.perf_counter() - start); print(' '.join(sorted(sys.modules)))")
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+    elapsed, modules = output.splitlines()
+    return float(elapsed), {name for name in modules.split() if name.split(".")[0] in GUI_MODULES}
+
+
+def test_treecore_import_is_headless():
+    _, loaded = import_treecore()
+    assert not loaded
+
+
+def test_treecore_import_time():
+    # Lấy lần nhanh nhất để không bị ảnh hưởng bởi bộ đệm đĩa lúc chạy lần đầu
+    best = min(import_treecore()[0] for _ in range(3))
+    assert best < IMPORT_TIME_BUDGET
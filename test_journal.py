@@ -0,0 +1,31 @@
+import pytest
+
+from treecore import OP_INSERT, TreeJournal, inorder_iterative
+
+
+def test_record_before_open(tmp_path):
+    journal = TreeJournal(str(tmp_path / "tree.wal"))
+    with pytest.raises(RuntimeError, match="snapshot\\(\\) hoặc recover\\(\\)"):
+        journal.record(OP_INSERT, "AVL", 1)
+    assert not journal.pending_count
+
+
+def test_record_after_snapshot_and_recover(tmp_path):
+    path = str(tmp_path / "tree.wal")
+    journal = TreeJournal(path)
+    journal.snapshot(None, "AVL")
+    for key in (5, 3, 8):
+        journal.record(OP_INSERT, "AVL", key)
+    journal.close()
+    with pytest.raises(RuntimeError):
+        journal.record(OP_INSERT, "AVL", 9)
+
+    journal = TreeJournal(path)
+    tree_type, root, _ = journal.recover()
+    assert (tree_type, inorder_iterative(root)) == ("AVL", [3, 5, 8])
+    journal.record(OP_INSERT, "AVL", 9)
+    journal.close()
+    journal = TreeJournal(path)
+    _, root, _ = journal.recover()
+    journal.close()
+    assert inorder_iterative(root) == [3, 5, 8, 9]
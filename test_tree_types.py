@@ -0,0 +1,165 @@
+import math
+import random
+
+from treecore import (OP_CONVERT, OP_DELETE, OP_INSERT, SCAPEGOAT_ALPHA, NodeIndex, TreeJournal, apply_operation,
+                      black_height, convert_tree_type, copy_tree, delete_avl, delete_rb, delete_scapegoat,
+                      export_tree, get_height, inorder_iterative, insert_avl, insert_bst, insert_rb,
+                      insert_scapegoat, iter_levels)
+
+
+def check_avl(root):
+    """
+    Chiều cao lưu ở mọi nút đúng và cây cân bằng AVL; trả về chiều cao cây.
+    """
+    if root is None:
+        return 0
+    left, right = check_avl(root.left), check_avl(root.right)
+    assert root.height == 1 + max(left, right)
+    assert abs(left - right) <= 1
+    return root.height
+
+
+def build(insert, keys):
+    root = None
+    index = NodeIndex()
+    for key in keys:
+        root = insert(root, key, index)
+    return root, index
+
+
+def node_colors(root):
+    return sorted((node.val, node.color) for node in NodeIndex(root).nodes.values())
+
+
+def test_red_black_to_avl():
+    keys = random.Random(3).sample(range(10000), 500)
+    root, index = build(insert_rb, keys)
+    root = convert_tree_type(root, "AVL", index)
+    check_avl(root)
+    assert not index.check(root)
+    for key in keys[::2]:
+        root = delete_avl(root, key, index)
+    for key in range(10000, 10300):
+        root = insert_avl(root, key, index)
+    check_avl(root)
+    assert not index.check(root)
+    assert inorder_iterative(root) == sorted(set(keys) - set(keys[::2]) | set(range(10000, 10300)))
+
+
+def test_avl_to_red_black():
+    keys = list(range(300))
+    root, index = build(insert_avl, keys)
+    root = convert_tree_type(root, "Đỏ-đen", index)
+    assert black_height(root) > 0
+    for key in keys[::3]:
+        root = delete_rb(root, key, index)
+    for key in range(300, 600):
+        root = insert_rb(root, key, index)
+    assert black_height(root) > 0
+    assert not index.check(root)
+
+
+def test_colors_do_not_touch_heights():
+    root, index = build(insert_avl, range(100))
+    before = {key: node.height for key, node in index.nodes.items()}
+    root = convert_tree_type(root, "Đỏ-đen", index)
+    assert {key: node.height for key, node in index.nodes.items()} == before
+    root = convert_tree_type(root, "AVL", index)
+    assert check_avl(root) == get_height(root)
+
+
+def test_unbalanced_tree_is_rebuilt():
+    root, index = build(insert_bst, range(200))  # Dây leo, chiều cao 200
+    root = convert_tree_type(root, "AVL", index)
+    assert check_avl(root) == 8
+    assert not index.check(root)
+    root, index = build(insert_bst, range(200))
+    root = convert_tree_type(root, "Đỏ-đen", index)
+    assert black_height(root) > 0
+    assert not index.check(root)
+    assert inorder_iterative(root) == list(range(200))
+
+
+def test_convert_is_replayed_from_journal(tmp_path):
+    path = str(tmp_path / "tree.wal")
+    journal = TreeJournal(path)
+    journal.snapshot(None, "BST")
+    root, index = None, NodeIndex()
+    operations = [(OP_INSERT, "BST", key) for key in range(50)]
+    operations += [(OP_CONVERT, "AVL", 0), (OP_DELETE, "AVL", 10), (OP_CONVERT, "Đỏ-đen", 0)]
+    operations += [(OP_INSERT, "Đỏ-đen", key) for key in range(100, 120)]
+    for op, tree_type, key in operations:
+        root = apply_operation(root, index, op, tree_type, key)
+        journal.record(op, tree_type, key)
+    journal.close()
+
+    journal = TreeJournal(path)
+    tree_type, recovered, recovered_index = journal.recover()
+    journal.close()
+    assert tree_type == "Đỏ-đen"
+    assert export_tree(recovered) == export_tree(root)
+    assert black_height(recovered) == black_height(root) > 0
+    assert not recovered_index.check(recovered)
+
+    # Snapshot của cây đỏ-đen giữ nguyên màu của từng nút
+    journal = TreeJournal(path)
+    journal.recover()
+    journal.snapshot(copy_tree(root), "Đỏ-đen")
+    journal.close()
+    journal = TreeJournal(path)
+    _, recovered, _ = journal.recover()
+    journal.close()
+    assert node_colors(recovered) == node_colors(root)
+
+
+def scapegoat_height_limit(size):
+    return math.floor(math.log(max(size, 1)) / math.log(1 / SCAPEGOAT_ALPHA)) + 1
+
+
+def test_scapegoat_delete_keeps_height_bound():
+    keys = random.Random(4).sample(range(100000), 2000)
+    root, index = build(insert_scapegoat, keys)
+    assert index.max_size == 2000
+    # Xóa các khóa nhỏ trước: cây BST thường sẽ còn lại một nhánh phải rất lệch
+    for key in sorted(keys):
+        root = delete_scapegoat(root, key, index)
+        size = len(index)
+        assert SCAPEGOAT_ALPHA * index.max_size <= size <= index.max_size
+        assert sum(1 for _ in iter_levels(root)) <= scapegoat_height_limit(index.max_size)
+    assert root is None and not index.check(root)
+
+
+def test_scapegoat_rebuilds_after_many_deletes():
+    root, index = build(insert_scapegoat, range(1000))
+    rebuilds = 0
+    for key in range(0, 1000, 2):
+        max_size = index.max_size
+        root = delete_scapegoat(root, key, index)
+        rebuilds += index.max_size != max_size
+    assert rebuilds >= 1 and not index.check(root)
+    assert inorder_iterative(root) == list(range(1, 1000, 2))
+
+
+def test_scapegoat_deletes_are_replayed_from_journal(tmp_path):
+    path = str(tmp_path / "tree.wal")
+    journal = TreeJournal(path)
+    journal.snapshot(None, "Scapegoat")
+    root, index = None, NodeIndex()
+    keys = random.Random(5).sample(range(10000), 400)
+    operations = [(OP_INSERT, key) for key in keys] + [(OP_DELETE, key) for key in keys[:300]]
+    for op, key in operations:
+        root = apply_operation(root, index, op, "Scapegoat", key)
+        journal.record(op, "Scapegoat", key)
+    journal.close()
+    journal = TreeJournal(path)
+    _, recovered, recovered_index = journal.recover()
+    journal.close()
+    assert export_tree(recovered) == export_tree(root)
+    assert recovered_index.max_size == index.max_size
+
+
+def test_convert_to_scapegoat():
+    root, index = build(insert_bst, range(300))  # Dây leo vượt cận chiều cao
+    root = convert_tree_type(root, "Scapegoat", index)
+    assert sum(1 for _ in iter_levels(root)) <= scapegoat_height_limit(300)
+    assert index.max_size == 300 and not index.check(root)
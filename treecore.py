@@ -0,0 +1,3601 @@
+"""
+Lõi xử lý cây không cần giao diện: các thuật toán chèn/xóa/duyệt, arena, cây trên đĩa,
+các định dạng file và nhật ký thao tác. Không import PyQt5/matplotlib nên dùng được trong
+script xử lý hàng loạt; Binarytree.py dựng giao diện trên lõi này.
+
+Dòng lệnh: python treecore.py {build,load,query,convert,stats,setop} ... (xem --help)
+"""
+import os
+import sys
+import math
+import mmap
+import time
+import random
+import struct
+import zlib
+import numpy as np
+from bisect import bisect_left, bisect_right
+from collections import deque, OrderedDict
+from itertools import islice
+from array import array
+
+
+# Định nghĩa lớp Node cho các loại cây
+class Node:
+    color = None  # Màu RED/BLACK, chỉ các nút của cây đỏ-đen mới gán (không tốn bộ nhớ ở nút khác)
+
+    def __init__(self, key):
+        self.left = None
+        self.right = None
+        self.val = key
+        self.height = 1  # Chiều cao (AVL)
+
+# Các hàm chèn nút theo quy tắc của từng loại cây
+def insert_binary(root, key):
+    if root is None:
+        return Node(key)
+    else:
+        if random.choice([True, False]):
+            root.left = insert_binary(root.left, key)
+        else:
+            root.right = insert_binary(root.right, key)
+    return root
+
+def insert_bst_recursive(root, key):
+    if root is None:
+        return Node(key)
+    else:
+        if key < root.val:
+            root.left = insert_bst_recursive(root.left, key)
+        else:
+            root.right = insert_bst_recursive(root.right, key)
+    return root
+
+def get_height(node):
+    if not node:
+        return 0
+    return node.height
+
+def update_height(node):
+    if node:
+        node.height = 1 + max(get_height(node.left), get_height(node.right))
+
+def get_balance(node):
+    if not node:
+        return 0
+    return get_height(node.left) - get_height(node.right)
+
+def rotate_right(y):
+    x = y.left
+    T2 = x.right
+    x.right = y
+    y.left = T2
+    update_height(y)
+    update_height(x)
+    return x
+
+def rotate_left(x):
+    y = x.right
+    T2 = y.left
+    y.left = x
+    x.right = T2
+    update_height(x)
+    update_height(y)
+    return y
+
+def insert_avl_recursive(node, key):
+    if not node:
+        return Node(key)
+    if key < node.val:
+        node.left = insert_avl_recursive(node.left, key)
+    else:
+        node.right = insert_avl_recursive(node.right, key)
+    update_height(node)
+
+    balance = get_balance(node)
+    if balance > 1:
+        if key < node.left.val:
+            return rotate_right(node)
+        else:
+            node.left = rotate_left(node.left)
+            return rotate_right(node)
+    if balance < -1:
+        if key > node.right.val:
+            return rotate_left(node)
+        else:
+            node.right = rotate_right(node.right)
+            return rotate_left(node)
+    return node
+
+def delete_bst_recursive(node, key):
+    if not node:
+        return node
+    if key < node.val:
+        node.left = delete_bst_recursive(node.left, key)
+    elif key > node.val:
+        node.right = delete_bst_recursive(node.right, key)
+    else:
+        if not node.left:
+            return node.right
+        elif not node.right:
+            return node.left
+        temp = get_min_value_node(node.right)
+        node.val = temp.val
+        node.right = delete_bst_recursive(node.right, temp.val)
+    return node
+
+def delete_avl_recursive(root, key):
+    if not root:
+        return root
+    if key < root.val:
+        root.left = delete_avl_recursive(root.left, key)
+    elif key > root.val:
+        root.right = delete_avl_recursive(root.right, key)
+    else:
+        if not root.left:
+            return root.right
+        elif not root.right:
+            return root.left
+        temp = get_min_value_node(root.right)
+        root.val = temp.val
+        root.right = delete_avl_recursive(root.right, temp.val)
+
+    update_height(root)
+    balance = get_balance(root)
+
+    if balance > 1 and get_balance(root.left) >= 0:
+        return rotate_right(root)
+    if balance > 1 and get_balance(root.left) < 0:
+        root.left = rotate_left(root.left)
+        return rotate_right(root)
+    if balance < -1 and get_balance(root.right) <= 0:
+        return rotate_left(root)
+    if balance < -1 and get_balance(root.right) > 0:
+        root.right = rotate_right(root.right)
+        return rotate_left(root)
+    return root
+
+
+def delete_binary_recursive(node, key):
+    if node is None:
+        return None  # Nút rỗng, không cần xử lý
+
+    # Kiểm tra nếu đây là nút cần xóa
+    if node.val == key:
+        # Trường hợp 1: Nút lá (không có con)
+        if not node.left and not node.right:
+            return None
+        # Trường hợp 2: Nút có 1 con
+        if not node.left:
+            return node.right
+        if not node.right:
+            return node.left
+        # Trường hợp 3: Nút có 2 con
+        temp = get_min_value_node(node.right)
+        node.val = temp.val
+        node.right = delete_binary_recursive(node.right, temp.val)
+        return node
+
+    # Duyệt cả hai nhánh để tìm nút cần xóa
+    node.left = delete_binary_recursive(node.left, key)
+    node.right = delete_binary_recursive(node.right, key)
+    return node
+
+
+def get_min_value_node(node):
+    """
+    Hàm tìm giá trị nhỏ nhất trong cây con phải.
+    """
+    current = node
+    while current.left is not None:
+        current = current.left
+    return current
+
+
+def rebalance(node):
+    """
+    Cân bằng lại nút theo AVL, trả về gốc mới của cây con.
+    """
+    update_height(node)
+    balance = get_balance(node)
+    if balance > 1:
+        if get_balance(node.left) < 0:
+            node.left = rotate_left(node.left)
+        return rotate_right(node)
+    if balance < -1:
+        if get_balance(node.right) > 0:
+            node.right = rotate_right(node.right)
+        return rotate_left(node)
+    return node
+
+
+def compute_heights(root):
+    """
+    Tính lại chiều cao AVL của mọi nút từ dưới lên (cây đọc từ định dạng chỉ lưu hình dạng).
+    Trả về True nếu mọi nút thỏa điều kiện cân bằng AVL.
+    """
+    balanced = True
+    stack = [(root, False)] if root else []
+    while stack:
+        node, done = stack.pop()
+        if done:
+            update_height(node)
+            balanced = balanced and abs(get_balance(node)) <= 1
+            continue
+        stack.append((node, True))
+        stack.extend((child, False) for child in (node.left, node.right) if child)
+    return balanced
+
+
+def link_child(parent, old, new, root, index=None):
+    """
+    Thay con old của parent bằng new, trả về gốc (có thể mới) của cây.
+    """
+    if index is not None:
+        index.set_parent(new, parent)
+    if parent is None:
+        return new
+    if parent.left is old:
+        parent.left = new
+    else:
+        parent.right = new
+    return root
+
+
+class NodeIndex:
+    """
+    Chỉ mục băm từ giá trị sang nút và sang nút cha, giúp tra cứu O(1).
+    Giả định các giá trị trong cây là duy nhất (như các cây do ứng dụng tạo ra).
+    """
+
+    def __init__(self, root=None):
+        self.nodes = {}
+        self.parents = {}
+        self.max_size = 0  # Số nút lớn nhất kể từ lần dựng lại toàn cây gần nhất (cây scapegoat)
+        self.rebuild(root)
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def __contains__(self, key):
+        return key in self.nodes
+
+    def rebuild(self, root):
+        self.nodes.clear()
+        self.parents.clear()
+        stack = [(root, None)] if root else []
+        while stack:
+            node, parent = stack.pop()
+            self.nodes[node.val] = node
+            self.parents[node.val] = parent
+            if node.left:
+                stack.append((node.left, node))
+            if node.right:
+                stack.append((node.right, node))
+        self.max_size = len(self.nodes)
+
+    def get(self, key):
+        return self.nodes.get(key)
+
+    def parent(self, key):
+        return self.parents.get(key)
+
+    def add(self, node, parent):
+        self.nodes[node.val] = node
+        self.parents[node.val] = parent
+
+    def remove(self, key):
+        self.nodes.pop(key, None)
+        self.parents.pop(key, None)
+
+    def set_parent(self, node, parent):
+        if node is not None:
+            self.parents[node.val] = parent
+
+    def move(self, node, old_key):
+        """
+        Nút node vừa nhận giá trị mới (thay cho old_key) khi xóa nút có 2 con.
+        """
+        self.nodes[node.val] = node
+        self.parents[node.val] = self.parents.pop(old_key)
+        del self.nodes[old_key]
+
+    def swap(self, a, b):
+        """
+        Cập nhật sau khi hai nút a và b đã đổi giá trị cho nhau.
+        """
+        self.nodes[a.val] = a
+        self.nodes[b.val] = b
+        self.parents[a.val], self.parents[b.val] = self.parents[b.val], self.parents[a.val]
+
+    def refresh(self, node, parent):
+        """
+        Cập nhật nút cha cho hai tầng dưới node sau một phép quay (đơn hoặc kép).
+        """
+        self.set_parent(node, parent)
+        for child in (node.left, node.right):
+            if child:
+                self.parents[child.val] = node
+                self.set_parent(child.left, child)
+                self.set_parent(child.right, child)
+
+    def check(self, root):
+        """
+        Kiểm tra chỉ mục khớp với cây, trả về danh sách các lỗi tìm thấy.
+        """
+        errors = []
+        seen = 0
+        stack = [(root, None)] if root else []
+        while stack:
+            node, parent = stack.pop()
+            seen += 1
+            if self.nodes.get(node.val) is not node:
+                errors.append(f"Giá trị {node.val} không trỏ tới đúng nút")
+            if node.val not in self.parents or self.parents[node.val] is not parent:
+                errors.append(f"Nút cha của {node.val} không đúng")
+            if node.left:
+                stack.append((node.left, node))
+            if node.right:
+                stack.append((node.right, node))
+        if seen != len(self.nodes) or seen != len(self.parents):
+            errors.append(f"Chỉ mục có {len(self.nodes)} giá trị nhưng cây có {seen} nút")
+        return errors
+
+
+# Các phiên bản không đệ quy: dùng ngăn xếp đường đi thay cho lời gọi hàm,
+# không bị giới hạn độ sâu đệ quy trên cây suy biến.
+# Tham số index (NodeIndex) tùy chọn được cập nhật theo từng thay đổi.
+def insert_bst_iterative(root, key, index=None):
+    new = Node(key)
+    if root is None:
+        if index is not None:
+            index.add(new, None)
+        return new
+    node = root
+    while True:
+        if key < node.val:
+            if node.left is None:
+                node.left = new
+                break
+            node = node.left
+        else:
+            if node.right is None:
+                node.right = new
+                break
+            node = node.right
+    if index is not None:
+        index.add(new, node)
+    return root
+
+
+def insert_avl_iterative(root, key, index=None):
+    if root is None:
+        return insert_bst_iterative(root, key, index)
+    path = []
+    node = root
+    while node:
+        path.append(node)
+        node = node.left if key < node.val else node.right
+    parent = path[-1]
+    new = Node(key)
+    if key < parent.val:
+        parent.left = new
+    else:
+        parent.right = new
+    if index is not None:
+        index.add(new, parent)
+
+    # Đi ngược lên, dừng khi chiều cao cây con không đổi
+    for depth in range(len(path) - 1, -1, -1):
+        node = path[depth]
+        old_height = node.height
+        new = rebalance(node)
+        if new is not node:
+            # Sau một phép quay khi chèn, chiều cao cây con trở lại như trước
+            parent = path[depth - 1] if depth else None
+            if index is not None:
+                index.refresh(new, parent)
+            return link_child(parent, node, new, root)
+        if node.height == old_height:
+            break
+    return root
+
+
+def delete_bst_iterative(root, key, index=None):
+    parent = None
+    node = root
+    while node and node.val != key:
+        parent = node
+        node = node.left if key < node.val else node.right
+    if node is None:
+        return root
+    if node.left and node.right:
+        parent = node
+        succ = node.right
+        while succ.left:
+            parent = succ
+            succ = succ.left
+        node.val = succ.val
+        if index is not None:
+            index.move(node, key)
+        node = succ
+    elif index is not None:
+        index.remove(key)
+    return link_child(parent, node, node.left if node.left else node.right, root, index)
+
+
+def delete_avl_iterative(root, key, index=None):
+    path = []
+    node = root
+    while node and node.val != key:
+        path.append(node)
+        node = node.left if key < node.val else node.right
+    if node is None:
+        return root
+    if node.left and node.right:
+        path.append(node)
+        succ = node.right
+        while succ.left:
+            path.append(succ)
+            succ = succ.left
+        node.val = succ.val
+        if index is not None:
+            index.move(node, key)
+        node = succ
+    elif index is not None:
+        index.remove(key)
+    root = link_child(path[-1] if path else None, node, node.left if node.left else node.right, root, index)
+
+    # Đi ngược lên, dừng khi chiều cao cây con không đổi
+    for depth in range(len(path) - 1, -1, -1):
+        node = path[depth]
+        old_height = node.height
+        new = rebalance(node)
+        if new is not node:
+            parent = path[depth - 1] if depth else None
+            if index is not None:
+                index.refresh(new, parent)
+            root = link_child(parent, node, new, root)
+        if new.height == old_height:
+            break
+    return root
+
+
+def delete_binary_iterative(root, key, index=None):
+    if index is not None:
+        # Có chỉ mục thì lấy thẳng nút và nút cha thay vì duyệt cả cây
+        node = index.get(key)
+        stack = [(node, index.parent(key))] if node else []
+    else:
+        stack = [(root, None)] if root else []
+    while stack:
+        node, parent = stack.pop()
+        if node.val != key:
+            # Duyệt cả hai nhánh để tìm nút cần xóa
+            if node.right:
+                stack.append((node.right, node))
+            if node.left:
+                stack.append((node.left, node))
+            continue
+        if node.left and node.right:
+            succ_parent = node
+            succ = node.right
+            while succ.left:
+                succ_parent = succ
+                succ = succ.left
+            node.val = succ.val
+            if index is not None:
+                index.move(node, key)
+            link_child(succ_parent, succ, succ.right, root, index)
+        else:
+            if index is not None:
+                index.remove(key)
+            root = link_child(parent, node, node.left if node.left else node.right, root, index)
+    return root
+
+
+# Cây đỏ-đen: màu lưu ở trường color riêng của nút, trường height không được cập nhật. Trong
+# arena và file nhị phân của cây đỏ-đen, cột chiều cao chứa màu (xem TreeArena.from_nodes).
+# Mỗi lần chèn quay tối đa 2 lần, mỗi lần xóa tối đa 3 lần; đổi màu có thể lan lên nhưng O(1) khấu hao.
+RED = 0
+BLACK = 1
+
+
+def is_red(node):
+    return node is not None and node.color == RED
+
+
+def rotate_left_rb(x):
+    # Quay như rotate_left nhưng không cập nhật chiều cao (cây đỏ-đen không dùng)
+    y = x.right
+    x.right = y.left
+    y.left = x
+    return y
+
+
+def rotate_right_rb(y):
+    x = y.left
+    y.left = x.right
+    x.right = y
+    return x
+
+
+def insert_rb(root, key, index=None):
+    path = []
+    node = root
+    while node:
+        path.append(node)
+        node = node.left if key < node.val else node.right
+    node = Node(key)
+    node.color = RED
+    parent = path[-1] if path else None
+    if parent is None:
+        root = node
+    elif key < parent.val:
+        parent.left = node
+    else:
+        parent.right = node
+    if index is not None:
+        index.add(node, parent)
+
+    # Cha đỏ thì cha không phải gốc (gốc luôn đen) nên luôn có ông
+    while path and path[-1].color == RED:
+        parent = path.pop()
+        grand = path.pop()
+        uncle = grand.right if grand.left is parent else grand.left
+        if is_red(uncle):
+            # Chú đỏ: đẩy màu đen xuống một tầng rồi xét tiếp từ ông
+            parent.color = uncle.color = BLACK
+            grand.color = RED
+            node = grand
+            continue
+        if grand.left is parent:
+            if node is parent.right:
+                grand.left = rotate_left_rb(parent)
+            top = rotate_right_rb(grand)
+        else:
+            if node is parent.left:
+                grand.right = rotate_right_rb(parent)
+            top = rotate_left_rb(grand)
+        top.color = BLACK
+        grand.color = RED
+        great = path[-1] if path else None
+        if index is not None:
+            index.refresh(top, great)
+        root = link_child(great, grand, top, root)
+        break
+    root.color = BLACK
+    return root
+
+
+def delete_rb(root, key, index=None):
+    path = []
+    node = root
+    while node and node.val != key:
+        path.append(node)
+        node = node.left if key < node.val else node.right
+    if node is None:
+        return root
+    if node.left and node.right:
+        path.append(node)
+        succ = node.right
+        while succ.left:
+            path.append(succ)
+            succ = succ.left
+        node.val = succ.val
+        if index is not None:
+            index.move(node, key)
+        node = succ
+    elif index is not None:
+        index.remove(key)
+    removed = node
+    node = removed.left if removed.left else removed.right
+    root = link_child(path[-1] if path else None, removed, node, root, index)
+    if removed.color == RED:
+        return root
+    if is_red(node):
+        node.color = BLACK
+        return root
+
+    # Nhánh chứa node thiếu một nút đen: đi lên cho tới khi bù được
+    while path:
+        parent = path[-1]
+        great = path[-2] if len(path) > 1 else None
+        left_side = node is parent.left  # node có thể là None; khi đó nhánh anh em chắc chắn khác None
+        sibling = parent.right if left_side else parent.left
+        if sibling.color == RED:
+            # Anh em đỏ: quay để cha (đổi thành đỏ) tụt xuống, anh em mới là nút đen
+            sibling.color = BLACK
+            parent.color = RED
+            top = rotate_left_rb(parent) if left_side else rotate_right_rb(parent)
+            if index is not None:
+                index.refresh(top, great)
+            root = link_child(great, parent, top, root)
+            path.insert(len(path) - 1, top)
+            great = top
+            sibling = parent.right if left_side else parent.left
+        near, far = (sibling.left, sibling.right) if left_side else (sibling.right, sibling.left)
+        if not is_red(near) and not is_red(far):
+            sibling.color = RED
+            if parent.color == RED:
+                parent.color = BLACK
+                return root
+            node = path.pop()
+            continue
+        if not is_red(far):
+            near.color = BLACK
+            sibling.color = RED
+            if left_side:
+                parent.right = sibling = rotate_right_rb(sibling)
+            else:
+                parent.left = sibling = rotate_left_rb(sibling)
+            if index is not None:
+                index.refresh(sibling, parent)
+            far = sibling.right if left_side else sibling.left
+        sibling.color = parent.color
+        parent.color = BLACK
+        far.color = BLACK
+        top = rotate_left_rb(parent) if left_side else rotate_right_rb(parent)
+        if index is not None:
+            index.refresh(top, great)
+        return link_child(great, parent, top, root)
+    if root:
+        root.color = BLACK
+    return root
+
+
+def black_height(root):
+    """
+    Số nút đen trên mọi đường từ gốc xuống lá nếu cây thỏa các tính chất đỏ-đen, ngược lại -1.
+    """
+    if is_red(root):
+        return -1
+    heights = {}
+    stack = [(root, False)] if root else []
+    while stack:
+        node, done = stack.pop()
+        if not done:
+            stack.append((node, True))
+            stack.extend((child, False) for child in (node.left, node.right) if child)
+            continue
+        if node.color not in (RED, BLACK) or (node.color == RED and (is_red(node.left) or is_red(node.right))):
+            return -1
+        left = heights.pop(node.left) if node.left else 0
+        right = heights.pop(node.right) if node.right else 0
+        if left != right:
+            return -1
+        heights[node] = left + (node.color == BLACK)
+    return heights[root] if root else 0
+
+
+def color_red_black(root):
+    """
+    Tô màu đỏ-đen cho một cây BST có sẵn hình dạng (đọc từ file văn bản, dựng hàng loạt...).
+    Với mỗi nút tính khoảng số nút đen b (tính cả nút, tới lá) khả thi khi nút đen hoặc đỏ:
+    nút đen cần b - 1 khả thi ở cả hai con, nút đỏ cần b khả thi ở cả hai con khi chúng đen.
+    Các khoảng này liên tục nên chỉ cần lưu hai đầu mút. Trả về False nếu không tô được.
+    """
+    if root is None:
+        return True
+    empty = (1, 0)
+    black = {None: (0, 0)}  # Khoảng b khi nút đen (nút rỗng coi là đen, b = 0)
+    any_color = {None: (0, 0)}
+    red = {}
+    stack = [(root, False)]
+    while stack:
+        node, done = stack.pop()
+        if not done:
+            stack.append((node, True))
+            stack.extend((child, False) for child in (node.left, node.right) if child)
+            continue
+        (left_lo, left_hi), (right_lo, right_hi) = any_color[node.left], any_color[node.right]
+        lo, hi = max(left_lo, right_lo), min(left_hi, right_hi)
+        black[node] = (lo + 1, hi + 1) if lo <= hi else empty
+        (left_lo, left_hi), (right_lo, right_hi) = black[node.left], black[node.right]
+        red[node] = (max(left_lo, right_lo), min(left_hi, right_hi))
+        ranges = [r for r in (black[node], red[node]) if r[0] <= r[1]]
+        any_color[node] = (min(r[0] for r in ranges), max(r[1] for r in ranges)) if ranges else empty
+
+    lo, hi = black[root]
+    if lo > hi:
+        lo, hi = red[root]
+        if lo > hi:
+            return False
+        # Gốc đỏ khả thi thì đổi gốc thành đen vẫn hợp lệ (mọi đường thêm đúng một nút đen)
+        black[root] = (lo + 1, lo + 1)
+        lo += 1
+    stack = [(root, lo)]
+    while stack:
+        node, b = stack.pop()
+        low, high = black[node]
+        node.color = BLACK if low <= b <= high else RED
+        child_b = b - 1 if node.color == BLACK else b
+        stack.extend((child, child_b) for child in (node.left, node.right) if child)
+    return True
+
+
+# Cây splay: tự điều chỉnh, mỗi lần truy cập (tìm, chèn, xóa) đưa khóa được truy cập lên gốc
+# nên các khóa hay dùng luôn nằm gần gốc. Splay từ trên xuống (Sleator-Tarjan) không đệ quy:
+# đi xuống một lượt, tách dần các nút trên đường tìm sang cây trái L / cây phải R rồi ghép lại.
+# Cây splay không dùng trường height.
+def splay(root, key, index=None):
+    """
+    Đưa nút có khóa key (hoặc nút cuối cùng trên đường tìm nếu không có) lên gốc. Trả về gốc mới.
+    Chỉ các nút trên đường tìm bị đổi liên kết.
+    """
+    if root is None:
+        return None
+    header = Node(None)  # header.right là gốc của L, header.left là gốc của R
+    left_max = right_min = header
+    touched = [] if index is not None else None  # Các nút đổi liên kết, để cập nhật chỉ mục
+    node = root
+    while True:
+        if touched is not None:
+            touched.append(node)
+        if key < node.val:
+            if node.left is None:
+                break
+            if key < node.left.val:
+                # zig-zig: quay phải trước khi tách
+                child = node.left
+                node.left = child.right
+                child.right = node
+                node = child
+                if touched is not None:
+                    touched.append(node)
+                if node.left is None:
+                    break
+            right_min.left = node  # Nối node vào cạnh trái nhỏ nhất của R
+            right_min = node
+            node = node.left
+        elif key > node.val:
+            if node.right is None:
+                break
+            if key > node.right.val:
+                child = node.right
+                node.right = child.left
+                child.left = node
+                node = child
+                if touched is not None:
+                    touched.append(node)
+                if node.right is None:
+                    break
+            left_max.right = node  # Nối node vào cạnh phải lớn nhất của L
+            left_max = node
+            node = node.right
+        else:
+            break
+    left_max.right = node.left
+    right_min.left = node.right
+    node.left = header.right
+    node.right = header.left
+    if index is not None:
+        index.set_parent(node, None)
+        for parent in touched:
+            index.set_parent(parent.left, parent)
+            index.set_parent(parent.right, parent)
+    return node
+
+
+def insert_splay(root, key, index=None):
+    new = Node(key)
+    if root is not None:
+        root = splay(root, key, index)
+        if root.val == key:
+            return root
+        if key < root.val:
+            new.left, new.right = root.left, root
+            root.left = None
+        else:
+            new.left, new.right = root, root.right
+            root.right = None
+    if index is not None:
+        index.add(new, None)
+        index.set_parent(new.left, new)
+        index.set_parent(new.right, new)
+    return new
+
+
+def delete_splay(root, key, index=None):
+    root = splay(root, key, index)
+    if root is None or root.val != key:
+        return root
+    if index is not None:
+        index.remove(key)
+    if root.left is None:
+        new = root.right
+    else:
+        # Mọi khóa bên trái nhỏ hơn key nên splay đưa khóa lớn nhất lên, gốc mới không có con phải
+        new = splay(root.left, key, index)
+        new.right = root.right
+    if index is not None:
+        index.set_parent(new, None)
+        if new is not None:
+            index.set_parent(new.right, new)
+    return new
+
+
+# Cân bằng lại BST bằng Day-Stout-Warren: quay phải mọi nút có con trái để cây thành "dây leo"
+# (chỉ có con phải), rồi nén dây leo bằng các lượt quay trái. O(n) thời gian, O(1) bộ nhớ phụ
+# (một nút giả đứng trên gốc). Không dùng trường height nên chỉ hợp với BST/Scapegoat/Splay.
+def tree_to_vine(pseudo, index=None):
+    """
+    Duỗi cây dưới pseudo.right thành dây leo, trả về số nút.
+    """
+    tail = pseudo
+    rest = tail.right
+    count = 0
+    while rest:
+        if rest.left:
+            left = rest.left
+            rest.left = left.right
+            left.right = rest
+            tail.right = left
+            if index is not None:
+                index.set_parent(rest.left, rest)
+                index.set_parent(rest, left)
+                index.set_parent(left, tail)
+            rest = left
+        else:
+            count += 1
+            tail = rest
+            rest = rest.right
+    return count
+
+
+def compress_vine(pseudo, count, index=None):
+    """
+    Quay trái count lần dọc theo dây leo, mỗi lần hạ một nút xuống làm con trái của nút kế tiếp.
+    """
+    scanner = pseudo
+    for _ in range(count):
+        child = scanner.right
+        grand = child.right
+        scanner.right = grand
+        child.right = grand.left
+        grand.left = child
+        if index is not None:
+            index.set_parent(child.right, child)
+            index.set_parent(child, grand)
+            index.set_parent(grand, scanner)
+        scanner = grand
+
+
+def rebalance_dsw(root, index=None):
+    """
+    Dựng lại cây (hoặc cây con) với chiều cao nhỏ nhất, giữ nguyên các nút và thứ tự giữa.
+    Trả về gốc mới; với index, nút cha của gốc mới được đặt là None (người gọi nối lại nếu là cây con).
+    """
+    if root is None:
+        return None
+    pseudo = Node(None)
+    pseudo.right = root
+    count = tree_to_vine(pseudo, index)
+    # Lượt đầu chỉ nén phần dư để các tầng phía trên thành cây nhị phân đầy đủ
+    leaves = count + 1 - (1 << ((count + 1).bit_length() - 1))
+    compress_vine(pseudo, leaves, index)
+    count -= leaves
+    while count > 1:
+        count //= 2
+        compress_vine(pseudo, count, index)
+    root = pseudo.right
+    if index is not None:
+        index.set_parent(root, None)
+    return root
+
+
+# Cây scapegoat: BST không lưu thêm gì ở nút. Khi nút mới sâu hơn log_{1/α}(n), trên đường đi
+# có một tổ tiên mà một con nặng hơn α lần cả cây con của nó ("con dê tế thần"); chỉ cây con đó
+# được dựng lại cân bằng (DSW), nên chiều cao luôn O(log n). Xóa như BST; khi số nút giảm
+# dưới α lần max_size (số nút lớn nhất kể từ lần dựng lại toàn cây gần nhất, lưu trong
+# NodeIndex) thì dựng lại cả cây.
+SCAPEGOAT_ALPHA = 0.7
+
+
+def count_nodes(root, limit=None):
+    """
+    Số nút của cây; với limit thì dừng sớm và trả về limit + 1 khi cây có nhiều hơn limit nút.
+    """
+    count = 0
+    stack = [root] if root else []
+    while stack:
+        node = stack.pop()
+        count += 1
+        if limit is not None and count > limit:
+            return count
+        if node.left:
+            stack.append(node.left)
+        if node.right:
+            stack.append(node.right)
+    return count
+
+
+def find_scapegoat(path, key, size, alpha=SCAPEGOAT_ALPHA):
+    """
+    path là các nút từ gốc tới nút cha sẽ nhận key, size là số nút sau khi chèn.
+    Nếu nút mới sẽ quá sâu, trả về chỉ số trong path của con dê tế thần (tổ tiên gần nút mới nhất
+    vi phạm điều kiện cân bằng trọng số α), ngược lại None. Kích thước các cây con được đếm lại
+    từ dưới lên nên chi phí tỉ lệ với cây con sẽ bị dựng lại.
+    """
+    if size < 2 or len(path) <= math.log(size) / math.log(1 / alpha):
+        return None
+    child_size = 1  # Nút mới
+    for i in range(len(path) - 1, -1, -1):
+        node = path[i]
+        sibling = node.right if key < node.val else node.left
+        node_size = child_size + 1 + count_nodes(sibling)
+        if child_size > alpha * node_size:
+            return i
+        child_size = node_size
+    return None
+
+
+def insert_scapegoat(root, key, index=None, size=None):
+    """
+    Chèn như BST rồi dựng lại cây con của con dê tế thần nếu có. size là số nút trước khi chèn;
+    bỏ qua khi có index (lấy len(index)), nếu thiếu cả hai thì phải đếm lại toàn cây.
+    """
+    if size is None:
+        size = len(index) if index is not None else count_nodes(root)
+    path = []
+    node = root
+    while node:
+        path.append(node)
+        node = node.left if key < node.val else node.right
+    goat = find_scapegoat(path, key, size + 1)
+    root = insert_bst_iterative(root, key, index)
+    if goat is not None:
+        parent = path[goat - 1] if goat else None
+        root = link_child(parent, path[goat], rebalance_dsw(path[goat], index), root, index)
+    if index is not None:
+        index.max_size = max(index.max_size, len(index))
+    return root
+
+
+def delete_scapegoat(root, key, index=None):
+    """
+    Xóa như BST rồi dựng lại cả cây khi số nút còn dưới SCAPEGOAT_ALPHA * index.max_size.
+    max_size nằm trong index nên thiếu index thì chỉ xóa như BST (không giữ được cận chiều cao).
+    """
+    root = delete_bst(root, key, index)
+    if index is not None and len(index) < SCAPEGOAT_ALPHA * index.max_size:
+        root = rebalance_dsw(root, index)
+        index.max_size = len(index)
+    return root
+
+
+def find_node_recursive(root, val):
+    if root is None:
+        return None
+    if root.val == val:
+        return root
+    # Tìm ở cây con trái
+    left_result = find_node_recursive(root.left, val)
+    if left_result:
+        return left_result
+    # Tìm ở cây con phải
+    return find_node_recursive(root.right, val)
+
+
+def find_node_iterative(root, val):
+    stack = [root] if root else []
+    while stack:
+        node = stack.pop()
+        if node.val == val:
+            return node
+        if node.right:
+            stack.append(node.right)
+        if node.left:
+            stack.append(node.left)
+    return None
+
+
+def preorder_recursive(node):
+    return [node.val] + preorder_recursive(node.left) + preorder_recursive(node.right) if node else []
+
+
+def inorder_recursive(node):
+    return inorder_recursive(node.left) + [node.val] + inorder_recursive(node.right) if node else []
+
+
+def postorder_recursive(node):
+    return postorder_recursive(node.left) + postorder_recursive(node.right) + [node.val] if node else []
+
+
+def preorder_iterative(node):
+    result = []
+    stack = [node] if node else []
+    while stack:
+        node = stack.pop()
+        result.append(node.val)
+        if node.right:
+            stack.append(node.right)
+        if node.left:
+            stack.append(node.left)
+    return result
+
+
+def inorder_iterative(node):
+    result = []
+    stack = []
+    while stack or node:
+        while node:
+            stack.append(node)
+            node = node.left
+        node = stack.pop()
+        result.append(node.val)
+        node = node.right
+    return result
+
+
+def postorder_iterative(node):
+    result = []
+    stack = [node] if node else []
+    while stack:
+        node = stack.pop()
+        result.append(node.val)
+        if node.left:
+            stack.append(node.left)
+        if node.right:
+            stack.append(node.right)
+    result.reverse()
+    return result
+
+
+# Bộ engine có thể chọn: "recursive" (bản gốc) hoặc "iterative" (mặc định)
+ENGINES = {
+    "recursive": {
+        "insert_bst": insert_bst_recursive,
+        "insert_avl": insert_avl_recursive,
+        "delete_bst": delete_bst_recursive,
+        "delete_avl": delete_avl_recursive,
+        "delete_binary": delete_binary_recursive,
+        "find_node": find_node_recursive,
+        "preorder": preorder_recursive,
+        "inorder": inorder_recursive,
+        "postorder": postorder_recursive,
+    },
+    "iterative": {
+        "insert_bst": insert_bst_iterative,
+        "insert_avl": insert_avl_iterative,
+        "delete_bst": delete_bst_iterative,
+        "delete_avl": delete_avl_iterative,
+        "delete_binary": delete_binary_iterative,
+        "find_node": find_node_iterative,
+        "preorder": preorder_iterative,
+        "inorder": inorder_iterative,
+        "postorder": postorder_iterative,
+    },
+}
+current_engine = "iterative"
+
+
+def set_engine(name):
+    """
+    Chọn engine mặc định cho các hàm chèn, xóa, tìm và duyệt cây.
+    """
+    global current_engine
+    if name not in ENGINES:
+        raise ValueError(f"Engine không hợp lệ: {name}")
+    current_engine = name
+
+
+def run_engine(name, root, key, index):
+    func = ENGINES[current_engine][name]
+    if index is None:
+        return func(root, key)
+    if current_engine == "iterative":
+        return func(root, key, index)
+    # Engine đệ quy không báo từng thay đổi nên phải dựng lại chỉ mục
+    root = func(root, key)
+    index.rebuild(root)
+    return root
+
+
+def insert_bst(root, key, index=None):
+    if isinstance(root, TreeArena):
+        return root.insert(key, balanced=False)
+    return run_engine("insert_bst", root, key, index)
+
+
+def insert_avl(root, key, index=None):
+    if isinstance(root, TreeArena):
+        return root.insert(key, balanced=True)
+    return run_engine("insert_avl", root, key, index)
+
+
+def delete_bst(root, key, index=None):
+    if isinstance(root, TreeArena):
+        return root.delete(key, balanced=False)
+    return run_engine("delete_bst", root, key, index)
+
+
+def delete_avl(root, key, index=None):
+    if isinstance(root, TreeArena):
+        return root.delete(key, balanced=True)
+    return run_engine("delete_avl", root, key, index)
+
+
+def delete_binary(root, key, index=None):
+    return run_engine("delete_binary", root, key, index)
+
+
+def find_node(root, val, index=None):
+    if index is not None:
+        return index.get(val)
+    return ENGINES[current_engine]["find_node"](root, val)
+
+
+def preorder(root):
+    if isinstance(root, TreeArena):
+        return root.preorder()
+    return ENGINES[current_engine]["preorder"](root)
+
+
+def inorder(root):
+    if isinstance(root, TreeArena):
+        return root.inorder()
+    return ENGINES[current_engine]["inorder"](root)
+
+
+def postorder(root):
+    if isinstance(root, TreeArena):
+        return root.postorder()
+    return ENGINES[current_engine]["postorder"](root)
+
+
+# Duyệt cây dạng bộ sinh (generator): sinh dần từng giá trị, bộ nhớ O(chiều cao)
+def iter_preorder(root):
+    stack = [root] if root else []
+    while stack:
+        node = stack.pop()
+        yield node.val
+        if node.right:
+            stack.append(node.right)
+        if node.left:
+            stack.append(node.left)
+
+
+def iter_inorder(root):
+    stack = []
+    node = root
+    while stack or node:
+        while node:
+            stack.append(node)
+            node = node.left
+        node = stack.pop()
+        yield node.val
+        node = node.right
+
+
+def iter_reverse_inorder(root):
+    stack = []
+    node = root
+    while stack or node:
+        while node:
+            stack.append(node)
+            node = node.right
+        node = stack.pop()
+        yield node.val
+        node = node.left
+
+
+def iter_postorder(root):
+    stack = []
+    last = None
+    node = root
+    while stack or node:
+        if node:
+            stack.append(node)
+            node = node.left
+            continue
+        top = stack[-1]
+        if top.right and top.right is not last:
+            node = top.right
+        else:
+            yield top.val
+            last = stack.pop()
+
+
+def iter_levelorder(root):
+    """
+    Duyệt theo từng cấp, bộ nhớ tỉ lệ với độ rộng lớn nhất của cây.
+    """
+    queue = deque([root] if root else [])
+    while queue:
+        node = queue.popleft()
+        yield node.val
+        if node.left:
+            queue.append(node.left)
+        if node.right:
+            queue.append(node.right)
+
+
+def morris_inorder_nodes(node):
+    while node:
+        if node.left is None:
+            yield node
+            node = node.right
+            continue
+        pred = node.left
+        while pred.right and pred.right is not node:
+            pred = pred.right
+        if pred.right is None:
+            pred.right = node  # Tạo liên kết luồng tạm để quay lại node
+            node = node.left
+        else:
+            pred.right = None  # Gỡ liên kết luồng
+            yield node
+            node = node.right
+
+
+def iter_inorder_morris(root):
+    """
+    Duyệt trung thứ tự kiểu Morris với bộ nhớ phụ O(1).
+    Cây bị sửa tạm thời trong lúc duyệt, vì vậy không được vẽ hay sửa cây khi bộ sinh chưa chạy xong.
+    """
+    steps = morris_inorder_nodes(root)
+    try:
+        for node in steps:
+            yield node.val
+    finally:
+        # Dừng giữa chừng thì đi nốt để gỡ hết các liên kết luồng tạm
+        for _ in steps:
+            pass
+
+
+TRAVERSALS = {
+    "Preorder": iter_preorder,
+    "Inorder": iter_inorder,
+    "Postorder": iter_postorder,
+    "Level-order": iter_levelorder,
+    "Reverse inorder": iter_reverse_inorder,
+}
+
+
+def generate_unique_random_numbers(count, min_val, max_val):
+    if max_val - min_val + 1 < count:
+        raise ValueError("Khoảng giá trị không đủ để tạo các giá trị ngẫu nhiên không trùng lặp!")
+    return random.sample(range(min_val, max_val + 1), count)
+
+
+# Xây dựng cây hàng loạt từ một lô khóa
+NUMPY_SORT_THRESHOLD = 10000  # Lô lớn hơn ngưỡng này được sắp xếp bằng NumPy
+
+
+def sort_keys(keys):
+    if len(keys) >= NUMPY_SORT_THRESHOLD:
+        return np.sort(np.asarray(keys)).tolist()
+    return sorted(keys)
+
+
+def build_balanced_sorted(sorted_keys):
+    """
+    Dựng cây cân bằng hoàn hảo từ danh sách khóa đã sắp xếp trong O(n).
+    Chiều cao cây con kích thước m dựng theo điểm giữa là m.bit_length().
+    """
+    n = len(sorted_keys)
+    if n == 0:
+        return None
+    mid = n // 2
+    root = Node(sorted_keys[mid])
+    root.height = n.bit_length()
+    stack = [(root, 0, mid, mid + 1, n)]
+    while stack:
+        node, left_lo, left_hi, right_lo, right_hi = stack.pop()
+        if left_lo < left_hi:
+            mid = (left_lo + left_hi) // 2
+            node.left = Node(sorted_keys[mid])
+            node.left.height = (left_hi - left_lo).bit_length()
+            stack.append((node.left, left_lo, mid, mid + 1, left_hi))
+        if right_lo < right_hi:
+            mid = (right_lo + right_hi) // 2
+            node.right = Node(sorted_keys[mid])
+            node.right.height = (right_hi - right_lo).bit_length()
+            stack.append((node.right, right_lo, mid, mid + 1, right_hi))
+    return root
+
+
+def build_balanced(keys):
+    """
+    Sắp xếp lô khóa một lần rồi dựng cây BST/AVL cân bằng hoàn hảo.
+    """
+    return build_balanced_sorted(sort_keys(keys))
+
+
+def merge_batch(root, keys, tree_type, index=None, size=None):
+    """
+    Thêm một lô khóa vào cây có sẵn.
+    Nếu lô đủ lớn so với cây thì làm phẳng, trộn và dựng lại trong O(n + m),
+    ngược lại chèn từng khóa trong O(m log n) mà không duyệt cả cây. size là số nút của cây;
+    bỏ qua khi có index (lấy len(index)). index được cập nhật theo cây kết quả.
+    """
+    m = len(keys)
+    if size is None and index is not None:
+        size = len(index)
+    n = size
+    if n is None:
+        # Chỉ đếm tới 64m nút: cây lớn hơn thì chắc chắn m * log2(n) < n, chọn chèn từng khóa
+        n = count_nodes(root, limit=m * 64)
+    if m * max(1, n.bit_length()) >= n:
+        # Timsort nhận ra hai dãy đã sắp xếp liền nhau và trộn chúng trong thời gian tuyến tính
+        merged = inorder_iterative(root) + sort_keys(keys)
+        merged.sort()
+        root = build_balanced_sorted(merged)
+        if tree_type == "Đỏ-đen":
+            color_red_black(root)
+        if index is not None:
+            index.rebuild(root)
+        return root
+    if tree_type == "Scapegoat":
+        if size is None:
+            size = count_nodes(root)  # Scapegoat cần số nút chính xác
+        for size, key in enumerate(keys, size):
+            root = insert_scapegoat(root, key, index, size=size)
+        return root
+    insert = {"AVL": insert_avl, "Đỏ-đen": insert_rb, "Splay": insert_splay}.get(tree_type, insert_bst)
+    for key in keys:
+        root = insert(root, key, index)
+    return root
+
+
+# Mã hóa theo cấp: mỗi nút là một khóa và 2 bit cho biết có con trái/phải
+LEFT_PRESENT = 1
+RIGHT_PRESENT = 2
+LEVEL_BLOCK_SIZE = 65536  # Số nút mỗi khối khi mã hóa theo luồng (bội của 4)
+
+
+def level_order_codes(tree):
+    """
+    Duyệt theo cấp đúng một lần, sinh (khóa, mặt nạ) cho từng nút; mặt nạ gồm các bit
+    LEFT_PRESENT/RIGHT_PRESENT. Dãy này đủ để dựng lại chính xác hình dạng cây.
+    Nhận cây Node hoặc TreeArena.
+    """
+    if isinstance(tree, TreeArena):
+        keys, left, right = tree.keys, tree.left, tree.right
+        queue = deque([tree.root] if tree.root != NIL else [])
+        while queue:
+            i = queue.popleft()
+            mask = 0
+            if left[i] != NIL:
+                mask |= LEFT_PRESENT
+                queue.append(left[i])
+            if right[i] != NIL:
+                mask |= RIGHT_PRESENT
+                queue.append(right[i])
+            yield keys[i], mask
+        return
+    queue = deque([tree] if tree else [])
+    while queue:
+        node = queue.popleft()
+        mask = 0
+        if node.left:
+            mask |= LEFT_PRESENT
+            queue.append(node.left)
+        if node.right:
+            mask |= RIGHT_PRESENT
+            queue.append(node.right)
+        yield node.val, mask
+
+
+def pack_masks(masks):
+    """
+    Gói các mặt nạ 2 bit thành bitmap, 4 nút mỗi byte (nút đầu ở 2 bit thấp).
+    """
+    masks = np.frombuffer(bytes(masks), dtype=np.uint8)
+    masks = np.concatenate([masks, np.zeros(-len(masks) % 4, dtype=np.uint8)]).reshape(-1, 4)
+    return (masks[:, 0] | masks[:, 1] << 2 | masks[:, 2] << 4 | masks[:, 3] << 6).tobytes()
+
+
+def unpack_masks(presence, count):
+    presence = np.frombuffer(presence, dtype=np.uint8)
+    masks = np.stack([presence, presence >> 2, presence >> 4, presence >> 6], axis=1) & 3
+    return masks.reshape(-1)[:count].tolist()
+
+
+def iter_level_order_blocks(tree, block_size=LEVEL_BLOCK_SIZE):
+    """
+    Mã hóa theo luồng: sinh từng khối (mảng khóa, bitmap có mặt) gồm tối đa block_size nút,
+    nên có thể ghi dần ra file mà không giữ toàn bộ các cấp trong bộ nhớ.
+    """
+    codes = level_order_codes(tree)
+    while True:
+        block = list(islice(codes, block_size))
+        if not block:
+            return
+        yield array('q', [key for key, _ in block]), pack_masks([mask for _, mask in block])
+
+
+def encode_level_order(tree):
+    """
+    Mã hóa cây thành (mảng khóa theo cấp, bitmap có mặt 2 bit mỗi nút) trong O(n).
+    """
+    keys = array('q')
+    presence = bytearray()
+    for block_keys, block_presence in iter_level_order_blocks(tree):
+        keys.extend(block_keys)
+        presence += block_presence
+    return keys, bytes(presence)
+
+
+def iter_level_order_codes(blocks):
+    """
+    Chuyển dãy khối (mảng khóa, bitmap) về dãy (khóa, mặt nạ) để giải mã theo luồng.
+    """
+    for keys, presence in blocks:
+        yield from zip(keys, unpack_masks(presence, len(keys)))
+
+
+def decode_level_order_codes(codes):
+    """
+    Dựng cây Node từ dãy (khóa, mặt nạ) theo cấp, đọc tuần tự đúng một lần và không sửa
+    dữ liệu đầu vào. Chiều cao các nút được tính lại để dùng tiếp được với AVL.
+    """
+    codes = iter(codes)
+    first = next(codes, None)
+    if first is None:
+        return None
+    root = Node(first[0])
+    order = [root]
+    queue = deque([(root, first[1])])
+    try:
+        while queue:
+            node, mask = queue.popleft()
+            if mask & LEFT_PRESENT:
+                key, child_mask = next(codes)
+                node.left = Node(key)
+                order.append(node.left)
+                queue.append((node.left, child_mask))
+            if mask & RIGHT_PRESENT:
+                key, child_mask = next(codes)
+                node.right = Node(key)
+                order.append(node.right)
+                queue.append((node.right, child_mask))
+    except StopIteration:
+        raise ValueError("Dữ liệu theo cấp bị thiếu nút.") from None
+    if next(codes, None) is not None:
+        raise ValueError("Dữ liệu theo cấp thừa nút không thuộc cây.")
+    for node in reversed(order):
+        update_height(node)
+    return root
+
+
+def decode_level_order(keys, presence):
+    """
+    Giải mã kết quả của encode_level_order. Nút thứ i theo cấp là nodes[i], nên chỉ cần
+    một con trỏ tới nút con kế tiếp thay cho hàng đợi.
+    """
+    masks = unpack_masks(presence, len(keys))
+    if keys and sum((mask & LEFT_PRESENT) + (mask >> 1) for mask in masks) != len(keys) - 1:
+        raise ValueError("Bitmap có mặt không khớp với số khóa.")
+    nodes = [Node(key) for key in keys]
+    child = 1
+    for node, mask in zip(nodes, masks):
+        if mask & LEFT_PRESENT:
+            node.left = nodes[child]
+            child += 1
+        if mask & RIGHT_PRESENT:
+            node.right = nodes[child]
+            child += 1
+    for node in reversed(nodes):
+        update_height(node)
+    return nodes[0] if nodes else None
+
+
+def iter_levels(tree):
+    """
+    Sinh lần lượt danh sách (khóa, mặt nạ) của từng cấp; chỉ giữ một cấp mỗi lúc.
+    """
+    codes = level_order_codes(tree)
+    level = list(islice(codes, 1))
+    while level:
+        yield level
+        count = sum((mask & LEFT_PRESENT) + (mask >> 1) for _, mask in level)
+        level = list(islice(codes, count))
+
+
+def export_tree(root):
+    """
+    Xuất cây dưới dạng danh sách các cấp độ (None ở vị trí con trống).
+    """
+    levels = []
+    previous = None
+    for level in iter_levels(root):
+        if previous is None:
+            levels.append([key for key, _ in level])
+        else:
+            children = iter(level)
+            levels.append([next(children)[0] if mask & bit else None
+                           for _, mask in previous for bit in (LEFT_PRESENT, RIGHT_PRESENT)])
+        previous = level
+    if previous is not None:
+        levels.append([None] * (2 * len(previous)))
+    return levels
+
+
+def import_tree(levels):
+    """
+    Tạo lại cây từ danh sách các cấp độ trong thời gian tuyến tính, không sửa levels.
+    """
+    slots = (value for level in levels for value in level)
+    first = next(slots, None)
+    if first is None:
+        return None
+    root = Node(first)
+    order = [root]
+    queue = deque([root])
+    while queue:
+        node = queue.popleft()
+        left_val = next(slots, None)
+        right_val = next(slots, None)
+        if left_val is not None:
+            node.left = Node(left_val)
+            order.append(node.left)
+            queue.append(node.left)
+        if right_val is not None:
+            node.right = Node(right_val)
+            order.append(node.right)
+            queue.append(node.right)
+    for node in reversed(order):
+        update_height(node)
+    return root
+
+
+# Lưu trữ cây dạng mảng song song (arena) thay cho các đối tượng Node riêng lẻ
+NIL = -1
+
+
+class TreeArena:
+    """
+    Cây lưu trong các mảng song song: khóa, chỉ số con trái, con phải và chiều cao.
+    Các ô bị xóa được nối thành danh sách trống qua mảng left để tái sử dụng.
+    """
+
+    def __init__(self):
+        self.keys = array('q')
+        self.left = array('i')
+        self.right = array('i')
+        self.height = array('i')
+        self.root = NIL
+        self.free_head = NIL
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def new_node(self, key):
+        if self.free_head != NIL:
+            i = self.free_head
+            self.free_head = self.left[i]
+            self.keys[i] = key
+            self.left[i] = NIL
+            self.right[i] = NIL
+            self.height[i] = 1
+        else:
+            i = len(self.keys)
+            self.keys.append(key)
+            self.left.append(NIL)
+            self.right.append(NIL)
+            self.height.append(1)
+        self.size += 1
+        return i
+
+    def free_node(self, i):
+        self.left[i] = self.free_head
+        self.right[i] = NIL
+        self.free_head = i
+        self.size -= 1
+
+    def get_height(self, i):
+        return self.height[i] if i != NIL else 0
+
+    def update_height(self, i):
+        self.height[i] = 1 + max(self.get_height(self.left[i]), self.get_height(self.right[i]))
+
+    def get_balance(self, i):
+        return self.get_height(self.left[i]) - self.get_height(self.right[i])
+
+    def rotate_right(self, y):
+        x = self.left[y]
+        self.left[y] = self.right[x]
+        self.right[x] = y
+        self.update_height(y)
+        self.update_height(x)
+        return x
+
+    def rotate_left(self, x):
+        y = self.right[x]
+        self.right[x] = self.left[y]
+        self.left[y] = x
+        self.update_height(x)
+        self.update_height(y)
+        return y
+
+    def rebalance(self, i):
+        """
+        Cân bằng lại nút i theo AVL, trả về chỉ số gốc mới của cây con.
+        """
+        self.update_height(i)
+        balance = self.get_balance(i)
+        if balance > 1:
+            if self.get_balance(self.left[i]) < 0:
+                self.left[i] = self.rotate_left(self.left[i])
+            return self.rotate_right(i)
+        if balance < -1:
+            if self.get_balance(self.right[i]) > 0:
+                self.right[i] = self.rotate_right(self.right[i])
+            return self.rotate_left(i)
+        return i
+
+    def replace_child(self, parent, old, new):
+        if parent == NIL:
+            self.root = new
+        elif self.left[parent] == old:
+            self.left[parent] = new
+        else:
+            self.right[parent] = new
+
+    def search(self, key):
+        i = self.root
+        while i != NIL:
+            k = self.keys[i]
+            if key == k:
+                return i
+            i = self.left[i] if key < k else self.right[i]
+        return NIL
+
+    def search_steps(self, key):
+        """
+        Các khóa đi qua khi tìm key theo quy tắc BST (giống TreeApp.bst_search_steps).
+        """
+        steps = []
+        i = self.root
+        while i != NIL:
+            k = self.keys[i]
+            steps.append(k)
+            if key == k:
+                break
+            i = self.left[i] if key < k else self.right[i]
+        return steps
+
+    def insert(self, key, balanced):
+        path = []
+        i = self.root
+        while i != NIL:
+            path.append(i)
+            i = self.left[i] if key < self.keys[i] else self.right[i]
+        new = self.new_node(key)
+        if not path:
+            self.root = new
+            return self
+        parent = path[-1]
+        if key < self.keys[parent]:
+            self.left[parent] = new
+        else:
+            self.right[parent] = new
+        self.retrace(path, balanced)
+        return self
+
+    def delete(self, key, balanced):
+        path = []
+        i = self.root
+        while i != NIL and self.keys[i] != key:
+            path.append(i)
+            i = self.left[i] if key < self.keys[i] else self.right[i]
+        if i == NIL:
+            return self
+        if self.left[i] != NIL and self.right[i] != NIL:
+            # Thay khóa bằng nút nhỏ nhất của cây con phải rồi xóa nút đó
+            path.append(i)
+            succ = self.right[i]
+            while self.left[succ] != NIL:
+                path.append(succ)
+                succ = self.left[succ]
+            self.keys[i] = self.keys[succ]
+            i = succ
+        child = self.left[i] if self.left[i] != NIL else self.right[i]
+        self.replace_child(path[-1] if path else NIL, i, child)
+        self.free_node(i)
+        self.retrace(path, balanced)
+        return self
+
+    def retrace(self, path, balanced):
+        """
+        Cập nhật chiều cao (và cân bằng nếu là AVL) dọc đường đi từ dưới lên.
+        """
+        for depth in range(len(path) - 1, -1, -1):
+            i = path[depth]
+            if balanced:
+                new = self.rebalance(i)
+                if new != i:
+                    self.replace_child(path[depth - 1] if depth else NIL, i, new)
+            else:
+                self.update_height(i)
+
+    def preorder(self):
+        result = []
+        stack = [self.root] if self.root != NIL else []
+        while stack:
+            i = stack.pop()
+            result.append(self.keys[i])
+            if self.right[i] != NIL:
+                stack.append(self.right[i])
+            if self.left[i] != NIL:
+                stack.append(self.left[i])
+        return result
+
+    def inorder(self):
+        result = []
+        stack = []
+        i = self.root
+        while stack or i != NIL:
+            while i != NIL:
+                stack.append(i)
+                i = self.left[i]
+            i = stack.pop()
+            result.append(self.keys[i])
+            i = self.right[i]
+        return result
+
+    def postorder(self):
+        result = []
+        stack = [self.root] if self.root != NIL else []
+        while stack:
+            i = stack.pop()
+            result.append(self.keys[i])
+            if self.left[i] != NIL:
+                stack.append(self.left[i])
+            if self.right[i] != NIL:
+                stack.append(self.right[i])
+        result.reverse()
+        return result
+
+    def levelorder(self):
+        return [key for key, _ in level_order_codes(self)]
+
+    def range_scan(self, low, high):
+        """
+        Các khóa trong đoạn [low, high] theo thứ tự tăng, chỉ đi vào các cây con có thể chứa khóa.
+        """
+        result = []
+        stack = []
+        i = self.root
+        while stack or i != NIL:
+            while i != NIL:
+                stack.append(i)
+                i = self.left[i] if self.keys[i] >= low else NIL
+            i = stack.pop()
+            key = self.keys[i]
+            if key > high:
+                break
+            if key >= low:
+                result.append(key)
+            i = self.right[i]
+        return result
+
+    def export_tree(self):
+        return export_tree(self)
+
+    @classmethod
+    def from_nodes(cls, root, colors=False):
+        """
+        Chuyển cây Node sang arena (giữ nguyên hình dạng). Với colors (cây đỏ-đen), cột chiều cao
+        nhận màu của nút thay cho chiều cao.
+        """
+        arena = cls()
+        if root is None:
+            return arena
+        arena.root = arena.new_node(root.val)
+        stack = [(root, arena.root)]
+        while stack:
+            node, i = stack.pop()
+            arena.height[i] = node.color if colors else node.height
+            if node.left:
+                arena.left[i] = arena.new_node(node.left.val)
+                stack.append((node.left, arena.left[i]))
+            if node.right:
+                arena.right[i] = arena.new_node(node.right.val)
+                stack.append((node.right, arena.right[i]))
+        return arena
+
+    @classmethod
+    def from_sorted(cls, sorted_keys):
+        """
+        Dựng arena cân bằng hoàn hảo (cùng hình dạng với build_balanced_sorted), các nút xếp theo tiền thứ tự.
+        """
+        arena = cls()
+        arena.keys, arena.left, arena.right, arena.height = build_arena_arrays(sorted_keys)
+        arena.size = len(arena.keys)
+        arena.root = 0 if arena.size else NIL
+        return arena
+
+    def to_nodes(self, colors=False):
+        """
+        Chuyển arena về cây Node để hiển thị trên giao diện. Với colors, cột chiều cao là màu
+        của nút (ngược với from_nodes).
+        """
+        if self.root == NIL:
+            return None
+        root = Node(self.keys[self.root])
+        stack = [(self.root, root)]
+        while stack:
+            i, node = stack.pop()
+            if colors:
+                node.color = self.height[i]
+            else:
+                node.height = self.height[i]
+            if self.left[i] != NIL:
+                node.left = Node(self.keys[self.left[i]])
+                stack.append((self.left[i], node.left))
+            if self.right[i] != NIL:
+                node.right = Node(self.keys[self.right[i]])
+                stack.append((self.right[i], node.right))
+        return root
+
+
+# Cây lưu ngoài bộ nhớ: các nút là bản ghi cố định trong file ánh xạ bằng mmap, truy cập qua
+# bộ đệm trang LRU. Trang 0 là header; mỗi trang sau chứa NODE_FILE_RECORDS bản ghi, xếp theo
+# cột trong trang (khóa rồi con trái, con phải, chiều cao) để đọc/ghi thẳng qua memoryview.
+NODE_FILE_MAGIC = b"BTNF"
+NODE_FILE_VERSION = 1
+NODE_FILE_PAGE_SIZE = 4096
+NODE_FILE_HEADER = struct.Struct("<4sHqqqq")  # magic, phiên bản, gốc, đầu danh sách trống, số nút, số ô
+NODE_FIELDS = (('q', 8), ('i', 4), ('i', 4), ('i', 4))  # khóa, con trái, con phải, chiều cao
+NODE_FILE_RECORDS = NODE_FILE_PAGE_SIZE // sum(size for _, size in NODE_FIELDS)
+NODE_CACHE_PAGES = 256  # Số trang giữ trong bộ đệm LRU
+
+
+class NodeFile:
+    """
+    File bản ghi nút kích thước cố định, ánh xạ bằng mmap. Bộ đệm LRU giữ các trang gần dùng
+    nhất dưới dạng memoryview trỏ thẳng vào vùng ánh xạ, nên ghi không cần sao chép lại;
+    faults đếm số lần phải mở một trang không có trong bộ đệm, hits số lần trang có sẵn.
+    """
+
+    def __init__(self, path, cache_pages=NODE_CACHE_PAGES):
+        self.path = path
+        self.cache_pages = cache_pages
+        self.cache = OrderedDict()
+        self.faults = 0
+        self.hits = 0
+        exists = os.path.exists(path) and os.path.getsize(path) >= NODE_FILE_PAGE_SIZE
+        self.file = open(path, 'r+b' if exists else 'w+b')
+        if not exists:
+            self.file.truncate(NODE_FILE_PAGE_SIZE * 2)
+        self.map = mmap.mmap(self.file.fileno(), 0)
+        self.root, self.free_head, self.size, self.count = NIL, NIL, 0, 0
+        if exists:
+            magic, version, self.root, self.free_head, self.size, self.count = NODE_FILE_HEADER.unpack_from(self.map)
+            if magic != NODE_FILE_MAGIC or version != NODE_FILE_VERSION:
+                raise ValueError("Không phải file nút hoặc khác phiên bản.")
+
+    def capacity(self):
+        return (len(self.map) // NODE_FILE_PAGE_SIZE - 1) * NODE_FILE_RECORDS
+
+    def page(self, page_no):
+        """
+        Các cột (khóa, con trái, con phải, chiều cao) của một trang.
+        """
+        page = self.cache.get(page_no)
+        if page is not None:
+            self.cache.move_to_end(page_no)
+            self.hits += 1
+            return page
+        self.faults += 1
+        offset = (page_no + 1) * NODE_FILE_PAGE_SIZE
+        page = []
+        with memoryview(self.map) as view:
+            for typecode, size in NODE_FIELDS:
+                page.append(view[offset:offset + NODE_FILE_RECORDS * size].cast(typecode))
+                offset += NODE_FILE_RECORDS * size
+        self.cache[page_no] = page
+        if len(self.cache) > self.cache_pages:
+            self.release(self.cache.popitem(last=False)[1])
+        return page
+
+    def release(self, page):
+        for column in page:
+            column.release()
+
+    def get(self, field, i):
+        page_no, slot = divmod(i, NODE_FILE_RECORDS)
+        return self.page(page_no)[field][slot]
+
+    def set(self, field, i, value):
+        page_no, slot = divmod(i, NODE_FILE_RECORDS)
+        self.page(page_no)[field][slot] = value
+
+    def clear_cache(self):
+        while self.cache:
+            self.release(self.cache.popitem()[1])
+
+    def allocate(self):
+        """
+        Cấp một ô mới ở cuối file, nới rộng file (gấp đôi) khi hết chỗ.
+        """
+        if self.count == self.capacity():
+            self.clear_cache()  # mmap chỉ đóng được khi không còn memoryview nào trỏ vào
+            size = len(self.map)
+            self.map.close()
+            self.file.truncate(2 * size)
+            self.map = mmap.mmap(self.file.fileno(), 0)
+        self.count += 1
+        return self.count - 1
+
+    def flush(self):
+        """
+        Ghi header và đẩy các trang đã sửa xuống file.
+        """
+        NODE_FILE_HEADER.pack_into(self.map, 0, NODE_FILE_MAGIC, NODE_FILE_VERSION,
+                                   self.root, self.free_head, self.size, self.count)
+        self.map.flush()
+
+    def close(self):
+        self.flush()
+        self.clear_cache()
+        self.map.close()
+        self.file.close()
+
+
+class NodeColumn:
+    """
+    Một trường của các bản ghi nút (khóa, con trái, ...) dùng như mảng, để các thuật toán
+    của TreeArena chạy thẳng trên NodeFile.
+    """
+    __slots__ = ("store", "field")
+
+    def __init__(self, store, field):
+        self.store = store
+        self.field = field
+
+    def __getitem__(self, i):
+        return self.store.get(self.field, i)
+
+    def __setitem__(self, i, value):
+        self.store.set(self.field, i, value)
+
+    def __len__(self):
+        return self.store.count
+
+
+class DiskTree(TreeArena):
+    """
+    TreeArena có các nút nằm trong NodeFile thay vì trong RAM: chèn/xóa (BST hoặc AVL),
+    tìm kiếm và duyệt dùng lại nguyên các thuật toán của TreeArena. Mỗi thao tác trên cây
+    AVL chỉ chạm O(log n) trang.
+    """
+
+    def __init__(self, path, cache_pages=NODE_CACHE_PAGES):
+        self.store = NodeFile(path, cache_pages)
+        self.keys, self.left, self.right, self.height = (NodeColumn(self.store, field) for field in range(4))
+
+    # root, free_head và size nằm trong header của file
+    root = property(lambda self: self.store.root, lambda self, value: setattr(self.store, "root", value))
+    free_head = property(lambda self: self.store.free_head,
+                         lambda self, value: setattr(self.store, "free_head", value))
+    size = property(lambda self: self.store.size, lambda self, value: setattr(self.store, "size", value))
+
+    def new_node(self, key):
+        if self.free_head != NIL:
+            i = self.free_head
+            self.free_head = self.left[i]
+        else:
+            i = self.store.allocate()
+        self.keys[i] = key
+        self.left[i] = NIL
+        self.right[i] = NIL
+        self.height[i] = 1
+        self.size += 1
+        return i
+
+    def stats(self):
+        """
+        Số lần phải mở trang không có trong bộ đệm (page fault) và số lần trúng bộ đệm.
+        """
+        return {"faults": self.store.faults, "hits": self.store.hits}
+
+    def reset_stats(self):
+        self.store.faults = self.store.hits = 0
+
+    def flush(self):
+        self.store.flush()
+
+    def close(self):
+        self.store.close()
+
+
+TREE_TYPES = ["Cây nhị phân thông thường", "BST", "AVL", "Đỏ-đen", "Splay", "Scapegoat"]
+
+
+TEXT_CHUNK_LINES = 65536  # Số dòng ghi/đọc giữa hai lần báo tiến độ và kiểm tra hủy
+
+
+class OperationCancelled(Exception):
+    """
+    Người dùng đã hủy thao tác đang chạy.
+    """
+
+
+def write_tree_text(file_path, root, tree_type, total=0, progress=None, cancelled=None):
+    """
+    Ghi cây ra file văn bản: dòng đầu là loại cây, mỗi dòng sau là
+    parent_value,left_child_value,right_child_value theo thứ tự tiền tự.
+    Ghi theo từng khối TEXT_CHUNK_LINES dòng nên bộ nhớ phụ chỉ là ngăn xếp và một khối.
+    progress(số nút đã ghi, total) được gọi sau mỗi khối; nếu cancelled() trả về True thì
+    xóa file dở dang và ném OperationCancelled.
+    """
+    done = 0
+    try:
+        with open(file_path, 'w', encoding='utf-8') as file:
+            file.write(f"{tree_type}\n")
+            chunk = []
+            stack = [root] if root else []
+            while stack:
+                node = stack.pop()
+                left_val = node.left.val if node.left else "null"
+                right_val = node.right.val if node.right else "null"
+                chunk.append(f"{node.val},{left_val},{right_val}\n")
+                if node.right:
+                    stack.append(node.right)
+                if node.left:
+                    stack.append(node.left)
+                if len(chunk) == TEXT_CHUNK_LINES or not stack:
+                    file.write("".join(chunk))
+                    done += len(chunk)
+                    chunk = []
+                    if cancelled and cancelled():
+                        raise OperationCancelled()
+                    if progress:
+                        progress(done, total or done)
+    except OperationCancelled:
+        os.remove(file_path)
+        raise
+    return done
+
+
+def parse_tree_line(line):
+    """
+    Tách một dòng parent,left,right thành (parent, left, right); con trống là None.
+    """
+    fields = line.split(b',')
+    if len(fields) != 3:
+        raise ValueError(f"cần 3 giá trị parent,left,right, nhận được {len(fields)}")
+    parent, left, right = (field.strip() for field in fields)
+    if parent == b"null":
+        raise ValueError("nút cha không được là null")
+    return int(parent), None if left == b"null" else int(left), None if right == b"null" else int(right)
+
+
+def read_tree_text(file_path, progress=None, cancelled=None):
+    """
+    Đọc file văn bản do write_tree_text tạo ra, từng dòng qua bộ đệm của file thay vì
+    readlines(). Dòng sai định dạng được bỏ qua và ghi lại dưới dạng (số dòng, lỗi).
+    progress(số byte đã đọc, kích thước file) được gọi sau mỗi TEXT_CHUNK_LINES dòng.
+    Trả về (loại cây, gốc, danh sách lỗi).
+    """
+    nodes = {}
+    root = None
+    errors = []
+    total = os.path.getsize(file_path)
+    with open(file_path, 'rb') as file:
+        header = file.readline()
+        if not header.strip():
+            raise ValueError("Tệp rỗng, không có dữ liệu để nhập.")
+        tree_type = header.decode('utf-8').strip()
+        done = len(header)
+        for line_number, line in enumerate(file, 2):
+            done += len(line)
+            if line_number % TEXT_CHUNK_LINES == 0:
+                if cancelled and cancelled():
+                    raise OperationCancelled()
+                if progress:
+                    progress(done, total)
+            if not line.strip():
+                continue
+            try:
+                parent_val, left_val, right_val = parse_tree_line(line)
+            except ValueError as e:
+                errors.append((line_number, str(e)))
+                continue
+            if parent_val not in nodes:
+                nodes[parent_val] = Node(parent_val)
+            current_node = nodes[parent_val]
+            if root is None:
+                root = current_node
+            if left_val is not None:
+                if left_val not in nodes:
+                    nodes[left_val] = Node(left_val)
+                current_node.left = nodes[left_val]
+            if right_val is not None:
+                if right_val not in nodes:
+                    nodes[right_val] = Node(right_val)
+                current_node.right = nodes[right_val]
+    if progress:
+        progress(total, total)
+    if tree_type == "Đỏ-đen" and not color_red_black(root):
+        # File văn bản chỉ lưu hình dạng nên màu được tính lại
+        errors.append((1, "hình dạng cây không tô được màu đỏ-đen"))
+    elif tree_type == "AVL":
+        compute_heights(root)  # Chiều cao cũng không được lưu, phép chèn/xóa/join cần giá trị đúng
+    return tree_type, root, errors
+
+
+# Định dạng nhị phân: header cố định rồi các mảng khóa/con trái/con phải/chiều cao
+# của arena, mỗi mảng là một khối liên tục (little-endian) nên có thể đọc bằng mmap.
+# Với cây đỏ-đen, mảng chiều cao chứa màu của nút (TreeArena.from_nodes/to_nodes với colors).
+BINARY_MAGIC = b"BTRF"
+BINARY_VERSION = 1
+BINARY_EXTENSION = ".btree"
+BINARY_HEADER = struct.Struct("<4sHHqqqq")  # magic, phiên bản, loại cây, số nút, số ô, gốc, đầu danh sách trống
+BINARY_FIELDS = (("keys", 'q'), ("left", 'i'), ("right", 'i'), ("height", 'i'))
+
+
+def save_tree_binary(file_path, tree, tree_type):
+    """
+    Ghi cây (Node hoặc TreeArena) ra file nhị phân bằng một lần ghi, không định dạng từng dòng.
+    """
+    arena = tree if isinstance(tree, TreeArena) else TreeArena.from_nodes(tree, tree_type == "Đỏ-đen")
+    header = BINARY_HEADER.pack(BINARY_MAGIC, BINARY_VERSION, TREE_TYPES.index(tree_type),
+                                arena.size, len(arena.keys), arena.root, arena.free_head)
+    blocks = [header]
+    for name, _ in BINARY_FIELDS:
+        values = getattr(arena, name)
+        if sys.byteorder != "little":
+            values = array(values.typecode, values)
+            values.byteswap()
+        blocks.append(memoryview(values))
+    with open(file_path, 'wb') as file:
+        file.writelines(blocks)
+
+
+def load_tree_binary(file_path):
+    """
+    Mở file nhị phân bằng mmap và sao chép nguyên khối các mảng vào một TreeArena.
+    Trả về (loại cây, arena).
+    """
+    arena = TreeArena()
+    with open(file_path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        if len(data) < BINARY_HEADER.size:
+            raise ValueError("Tệp quá ngắn, không phải file cây nhị phân.")
+        magic, version, type_index, size, capacity, arena.root, arena.free_head = BINARY_HEADER.unpack_from(data)
+        if magic != BINARY_MAGIC:
+            raise ValueError("Không phải file cây nhị phân.")
+        if version != BINARY_VERSION:
+            raise ValueError(f"Phiên bản định dạng {version} không được hỗ trợ.")
+        if type_index >= len(TREE_TYPES):
+            raise ValueError(f"Loại cây không hợp lệ: {type_index}")
+        offset = BINARY_HEADER.size
+        with memoryview(data) as view:
+            for name, typecode in BINARY_FIELDS:
+                values = array(typecode)
+                end = offset + capacity * values.itemsize
+                if end > len(data):
+                    raise ValueError("Tệp bị cắt cụt.")
+                values.frombytes(view[offset:end])
+                if sys.byteorder != "little":
+                    values.byteswap()
+                setattr(arena, name, values)
+                offset = end
+    arena.size = size
+    return TREE_TYPES[type_index], arena
+
+
+# Mã hóa gọn: hình dạng là dãy ngoặc cân bằng 2n bit (con trái = con đầu, con phải = anh em kế
+# tiếp), khóa theo thứ tự trung tự lưu dạng hiệu số zigzag varint.
+SUCCINCT_VERSION = 1
+
+
+def write_varint(out, value):
+    while value >= 0x80:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def read_varint(data, offset):
+    """
+    Trả về (giá trị, vị trí sau varint).
+    """
+    value = shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+
+def encode_succinct(tree):
+    """
+    Mã hóa cây (Node hoặc TreeArena) thành bytes: phiên bản, số nút, 2n bit hình dạng,
+    rồi các hiệu số khóa liên tiếp theo trung tự. Với BST/AVL các hiệu số đều nhỏ và dương
+    nên thường chỉ tốn 1-2 byte mỗi khóa.
+    """
+    if isinstance(tree, TreeArena):
+        tree = tree.to_nodes()
+    bits = bytearray()
+    deltas = bytearray()
+    previous = count = 0
+    stack = []
+    node = tree
+    while node or stack:
+        if node:
+            bits.append(1)  # Mở ngoặc: vào nút, đi tiếp sang con trái (con đầu)
+            stack.append(node)
+            node = node.left
+        else:
+            node = stack.pop()
+            bits.append(0)  # Đóng ngoặc: nút được đóng theo đúng thứ tự trung tự
+            delta = node.val - previous
+            write_varint(deltas, 2 * delta if delta >= 0 else -2 * delta - 1)
+            previous = node.val
+            count += 1
+            node = node.right  # Con phải là anh em kế tiếp
+    out = bytearray([SUCCINCT_VERSION])
+    write_varint(out, count)
+    out += np.packbits(np.frombuffer(bytes(bits), dtype=np.uint8)).tobytes()
+    return bytes(out + deltas)
+
+
+def decode_succinct_arrays(data):
+    """
+    Giải mã thành các mảng theo thứ tự tiền tự: (khóa, con trái, con phải), NIL là con trống.
+    """
+    if not data or data[0] != SUCCINCT_VERSION:
+        raise ValueError("Dữ liệu mã hóa gọn không hợp lệ hoặc khác phiên bản.")
+    count, offset = read_varint(data, 1)
+    shape_end = offset + (2 * count + 7) // 8
+    bits = np.unpackbits(np.frombuffer(data, dtype=np.uint8, count=shape_end - offset, offset=offset))
+    keys = array('q', bytes(8 * count))
+    left = array('i', [NIL]) * count
+    right = array('i', [NIL]) * count
+    stack = []
+    parent, is_left = NIL, True
+    opened = 0
+    key = 0
+    offset = shape_end
+    for bit in bits[:2 * count].tolist():
+        if bit:
+            if parent != NIL:
+                (left if is_left else right)[parent] = opened
+            stack.append(opened)
+            parent, is_left = opened, True
+            opened += 1
+        else:
+            parent, is_left = stack.pop(), False
+            value, offset = read_varint(data, offset)
+            key += value >> 1 if not value & 1 else -((value + 1) >> 1)
+            keys[parent] = key
+    if stack or opened != count:
+        raise ValueError("Dãy ngoặc không cân bằng.")
+    return keys, left, right
+
+
+def decode_succinct(data, arena=False):
+    """
+    Giải mã bytes của encode_succinct về cây Node, hoặc TreeArena nếu arena=True.
+    """
+    keys, left, right = decode_succinct_arrays(data)
+    count = len(keys)
+    if arena:
+        tree = TreeArena()
+        tree.keys, tree.left, tree.right = keys, left, right
+        tree.height = array('i', [1]) * count
+        tree.size = count
+        tree.root = 0 if count else NIL
+        for i in range(count - 1, -1, -1):  # Con luôn đứng sau cha theo tiền tự
+            tree.update_height(i)
+        return tree
+    nodes = [Node(key) for key in keys]
+    for i in range(count - 1, -1, -1):
+        node = nodes[i]
+        if left[i] != NIL:
+            node.left = nodes[left[i]]
+        if right[i] != NIL:
+            node.right = nodes[right[i]]
+        update_height(node)
+    return nodes[0] if nodes else None
+
+
+# Nhật ký thao tác ghi trước (write-ahead log) cùng snapshot định kỳ.
+# File log: header (magic, phiên bản, loại cây, thế hệ) rồi các bản ghi cố định kèm CRC32.
+# Snapshot thế hệ g là file nhị phân "<log>-<g>.btree"; khôi phục = snapshot + phát lại log.
+OP_INSERT = 1  # a = khóa, chèn theo quy tắc BST/AVL
+OP_DELETE = 2  # a = khóa
+OP_SWAP = 3  # a, b = hai giá trị đổi chỗ cho nhau
+OP_ATTACH_LEFT = 4  # a = nút cha, b = khóa mới gắn làm con trái (cây nhị phân thông thường)
+OP_ATTACH_RIGHT = 5  # a = nút cha, b = khóa mới gắn làm con phải
+OP_SPLAY = 6  # a = khóa được tìm trên cây splay (phép tìm cũng đổi hình dạng cây)
+OP_REBALANCE = 7  # Cân bằng lại toàn cây bằng DSW (kết quả chỉ phụ thuộc hình dạng cây nên phát lại được)
+OP_CONVERT = 8  # Đổi loại cây đang có sang loại của bản ghi (convert_tree_type)
+JOURNAL_MAGIC = b"BTWL"
+JOURNAL_VERSION = 1
+JOURNAL_HEADER = struct.Struct("<4sHHq")
+JOURNAL_RECORD = struct.Struct("<BBqq")  # thao tác, loại cây, a, b; theo sau là CRC32
+JOURNAL_CHECKSUM = struct.Struct("<I")
+GROUP_COMMIT_SIZE = 256  # Số bản ghi tối đa chờ trước khi fsync
+GROUP_COMMIT_INTERVAL = 0.05  # Thời gian tối đa (giây) một bản ghi chờ fsync
+SNAPSHOT_INTERVAL = 100000  # Số bản ghi giữa hai lần nén log thành snapshot
+
+
+def apply_operation(root, index, op, tree_type, a, b=0):
+    """
+    Thực hiện một thao tác của nhật ký lên cây (kèm NodeIndex). Trả về gốc mới.
+    """
+    if op == OP_INSERT:
+        if tree_type == "BST":
+            return insert_bst(root, a, index)
+        if tree_type == "AVL":
+            return insert_avl(root, a, index)
+        if tree_type == "Đỏ-đen":
+            return insert_rb(root, a, index)
+        if tree_type == "Splay":
+            return insert_splay(root, a, index)
+        if tree_type == "Scapegoat":
+            return insert_scapegoat(root, a, index)
+    elif op == OP_DELETE:
+        if tree_type == "Cây nhị phân thông thường":
+            return delete_binary(root, a, index)
+        if tree_type == "BST":
+            return delete_bst(root, a, index)
+        if tree_type == "Scapegoat":
+            return delete_scapegoat(root, a, index)
+        if tree_type == "AVL":
+            return delete_avl(root, a, index)
+        if tree_type == "Đỏ-đen":
+            return delete_rb(root, a, index)
+        if tree_type == "Splay":
+            return delete_splay(root, a, index)
+    elif op == OP_SPLAY:
+        return splay(root, a, index)
+    elif op == OP_REBALANCE:
+        return rebalance_dsw(root, index)
+    elif op == OP_CONVERT:
+        return convert_tree_type(root, tree_type, index)
+    elif op == OP_SWAP:
+        first, second = index.get(a), index.get(b)
+        if first is None or second is None:
+            raise ValueError(f"Không tìm thấy nút để đổi chỗ: {a}, {b}")
+        first.val, second.val = second.val, first.val
+        index.swap(first, second)
+        return root
+    elif op in (OP_ATTACH_LEFT, OP_ATTACH_RIGHT):
+        parent = index.get(a)
+        if parent is None:
+            raise ValueError(f"Không tìm thấy nút cha: {a}")
+        child = Node(b)
+        if op == OP_ATTACH_LEFT:
+            parent.left = child
+        else:
+            parent.right = child
+        index.add(child, parent)
+        return root
+    raise ValueError(f"Thao tác không hợp lệ: {op} ({tree_type})")
+
+
+def fsync_directory(path):
+    """
+    Đảm bảo việc đổi tên file trong thư mục đã được ghi xuống đĩa (bỏ qua nếu hệ điều hành không hỗ trợ).
+    """
+    try:
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class TreeJournal:
+    """
+    Log chỉ ghi thêm các thao tác sửa cây. Các bản ghi được gom lại và fsync theo nhóm
+    (GROUP_COMMIT_SIZE bản ghi hoặc GROUP_COMMIT_INTERVAL giây); sau SNAPSHOT_INTERVAL bản ghi
+    thì nên gọi snapshot() để nén toàn bộ log thành một file cây nhị phân.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.generation = 0
+        self.file = None
+        self.pending = bytearray()
+        self.pending_count = 0
+        self.first_pending = 0.0  # Thời điểm bản ghi chờ lâu nhất được thêm vào
+        self.records_since_snapshot = 0
+
+    def snapshot_path(self, generation):
+        return f"{os.path.splitext(self.path)[0]}-{generation}{BINARY_EXTENSION}"
+
+    def recover(self):
+        """
+        Nạp snapshot của thế hệ ghi trong log rồi phát lại các bản ghi hợp lệ. Phần đuôi hỏng
+        (ghi dở khi mất điện) bị cắt bỏ. Trả về (loại cây, gốc, chỉ mục).
+        """
+        with open(self.path, 'rb') as file:
+            data = file.read()
+        if len(data) < JOURNAL_HEADER.size:
+            raise ValueError("File nhật ký bị hỏng.")
+        magic, version, type_index, self.generation = JOURNAL_HEADER.unpack_from(data)
+        if magic != JOURNAL_MAGIC or version != JOURNAL_VERSION:
+            raise ValueError("Không phải file nhật ký hoặc khác phiên bản.")
+        tree_type, root = TREE_TYPES[type_index], None
+        if os.path.exists(self.snapshot_path(self.generation)):
+            tree_type, arena = load_tree_binary(self.snapshot_path(self.generation))
+            root = arena.to_nodes(tree_type == "Đỏ-đen")
+        index = NodeIndex(root)
+        offset = JOURNAL_HEADER.size
+        count = 0
+        record_size = JOURNAL_RECORD.size + JOURNAL_CHECKSUM.size
+        while offset + record_size <= len(data):
+            body = data[offset:offset + JOURNAL_RECORD.size]
+            checksum, = JOURNAL_CHECKSUM.unpack_from(data, offset + JOURNAL_RECORD.size)
+            if zlib.crc32(body) != checksum:
+                break
+            op, type_index, a, b = JOURNAL_RECORD.unpack(body)
+            tree_type = TREE_TYPES[type_index]
+            root = apply_operation(root, index, op, tree_type, a, b)
+            offset += record_size
+            count += 1
+        self.file = open(self.path, 'r+b')
+        self.file.truncate(offset)
+        self.file.seek(offset)
+        self.records_since_snapshot = count
+        return tree_type, root, index
+
+    def record(self, op, tree_type, a, b=0):
+        if self.file is None:
+            # Log chỉ được mở bởi snapshot() (log mới) hoặc recover() (log có sẵn)
+            raise RuntimeError("Nhật ký chưa được mở: gọi snapshot() hoặc recover() trước khi ghi.")
+        body = JOURNAL_RECORD.pack(op, TREE_TYPES.index(tree_type), a, b)
+        self.pending += body
+        self.pending += JOURNAL_CHECKSUM.pack(zlib.crc32(body))
+        if not self.pending_count:
+            self.first_pending = time.perf_counter()
+        self.pending_count += 1
+        self.records_since_snapshot += 1
+        if (self.pending_count >= GROUP_COMMIT_SIZE
+                or time.perf_counter() - self.first_pending >= GROUP_COMMIT_INTERVAL):
+            self.sync()
+
+    def sync(self):
+        """
+        Ghi và fsync tất cả bản ghi đang chờ trong một lần.
+        """
+        if not self.pending_count:
+            return
+        self.file.write(self.pending)
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.pending.clear()
+        self.pending_count = 0
+
+    def needs_snapshot(self):
+        return self.records_since_snapshot >= SNAPSHOT_INTERVAL
+
+    def snapshot(self, root, tree_type):
+        """
+        Ghi cây hiện tại thành snapshot thế hệ mới rồi thay log bằng log rỗng của thế hệ đó.
+        Snapshot cũ chỉ bị xóa sau khi log mới đã thay thế log cũ, nên mất điện ở bất kỳ
+        bước nào vẫn khôi phục đúng.
+        """
+        self.sync()
+        generation = self.generation + 1
+        snapshot_path = self.snapshot_path(generation)
+        save_tree_binary(snapshot_path + ".tmp", root, tree_type)
+        with open(snapshot_path + ".tmp", 'rb') as file:
+            os.fsync(file.fileno())
+        os.replace(snapshot_path + ".tmp", snapshot_path)
+
+        with open(self.path + ".tmp", 'wb') as file:
+            file.write(JOURNAL_HEADER.pack(JOURNAL_MAGIC, JOURNAL_VERSION, TREE_TYPES.index(tree_type), generation))
+            file.flush()
+            os.fsync(file.fileno())
+        if self.file:
+            self.file.close()
+        os.replace(self.path + ".tmp", self.path)
+        fsync_directory(self.path)
+        if os.path.exists(self.snapshot_path(self.generation)):
+            os.remove(self.snapshot_path(self.generation))
+
+        self.file = open(self.path, 'ab')
+        self.generation = generation
+        self.records_since_snapshot = 0
+
+    def close(self):
+        if self.file:
+            self.sync()
+            self.file.close()
+            self.file = None
+
+
+# Các tác vụ dài: nhận progress(đã xong, tổng) và cancelled() giống read_tree_text để chạy nền
+PROGRESS_STEP = 4096  # Số phần tử xử lý giữa hai lần báo tiến độ và kiểm tra hủy
+
+
+def check_progress(done, total, progress, cancelled):
+    if cancelled and cancelled():
+        raise OperationCancelled()
+    if progress:
+        progress(done, total)
+
+
+def build_random_tree(tree_type, count, min_val, max_val, progress=None, cancelled=None):
+    """
+    Dựng cây ngẫu nhiên như nút "Tạo cây ngẫu nhiên" của giao diện.
+    """
+    return build_tree_from_keys(tree_type, generate_unique_random_numbers(count, min_val, max_val),
+                                progress, cancelled)
+
+
+def build_tree_from_keys(tree_type, keys, progress=None, cancelled=None):
+    """
+    Dựng cây từ lô khóa theo loại cây: AVL/đỏ-đen dựng cân bằng hàng loạt, còn lại chèn lần lượt.
+    """
+    count = len(keys)
+    if tree_type in ("AVL", "Đỏ-đen"):
+        # Dựng cây cân bằng hàng loạt thay vì chèn và quay từng khóa
+        root = build_balanced(keys)
+        if tree_type == "Đỏ-đen":
+            color_red_black(root)
+        check_progress(count, count, progress, cancelled)
+        return root
+    insert = {TREE_TYPES[0]: insert_binary, "Splay": insert_splay}.get(tree_type, insert_bst)
+    root = None
+    for done, key in enumerate(keys, 1):
+        if tree_type == "Scapegoat":
+            root = insert_scapegoat(root, key, size=done - 1)  # Không có chỉ mục: tự đếm số nút
+        else:
+            root = insert(root, key)
+        if done % PROGRESS_STEP == 0 or done == count:
+            check_progress(done, count, progress, cancelled)
+    return root
+
+
+def copy_tree(root):
+    """
+    Bản sao độc lập (kể cả chiều cao và màu) của cây Node.
+    """
+    if root is None:
+        return None
+    copy = Node(root.val)
+    copy.height, copy.color = root.height, root.color
+    stack = [(root, copy)]
+    while stack:
+        node, clone = stack.pop()
+        for side in ("left", "right"):
+            child = getattr(node, side)
+            if child:
+                child_clone = Node(child.val)
+                child_clone.height, child_clone.color = child.height, child.color
+                setattr(clone, side, child_clone)
+                stack.append((child, child_clone))
+    return copy
+
+
+def delete_keys(root, tree_type, keys, progress=None, cancelled=None):
+    """
+    Xóa một lô khóa trên bản sao của cây, nên cây gốc không đổi cho tới khi người gọi
+    thay bằng kết quả (hoặc bị hủy giữa chừng). Trả về (gốc mới, chỉ mục, các khóa đã xóa).
+    """
+    delete = {TREE_TYPES[0]: delete_binary, "BST": delete_bst, "AVL": delete_avl, "Đỏ-đen": delete_rb,
+              "Splay": delete_splay, "Scapegoat": delete_scapegoat}[tree_type]
+    root = copy_tree(root)
+    index = NodeIndex(root)
+    deleted = []
+    for done, key in enumerate(keys, 1):
+        if key in index:
+            root = delete(root, key, index)
+            deleted.append(key)
+        if done % PROGRESS_STEP == 0 or done == len(keys):
+            check_progress(done, len(keys), progress, cancelled)
+    return root, index, deleted
+
+
+def convert_tree_type(root, tree_type, index=None):
+    """
+    Chuẩn bị cây đang có (dựng theo loại khác) cho các phép toán của tree_type: AVL cần chiều cao
+    đúng, đỏ-đen cần màu hợp lệ, scapegoat cần chiều cao trong cận log_{1/α}(n) và max_size mới.
+    Cây không phải BST hoặc không thỏa điều kiện của loại mới thì được dựng lại cân bằng từ các
+    khóa (index dựng lại theo). Trả về gốc mới.
+    """
+    if tree_type not in ("AVL", "Đỏ-đen", "Scapegoat") or root is None:
+        return root
+    keys = inorder_iterative(root)
+    if all(a < b for a, b in zip(keys, islice(keys, 1, None))):
+        if tree_type == "AVL" and compute_heights(root):
+            return root
+        if tree_type == "Đỏ-đen" and (black_height(root) >= 0 or color_red_black(root)):
+            return root
+        depth_limit = math.log(len(keys)) / math.log(1 / SCAPEGOAT_ALPHA)
+        if tree_type == "Scapegoat" and sum(1 for _ in iter_levels(root)) <= depth_limit + 1:
+            if index is not None:
+                index.max_size = len(keys)
+            return root
+    root = build_balanced_sorted(sort_keys(keys))
+    if tree_type == "Đỏ-đen":
+        color_red_black(root)
+    if index is not None:
+        index.rebuild(root)
+    return root
+
+
+def collect_traversal(traversal, root, total=0, progress=None, cancelled=None):
+    """
+    Chạy hết một bộ sinh duyệt cây (TRAVERSALS) và trả về danh sách giá trị.
+    """
+    result = []
+    for value in traversal(root):
+        result.append(value)
+        if len(result) % PROGRESS_STEP == 0:
+            check_progress(len(result), total or len(result), progress, cancelled)
+    return result
+
+
+# Dựng song song: chia lô khóa đã sắp xếp theo khoảng, mỗi tiến trình con dựng một cây con
+# dạng mảng arena; tiến trình cha dựng phần "xương sống" phía trên và ghép các mảng lại.
+# Các nút xếp theo tiền thứ tự nên cây con của khoảng [lo, hi) bắt đầu tại ô o chiếm đúng các ô
+# o..o+hi-lo-1, con trái ở o+1 và con phải ở o+1+(mid-lo): kết quả trùng từng byte với from_sorted.
+PARALLEL_BUILD_THRESHOLD = 50000  # Lô nhỏ hơn ngưỡng này dựng tuần tự (chi phí khởi động tiến trình)
+PARALLEL_CHUNKS_PER_WORKER = 4  # Số khoảng mỗi tiến trình, để các tiến trình xong gần cùng lúc
+
+
+def build_arena_arrays(sorted_keys):
+    """
+    Dựng cây cân bằng từ các khóa đã sắp xếp thành bốn mảng (khóa, trái, phải, chiều cao)
+    theo tiền thứ tự, chỉ số tính từ 0. Chạy được trong tiến trình con; các mảng array
+    được pickle nguyên khối nên truyền về tiến trình cha rất gọn.
+    """
+    if isinstance(sorted_keys, np.ndarray):
+        sorted_keys = sorted_keys.tolist()
+    keys, left, right, height = array('q'), array('i'), array('i'), array('i')
+    stack = [(0, len(sorted_keys), NIL, False)] if sorted_keys else []
+    while stack:
+        lo, hi, parent, is_right = stack.pop()
+        mid = (lo + hi) // 2
+        i = len(keys)
+        keys.append(sorted_keys[mid])
+        left.append(NIL)
+        right.append(NIL)
+        height.append((hi - lo).bit_length())
+        if parent != NIL:
+            (right if is_right else left)[parent] = i
+        if mid + 1 < hi:
+            stack.append((mid + 1, hi, i, True))
+        if lo < mid:
+            stack.append((lo, mid, i, False))  # Lấy ra trước: cây con trái đứng liền sau nút cha
+    return keys, left, right, height
+
+
+def partition_ranges(n, parts):
+    """
+    Chia [0, n) theo điểm giữa như build_balanced_sorted cho tới khi có ít nhất parts khoảng.
+    Trả về danh sách (lo, hi, mid) theo tiền thứ tự; mid là None với khoảng giao cho tiến trình con.
+    """
+    depth = (parts - 1).bit_length()
+    pieces = []
+    stack = [(0, n, depth)] if n else []
+    while stack:
+        lo, hi, depth = stack.pop()
+        if depth == 0:
+            pieces.append((lo, hi, None))
+            continue
+        mid = (lo + hi) // 2
+        pieces.append((lo, hi, mid))
+        if mid + 1 < hi:
+            stack.append((mid + 1, hi, depth - 1))
+        if lo < mid:
+            stack.append((lo, mid, depth - 1))
+    return pieces
+
+
+def build_balanced_parallel(keys, workers=None, presorted=False):
+    """
+    Dựng TreeArena cân bằng hoàn hảo từ lô khóa bằng nhiều tiến trình.
+    Kết quả giống hệt TreeArena.from_sorted(sorted(keys)).
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    sorted_keys = np.asarray(keys, dtype=np.int64)
+    if not presorted:
+        sorted_keys = np.sort(sorted_keys)
+    workers = workers or os.cpu_count() or 1
+    n = len(sorted_keys)
+    if workers == 1 or n < PARALLEL_BUILD_THRESHOLD:
+        return TreeArena.from_sorted(sorted_keys)
+
+    pieces = partition_ranges(n, workers * PARALLEL_CHUNKS_PER_WORKER)
+    out_keys = np.empty(n, dtype=np.int64)
+    out_left = np.empty(n, dtype=np.int32)
+    out_right = np.empty(n, dtype=np.int32)
+    out_height = np.empty(n, dtype=np.int32)
+    chunks = []
+    offset = 0
+    for lo, hi, mid in pieces:
+        if mid is None:
+            chunks.append((offset, lo, hi))
+            offset += hi - lo
+            continue
+        out_keys[offset] = sorted_keys[mid]
+        out_height[offset] = (hi - lo).bit_length()
+        out_left[offset] = offset + 1 if lo < mid else NIL
+        out_right[offset] = offset + 1 + mid - lo if mid + 1 < hi else NIL
+        offset += 1
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(build_arena_arrays, [sorted_keys[lo:hi] for _, lo, hi in chunks])
+        for (offset, lo, hi), (keys, left, right, height) in zip(chunks, results):
+            end = offset + hi - lo
+            out_keys[offset:end] = np.frombuffer(keys, dtype=np.int64)
+            out_height[offset:end] = np.frombuffer(height, dtype=np.int32)
+            for out, local in ((out_left, left), (out_right, right)):
+                local = np.frombuffer(local, dtype=np.int32)
+                out[offset:end] = np.where(local == NIL, NIL, local + offset)
+
+    arena = TreeArena()
+    for name, values in (("keys", out_keys), ("left", out_left), ("right", out_right), ("height", out_height)):
+        getattr(arena, name).frombytes(values.tobytes())
+    arena.size = n
+    arena.root = 0
+    return arena
+
+
+# Các phép toán tập hợp trên cây AVL dựa trên join (Blelloch-Ferizovic-Sun): join(trái, k, phải)
+# nối hai cây AVL có mọi khóa trái < k < mọi khóa phải trong O(|h(trái) - h(phải)|), split tách
+# một cây theo khóa trong O(log n). Hợp/giao/hiệu tách cây thứ hai theo gốc cây thứ nhất rồi xử lý
+# hai nửa độc lập, tổng chi phí O(m log(n/m + 1)) với m <= n là kích thước hai cây. Các hàm dùng
+# lại nút của cây đầu vào (phá hủy đầu vào) và đệ quy với độ sâu O(log n).
+def join_node(left, node, right):
+    """
+    Nối left, nút node và right thành một cây AVL; trả về gốc mới.
+    """
+    # Đường nóng của split/union: đọc chiều cao trực tiếp thay vì gọi get_height/update_height
+    left_height = left.height if left else 0
+    right_height = right.height if right else 0
+    if left_height > right_height + 1:
+        return join_right(left, node, right)
+    if right_height > left_height + 1:
+        return join_left(left, node, right)
+    node.left, node.right = left, right
+    node.height = 1 + (left_height if left_height > right_height else right_height)
+    return node
+
+
+def join_right(left, node, right):
+    # left cao hơn: đi dọc cạnh phải của left tới cây con cao không quá h(right) + 1
+    child = left.right
+    if get_height(child) <= get_height(right) + 1:
+        node.left, node.right = child, right
+        update_height(node)
+        if get_height(node) <= get_height(left.left) + 1:
+            left.right = node
+            update_height(left)
+            return left
+        left.right = rotate_right(node)
+        return rotate_left(left)
+    left.right = join_right(child, node, right)
+    if get_height(left.right) <= get_height(left.left) + 1:
+        update_height(left)
+        return left
+    return rotate_left(left)
+
+
+def join_left(left, node, right):
+    child = right.left
+    if get_height(child) <= get_height(left) + 1:
+        node.left, node.right = left, child
+        update_height(node)
+        if get_height(node) <= get_height(right.right) + 1:
+            right.left = node
+            update_height(right)
+            return right
+        right.left = rotate_left(node)
+        return rotate_right(right)
+    right.left = join_left(left, node, child)
+    if get_height(right.left) <= get_height(right.right) + 1:
+        update_height(right)
+        return right
+    return rotate_right(right)
+
+
+def join(left, key, right):
+    """
+    Cây AVL chứa các khóa của left, key và các khóa của right (mọi khóa left < key < mọi khóa right).
+    """
+    return join_node(left, Node(key), right)
+
+
+def split(root, key):
+    """
+    Tách cây AVL thành (cây các khóa < key, key có trong cây hay không, cây các khóa > key).
+    """
+    if root is None:
+        return None, False, None
+    if key == root.val:
+        return root.left, True, root.right
+    if key < root.val:
+        left, found, right = split(root.left, key)
+        return left, found, join_node(right, root, root.right)
+    left, found, right = split(root.right, key)
+    return join_node(root.left, root, left), found, right
+
+
+def split_last(root):
+    """
+    Tách nút có khóa lớn nhất: trả về (phần còn lại, nút đó).
+    """
+    if root.right is None:
+        return root.left, root
+    rest, last = split_last(root.right)
+    return join_node(root.left, root, rest), last
+
+
+def join2(left, right):
+    """
+    Nối hai cây AVL (mọi khóa left < mọi khóa right) khi không có khóa ở giữa.
+    """
+    if left is None:
+        return right
+    rest, last = split_last(left)
+    return join_node(rest, last, right)
+
+
+def union(first, second):
+    if first is None:
+        return second
+    if second is None:
+        return first
+    left, _, right = split(second, first.val)
+    left = union(first.left, left)
+    right = union(first.right, right)
+    return join_node(left, first, right)
+
+
+def intersection(first, second):
+    if first is None or second is None:
+        return None
+    left, found, right = split(second, first.val)
+    left = intersection(first.left, left)
+    right = intersection(first.right, right)
+    if found:
+        return join_node(left, first, right)
+    return join2(left, right)
+
+
+def difference(first, second):
+    """
+    Các khóa của first không có trong second.
+    """
+    if first is None or second is None:
+        return first
+    left, _, right = split(first, second.val)
+    left = difference(left, second.left)
+    right = difference(right, second.right)
+    return join2(left, right)
+
+
+# Tên phép toán -> (hàm, giữ khóa chia hay không theo việc khóa có trong cây thứ nhất/thứ hai)
+SET_OPERATIONS = {
+    "union": (union, lambda first, second: first or second),
+    "intersection": (intersection, lambda first, second: first and second),
+    "difference": (difference, lambda first, second: first and not second),
+}
+SET_PARALLEL_MIN_HEIGHT = 20  # Cả hai cây AVL cao ít nhất chừng này (>= 17710 nút) mới chia cho nhiều tiến trình
+
+
+def set_operation_chunk(name, first, second):
+    """
+    Chạy trong tiến trình con: hai cây con dạng TreeArena, trả về kết quả dạng TreeArena.
+    """
+    return TreeArena.from_nodes(SET_OPERATIONS[name][0](first.to_nodes(), second.to_nodes()))
+
+
+def set_operation_parallel(name, first, second, workers=None):
+    """
+    Chạy phép toán tập hợp name trên nhiều tiến trình: lấy các khóa ở vài tầng trên cùng của first
+    làm điểm chia, tách cả hai cây theo từng điểm chia (O(log n) mỗi lần) thành các cặp cây con
+    độc lập, gửi từng cặp (dạng TreeArena) cho tiến trình con rồi nối các kết quả bằng join.
+    Cây nhỏ hoặc workers = 1 thì chạy tuần tự. Phá hủy hai cây đầu vào như bản tuần tự.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    operation, keep_pivot = SET_OPERATIONS[name]
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or min(get_height(first), get_height(second)) < SET_PARALLEL_MIN_HEIGHT:
+        return operation(first, second)
+
+    depth = (workers * PARALLEL_CHUNKS_PER_WORKER - 1).bit_length()
+    pivots = []
+    level = [first]
+    for _ in range(depth):
+        pivots.extend(node.val for node in level)
+        level = [child for node in level for child in (node.left, node.right) if child]
+    pivots.sort()
+
+    pairs, kept = [], []
+    for pivot in pivots:
+        first_left, in_first, first = split(first, pivot)
+        second_left, in_second, second = split(second, pivot)
+        pairs.append((first_left, second_left))
+        kept.append(keep_pivot(in_first, in_second))
+    pairs.append((first, second))
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(set_operation_chunk, [name] * len(pairs),
+                           [TreeArena.from_nodes(a) for a, _ in pairs],
+                           [TreeArena.from_nodes(b) for _, b in pairs])
+        pieces = [arena.to_nodes() for arena in results]
+    root = pieces[0]
+    for pivot, keep, piece in zip(pivots, kept, pieces[1:]):
+        root = join(root, pivot, piece) if keep else join2(root, piece)
+    return root
+
+
+# Ảnh chụp cây trong bộ nhớ dùng chung: bên ghi đóng băng cây thành một khối shared_memory
+# (header + các mảng khóa/trái/phải/chiều cao), các tiến trình đọc gắn vào và đọc thẳng qua
+# memoryview chỉ đọc, không sao chép. Khối "thư mục" mang tên do người dùng chọn ghi thế hệ và
+# tên khối dữ liệu hiện tại, bảo vệ bằng bộ đếm tuần tự (seqlock): bên ghi tăng bộ đếm thành số
+# lẻ trước khi sửa và số chẵn sau khi sửa, bên đọc thử lại nếu thấy số lẻ hoặc bộ đếm đổi.
+SHARED_MAGIC = b"BTSM"
+SHARED_VERSION = 1
+SHARED_HEADER = struct.Struct("<4sHHqqq")  # magic, phiên bản, loại cây, số nút, số ô, gốc
+SHARED_DIRECTORY = struct.Struct("<4sHHqq64s")  # magic, phiên bản, dự trữ, bộ đếm tuần tự, thế hệ, tên khối
+SHARED_SEQUENCE = struct.Struct("<q")  # Bộ đếm tuần tự, nằm ở byte 8 của thư mục
+SHARED_SEQUENCE_OFFSET = 8
+
+
+class NoResourceTracker:
+    """
+    Thay cho module resource_tracker khi gắn vào khối của tiến trình khác.
+    """
+
+    @staticmethod
+    def register(name, rtype):
+        pass
+
+
+def attach_shared_memory(name):
+    """
+    Gắn vào khối shared_memory có sẵn mà không để resource_tracker xóa khối khi tiến trình đọc thoát.
+    """
+    from multiprocessing import shared_memory
+
+    try:
+        return shared_memory.SharedMemory(name, track=False)
+    except TypeError:
+        pass
+    # Python < 3.13 luôn đăng ký khối với resource_tracker; unregister ngay sau đó cũng không được
+    # vì tiến trình con tạo bằng fork dùng chung resource_tracker với bên ghi. Tạm bỏ đăng ký.
+    tracker = shared_memory.resource_tracker
+    shared_memory.resource_tracker = NoResourceTracker
+    try:
+        return shared_memory.SharedMemory(name)
+    finally:
+        shared_memory.resource_tracker = tracker
+
+
+class SharedTreePublisher:
+    """
+    Bên ghi: publish(cây) sao chép cây (Node hoặc TreeArena) vào một khối mới rồi chuyển thư mục
+    sang khối đó. Khối cũ bị unlink ngay; tiến trình đọc đang gắn vẫn đọc được tới khi refresh.
+    """
+
+    def __init__(self, name):
+        from multiprocessing import shared_memory
+
+        self.name = name
+        self.generation = 0
+        self.sequence = 0
+        self.block = None
+        self.directory = shared_memory.SharedMemory(name, create=True, size=SHARED_DIRECTORY.size)
+        SHARED_DIRECTORY.pack_into(self.directory.buf, 0, SHARED_MAGIC, SHARED_VERSION, 0, 0, 0, b"")
+
+    def publish(self, tree, tree_type="BST"):
+        from multiprocessing import shared_memory
+
+        if not isinstance(tree, TreeArena):
+            tree = TreeArena.from_nodes(tree, tree_type == "Đỏ-đen")
+        capacity = len(tree.keys)
+        offset = SHARED_HEADER.size
+        block_name = f"{self.name}-{self.generation + 1}"
+        block = shared_memory.SharedMemory(block_name, create=True,
+                                           size=offset + capacity * sum(size for _, size in NODE_FIELDS))
+        SHARED_HEADER.pack_into(block.buf, 0, SHARED_MAGIC, SHARED_VERSION, TREE_TYPES.index(tree_type),
+                                len(tree), capacity, tree.root)
+        for (name, _), (typecode, size) in zip(BINARY_FIELDS, NODE_FIELDS):
+            values = getattr(tree, name)
+            if not isinstance(values, array):
+                values = array(typecode, values)
+            block.buf[offset:offset + capacity * size] = memoryview(values).cast('B')
+            offset += capacity * size
+
+        self.sequence += 1  # Số lẻ: thư mục đang được sửa
+        SHARED_SEQUENCE.pack_into(self.directory.buf, SHARED_SEQUENCE_OFFSET, self.sequence)
+        self.generation += 1
+        SHARED_DIRECTORY.pack_into(self.directory.buf, 0, SHARED_MAGIC, SHARED_VERSION, 0, self.sequence,
+                                   self.generation, block_name.encode())
+        self.sequence += 1
+        SHARED_SEQUENCE.pack_into(self.directory.buf, SHARED_SEQUENCE_OFFSET, self.sequence)
+
+        if self.block is not None:
+            self.block.close()
+            self.block.unlink()
+        self.block = block
+        return self.generation
+
+    def close(self):
+        for block in (self.block, self.directory):
+            if block is not None:
+                block.close()
+                block.unlink()
+        self.block = self.directory = None
+
+
+class SharedTreeView(TreeArena):
+    """
+    Bên đọc: các mảng của TreeArena là memoryview chỉ đọc trỏ thẳng vào khối dùng chung, nên
+    search/search_steps/range_scan/preorder/inorder/postorder/levelorder dùng lại nguyên mã của
+    TreeArena. Ảnh chụp không đổi cho tới khi gọi refresh(); các thao tác sửa cây sẽ báo lỗi.
+    """
+
+    def __init__(self, name):
+        super().__init__()
+        self.directory = attach_shared_memory(name)
+        magic, version = SHARED_DIRECTORY.unpack_from(self.directory.buf)[:2]
+        if magic != SHARED_MAGIC or version != SHARED_VERSION:
+            self.directory.close()
+            raise ValueError(f"{name} không phải thư mục ảnh chụp cây.")
+        self.block = None
+        self.generation = 0
+        self.tree_type = "BST"
+        self.refresh()
+
+    def refresh(self):
+        """
+        Chuyển sang ảnh chụp mới nhất nếu bên ghi đã publish. Trả về True nếu ảnh chụp đổi.
+        """
+        while True:
+            _, _, _, sequence, generation, block_name = SHARED_DIRECTORY.unpack_from(self.directory.buf)
+            if sequence % 2 or SHARED_SEQUENCE.unpack_from(self.directory.buf, SHARED_SEQUENCE_OFFSET)[0] != sequence:
+                time.sleep(0)
+                continue
+            if generation == self.generation:
+                return False
+            try:
+                block = attach_shared_memory(block_name.rstrip(b"\0").decode())
+            except FileNotFoundError:  # Bên ghi vừa publish tiếp và unlink khối này
+                continue
+            if SHARED_SEQUENCE.unpack_from(self.directory.buf, SHARED_SEQUENCE_OFFSET)[0] != sequence:
+                block.close()
+                continue
+            break
+        self.release()
+        magic, version, type_index, self.size, capacity, self.root = SHARED_HEADER.unpack_from(block.buf)
+        if magic != SHARED_MAGIC or version != SHARED_VERSION:
+            block.close()
+            raise ValueError(f"{block_name!r} không phải ảnh chụp cây.")
+        offset = SHARED_HEADER.size
+        with memoryview(block.buf) as buffer:
+            for (name, _), (typecode, size) in zip(BINARY_FIELDS, NODE_FIELDS):
+                setattr(self, name, buffer[offset:offset + capacity * size].toreadonly().cast(typecode))
+                offset += capacity * size
+        self.block = block
+        self.generation = generation
+        self.tree_type = TREE_TYPES[type_index]
+        return True
+
+    def new_node(self, key):
+        raise TypeError("Ảnh chụp cây dùng chung chỉ đọc.")
+
+    def release(self):
+        # Phải giải phóng các memoryview trước khi đóng khối
+        for name, typecode in BINARY_FIELDS:
+            values = getattr(self, name)
+            if isinstance(values, memoryview):
+                values.release()
+            setattr(self, name, array(typecode))
+        self.root, self.size = NIL, 0
+        if self.block is not None:
+            self.block.close()
+            self.block = None
+
+    def close(self):
+        self.release()
+        self.directory.close()
+
+
+# Cây B+: mỗi nút chứa một mảng khóa đã sắp xếp (tìm bằng bisect) thay vì một Node cho mỗi khóa,
+# nên một lần tìm chỉ đi qua log_order(n) nút. Khóa chỉ nằm ở lá; nút trong giữ các khóa phân
+# cách (khóa nhỏ nhất của cây con bên phải) và các lá được nối thành chuỗi để quét khoảng.
+# Không thuộc TREE_TYPES vì không gồm các Node nhị phân (không lưu file/ghi nhật ký được).
+BTREE_TYPE = "B+"
+BTREE_ORDER = 64  # Số con tối đa của một nút trong; mỗi nút chứa tối đa BTREE_ORDER - 1 khóa
+
+
+def even_ranges(n, size):
+    """
+    Chia [0, n) thành ít khoảng nhất có độ dài không quá size, các khoảng dài gần bằng nhau.
+    """
+    parts = -(-n // size)
+    bounds = [n * k // parts for k in range(parts + 1)]
+    return list(zip(bounds, bounds[1:]))
+
+
+class BTreeNode:
+    __slots__ = ("keys", "children", "next")
+
+    def __init__(self, keys=None, children=None):
+        self.keys = keys if keys is not None else []
+        self.children = children  # None với lá
+        self.next = None  # Lá kế tiếp trong chuỗi lá
+
+
+class BPlusTree:
+    """
+    Cây B+ bậc order: mọi lá cùng độ sâu, mỗi nút (trừ gốc) có từ (order - 1) // 2 tới
+    order - 1 khóa. Khóa k nằm trong cây con children[bisect_right(keys, k)] của nút trong.
+    """
+
+    def __init__(self, order=BTREE_ORDER):
+        if order < 3:
+            raise ValueError("Bậc cây B+ phải từ 3 trở lên.")
+        self.order = order
+        self.max_keys = order - 1
+        self.min_keys = (order - 1) // 2
+        self.root = BTreeNode()
+        self.size = 0
+        self.height = 1  # Số tầng nút, kể cả tầng lá
+
+    @classmethod
+    def from_sorted(cls, sorted_keys, order=BTREE_ORDER):
+        """
+        Dựng hàng loạt từ lô khóa đã sắp xếp, không trùng: chia đều khóa vào ít lá nhất có thể
+        rồi chia đều các nút mỗi tầng vào tầng trên, nên mọi nút đều đủ số khóa tối thiểu.
+        """
+        tree = cls(order)
+        keys = list(sorted_keys)
+        if not keys:
+            return tree
+        nodes = [BTreeNode(keys[lo:hi]) for lo, hi in even_ranges(len(keys), tree.max_keys)]
+        for left, right in zip(nodes, nodes[1:]):
+            left.next = right
+        lows = [node.keys[0] for node in nodes]  # Khóa nhỏ nhất của từng cây con
+        while len(nodes) > 1:
+            parents, parent_lows = [], []
+            for lo, hi in even_ranges(len(nodes), order):
+                parents.append(BTreeNode(lows[lo + 1:hi], nodes[lo:hi]))
+                parent_lows.append(lows[lo])
+            nodes, lows = parents, parent_lows
+            tree.height += 1
+        tree.root = nodes[0]
+        tree.size = len(keys)
+        return tree
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        """
+        Các khóa theo thứ tự tăng dần, đi theo chuỗi lá.
+        """
+        node = self.root
+        while node.children is not None:
+            node = node.children[0]
+        while node:
+            yield from node.keys
+            node = node.next
+
+    def __contains__(self, key):
+        return self.search(key)
+
+    def search_path(self, key):
+        """
+        Các nút đi qua từ gốc tới lá có thể chứa key.
+        """
+        node = self.root
+        path = [node]
+        while node.children is not None:
+            node = node.children[bisect_right(node.keys, key)]
+            path.append(node)
+        return path
+
+    def search(self, key):
+        node = self.root
+        while node.children is not None:
+            node = node.children[bisect_right(node.keys, key)]
+        keys = node.keys
+        i = bisect_left(keys, key)
+        return i < len(keys) and keys[i] == key
+
+    def insert(self, key):
+        """
+        Chèn key; trả về False nếu đã có. Nút tràn được tách đôi và khóa phân cách đẩy lên cha,
+        tới gốc thì cây cao thêm một tầng.
+        """
+        node = self.root
+        path = []
+        while node.children is not None:
+            i = bisect_right(node.keys, key)
+            path.append((node, i))
+            node = node.children[i]
+        keys = node.keys
+        i = bisect_left(keys, key)
+        if i < len(keys) and keys[i] == key:
+            return False
+        keys.insert(i, key)
+        self.size += 1
+        if len(keys) <= self.max_keys:
+            return True
+
+        # Tách lá: nửa phải thành lá mới nối sau lá cũ, khóa đầu của nó được chép lên cha
+        mid = len(keys) // 2
+        right = BTreeNode(keys[mid:])
+        del keys[mid:]
+        right.next = node.next
+        node.next = right
+        separator = right.keys[0]
+        while path:
+            parent, i = path.pop()
+            parent.keys.insert(i, separator)
+            parent.children.insert(i + 1, right)
+            if len(parent.keys) <= self.max_keys:
+                return True
+            # Tách nút trong: khóa giữa được chuyển (không chép) lên cha
+            mid = len(parent.keys) // 2
+            separator = parent.keys[mid]
+            right = BTreeNode(parent.keys[mid + 1:], parent.children[mid + 1:])
+            del parent.keys[mid:]
+            del parent.children[mid + 1:]
+        self.root = BTreeNode([separator], [self.root, right])
+        self.height += 1
+        return True
+
+    def delete(self, key):
+        """
+        Xóa key; trả về False nếu không có. Nút thiếu khóa mượn một khóa từ anh em kề bên
+        nếu được, ngược lại gộp với anh em và xóa khóa phân cách ở cha (có thể lan lên gốc).
+        Khóa phân cách cũ ở nút trong vẫn đúng sau khi xóa nên không cần sửa.
+        """
+        node = self.root
+        path = []
+        while node.children is not None:
+            i = bisect_right(node.keys, key)
+            path.append((node, i))
+            node = node.children[i]
+        keys = node.keys
+        i = bisect_left(keys, key)
+        if i == len(keys) or keys[i] != key:
+            return False
+        del keys[i]
+        self.size -= 1
+
+        while path and len(node.keys) < self.min_keys:
+            parent, i = path.pop()
+            leaf = node.children is None
+            left = parent.children[i - 1] if i > 0 else None
+            right = parent.children[i + 1] if i + 1 < len(parent.children) else None
+            if left and len(left.keys) > self.min_keys:
+                if leaf:
+                    node.keys.insert(0, left.keys.pop())
+                    parent.keys[i - 1] = node.keys[0]
+                else:
+                    node.keys.insert(0, parent.keys[i - 1])
+                    parent.keys[i - 1] = left.keys.pop()
+                    node.children.insert(0, left.children.pop())
+                return True
+            if right and len(right.keys) > self.min_keys:
+                if leaf:
+                    node.keys.append(right.keys.pop(0))
+                    parent.keys[i] = right.keys[0]
+                else:
+                    node.keys.append(parent.keys[i])
+                    parent.keys[i] = right.keys.pop(0)
+                    node.children.append(right.children.pop(0))
+                return True
+
+            # Gộp nút bên phải vào nút bên trái của cặp kề nhau
+            if left:
+                i -= 1
+                right = node
+                node = left
+            if leaf:
+                node.keys.extend(right.keys)
+                node.next = right.next
+            else:
+                node.keys.append(parent.keys[i])
+                node.keys.extend(right.keys)
+                node.children.extend(right.children)
+            del parent.keys[i]
+            del parent.children[i + 1]
+            node = parent
+
+        if self.root.children is not None and not self.root.keys:
+            self.root = self.root.children[0]
+            self.height -= 1
+        return True
+
+    def range_scan(self, low, high):
+        """
+        Các khóa trong [low, high]: xuống lá chứa low rồi đi theo chuỗi lá.
+        """
+        node = self.root
+        while node.children is not None:
+            node = node.children[bisect_right(node.keys, low)]
+        result = []
+        i = bisect_left(node.keys, low)
+        while node:
+            keys = node.keys
+            if keys and keys[-1] <= high:
+                result.extend(keys[i:])
+            else:
+                result.extend(keys[i:bisect_right(keys, high)])
+                break
+            node = node.next
+            i = 0
+        return result
+
+    def levels(self, limit=None):
+        """
+        Các nút theo từng tầng từ gốc; dừng trước tầng làm tổng số nút vượt limit (nếu có).
+        """
+        levels = []
+        level = [self.root]
+        total = 0
+        while level:
+            total += len(level)
+            if limit is not None and total > limit and levels:
+                break
+            levels.append(level)
+            if level[0].children is None:
+                break
+            level = [child for node in level for child in node.children]
+        return levels
+
+    def copy(self):
+        """
+        Bản sao độc lập (cùng hình dạng), nối lại chuỗi lá theo thứ tự.
+        """
+        tree = BPlusTree(self.order)
+        tree.size, tree.height = self.size, self.height
+        tree.root = BTreeNode(list(self.root.keys))
+        stack = [(self.root, tree.root)]
+        previous = None
+        while stack:
+            node, clone = stack.pop()
+            if node.children is None:
+                # Ngăn xếp duyệt cây con trái trước nên lá xuất hiện theo thứ tự tăng dần
+                if previous:
+                    previous.next = clone
+                previous = clone
+                continue
+            clone.children = [BTreeNode(list(child.keys)) for child in node.children]
+            stack.extend(reversed(list(zip(node.children, clone.children))))
+        return tree
+
+    def check(self):
+        """
+        Kiểm tra các bất biến (thứ tự, số khóa, độ sâu lá, chuỗi lá, kích thước);
+        trả về danh sách mô tả lỗi, rỗng nếu cây hợp lệ.
+        """
+        errors = []
+        leaves = []
+        stack = [(self.root, 1, None, None)]  # nút, độ sâu, cận dưới (>=), cận trên (<)
+        while stack:
+            node, depth, low, high = stack.pop()
+            keys = node.keys
+            if any(a >= b for a, b in zip(keys, keys[1:])):
+                errors.append(f"Khóa không tăng dần: {keys}")
+            if (low is not None and keys and keys[0] < low) or (high is not None and keys and keys[-1] >= high):
+                errors.append(f"Khóa {keys} nằm ngoài khoảng [{low}, {high})")
+            if len(keys) > self.max_keys or (node is not self.root and len(keys) < self.min_keys):
+                errors.append(f"Nút có {len(keys)} khóa")
+            if node.children is None:
+                if depth != self.height:
+                    errors.append(f"Lá ở độ sâu {depth}, chiều cao {self.height}")
+                leaves.append(node)
+                continue
+            if len(node.children) != len(keys) + 1:
+                errors.append(f"Nút trong có {len(keys)} khóa nhưng {len(node.children)} con")
+                continue
+            bounds = [low] + keys + [high]
+            for child, child_low, child_high in reversed(list(zip(node.children, bounds, bounds[1:]))):
+                stack.append((child, depth + 1, child_low, child_high))
+        for leaf, following in zip(leaves, leaves[1:] + [None]):
+            if leaf.next is not following:
+                errors.append(f"Chuỗi lá bị đứt sau lá {leaf.keys}")
+                break
+        if sum(len(leaf.keys) for leaf in leaves) != self.size:
+            errors.append(f"Kích thước {self.size} khác số khóa ở lá")
+        return errors
+
+
+def build_btree(keys, order=BTREE_ORDER, progress=None, cancelled=None):
+    """
+    Dựng cây B+ bằng cách chèn lần lượt (giống nút "Tạo cây ngẫu nhiên" với BST).
+    """
+    tree = BPlusTree(order)
+    for done, key in enumerate(keys, 1):
+        tree.insert(key)
+        if done % PROGRESS_STEP == 0 or done == len(keys):
+            check_progress(done, len(keys), progress, cancelled)
+    return tree
+
+
+def delete_btree_keys(tree, keys, progress=None, cancelled=None):
+    """
+    Như delete_keys nhưng cho cây B+: xóa trên bản sao, trả về (cây mới, các khóa đã xóa).
+    """
+    tree = tree.copy()
+    deleted = []
+    for done, key in enumerate(keys, 1):
+        if tree.delete(key):
+            deleted.append(key)
+        if done % PROGRESS_STEP == 0 or done == len(keys):
+            check_progress(done, len(keys), progress, cancelled)
+    return tree, deleted
+
+
+# Giao diện dòng lệnh
+TREE_TYPE_NAMES = {"binary": TREE_TYPES[0], "bst": "BST", "avl": "AVL", "rb": "Đỏ-đen", "splay": "Splay",
+                   "scapegoat": "Scapegoat"}
+
+
+def load_tree_file(file_path):
+    """
+    Đọc file văn bản hoặc nhị phân (theo phần mở rộng). Trả về (loại cây, arena).
+    """
+    if file_path.endswith(BINARY_EXTENSION):
+        return load_tree_binary(file_path)
+    tree_type, root, errors = read_tree_text(file_path)
+    for line_number, message in errors:
+        print(f"{file_path}:{line_number}: {message}", file=sys.stderr)
+    return tree_type, TreeArena.from_nodes(root, tree_type == "Đỏ-đen")
+
+
+def save_tree_file(file_path, tree, tree_type):
+    if file_path.endswith(BINARY_EXTENSION):
+        save_tree_binary(file_path, tree, tree_type)
+    else:
+        write_tree_text(file_path, tree.to_nodes() if isinstance(tree, TreeArena) else tree, tree_type)
+
+
+def read_keys(file_path):
+    """
+    Đọc lô khóa nguyên từ file văn bản, bỏ các khóa trùng (giữ thứ tự xuất hiện đầu tiên).
+    """
+    with open(file_path) as file:
+        return list(dict.fromkeys(int(token) for token in file.read().replace(",", " ").split()))
+
+
+def postorder_indices(arena):
+    stack = [arena.root] if arena.root != NIL else []
+    order = []
+    while stack:
+        i = stack.pop()
+        order.append(i)
+        if arena.left[i] != NIL:
+            stack.append(arena.left[i])
+        if arena.right[i] != NIL:
+            stack.append(arena.right[i])
+    return reversed(order)
+
+
+def tree_stats(arena):
+    """
+    Số nút, số lá, chiều cao, khóa nhỏ/lớn nhất và cây có thỏa BST/AVL hay không.
+    """
+    heights = {}
+    leaves = 0
+    balanced = True
+    for i in postorder_indices(arena):
+        left, right = arena.left[i], arena.right[i]
+        left_height, right_height = heights.pop(left, 0), heights.pop(right, 0)
+        heights[i] = 1 + max(left_height, right_height)
+        balanced = balanced and abs(left_height - right_height) <= 1
+        leaves += left == NIL and right == NIL
+    keys = arena.inorder()
+    is_bst = all(a <= b for a, b in zip(keys, islice(keys, 1, None)))
+    return {"nodes": len(keys), "leaves": leaves, "height": heights.get(arena.root, 0),
+            "min": min(keys, default=None), "max": max(keys, default=None),
+            "bst": is_bst, "avl": is_bst and balanced}
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="treecore", description="Xử lý cây nhị phân không cần giao diện.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="dựng cây ngẫu nhiên và ghi ra file")
+    build.add_argument("output")
+    build.add_argument("--type", choices=TREE_TYPE_NAMES, default="avl")
+    build.add_argument("--count", type=int, default=1000)
+    build.add_argument("--min", type=int, default=1)
+    build.add_argument("--max", type=int)
+    build.add_argument("--seed", type=int)
+    build.add_argument("--keys", help="đọc khóa từ file (cách nhau bởi dấu cách, dấu phẩy hoặc xuống dòng)")
+    build.add_argument("--workers", type=int, help="dựng cây cân bằng (avl/bst) song song bằng N tiến trình")
+    load = commands.add_parser("load", help="đọc file và báo thời gian đọc")
+    load.add_argument("input")
+    query = commands.add_parser("query", help="tìm khóa, in đường đi tìm kiếm")
+    query.add_argument("input")
+    query.add_argument("keys", type=int, nargs="+")
+    convert = commands.add_parser("convert", help="chuyển đổi giữa .txt và " + BINARY_EXTENSION)
+    convert.add_argument("input")
+    convert.add_argument("output")
+    stats = commands.add_parser("stats", help="thống kê cây trong file")
+    stats.add_argument("input")
+    setop = commands.add_parser("setop", help="hợp/giao/hiệu khóa của hai cây AVL (dựa trên join)")
+    setop.add_argument("operation", choices=SET_OPERATIONS)
+    setop.add_argument("first")
+    setop.add_argument("second")
+    setop.add_argument("output")
+    setop.add_argument("--workers", type=int, default=1, help="chia các bài toán con cho N tiến trình")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == "build":
+            if args.seed is not None:
+                random.seed(args.seed)
+            tree_type = TREE_TYPE_NAMES[args.type]
+            if args.workers is not None and (args.workers < 1 or tree_type not in ("BST", "AVL")):
+                parser.error("--workers cần số nguyên dương và loại cây avl hoặc bst")
+            if args.keys:
+                keys = read_keys(args.keys)
+            else:
+                max_val = args.max if args.max is not None else args.min + 10 * args.count
+                keys = generate_unique_random_numbers(args.count, args.min, max_val)
+            if args.workers:
+                tree = build_balanced_parallel(keys, args.workers)
+            else:
+                tree = build_tree_from_keys(tree_type, keys)
+            save_tree_file(args.output, tree, tree_type)
+            print(f"Đã ghi {len(keys)} nút ({tree_type}) vào {args.output}")
+            return 0
+
+        if args.command == "setop":
+            if args.workers < 1:
+                parser.error("--workers cần số nguyên dương")
+            trees = []
+            for file_path in (args.first, args.second):
+                tree_type, arena = load_tree_file(file_path)
+                if tree_type != "AVL":
+                    raise ValueError(f"{file_path} không phải cây AVL ({tree_type})")
+                trees.append(arena.to_nodes())
+            start = time.perf_counter()
+            root = set_operation_parallel(args.operation, *trees, workers=args.workers)
+            elapsed = time.perf_counter() - start
+            save_tree_file(args.output, root, "AVL")
+            print(f"Đã ghi {count_nodes(root)} nút ({args.operation}, {elapsed:.3f} s) vào {args.output}")
+            return 0
+
+        start = time.perf_counter()
+        tree_type, arena = load_tree_file(args.input)
+        elapsed = time.perf_counter() - start
+        if args.command == "load":
+            print(f"{args.input}: {tree_type}, {len(arena)} nút, đọc trong {elapsed:.3f} s")
+        elif args.command == "query":
+            for key in args.keys:
+                if tree_type == TREE_TYPES[0]:
+                    found = key in arena.inorder()
+                    print(f"{key}: {'tìm thấy' if found else 'không tồn tại'}")
+                else:
+                    steps = arena.search_steps(key)
+                    found = bool(steps) and steps[-1] == key
+                    print(f"{key}: {'tìm thấy' if found else 'không tồn tại'} ({' -> '.join(map(str, steps))})")
+        elif args.command == "convert":
+            save_tree_file(args.output, arena, tree_type)
+            print(f"Đã chuyển {args.input} -> {args.output}")
+        elif args.command == "stats":
+            print(f"Loại cây: {tree_type}")
+            for name, value in tree_stats(arena).items():
+                print(f"{name}: {value}")
+    except (OSError, ValueError) as e:
+        print(f"Lỗi: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())